@@ -2,7 +2,9 @@ from django.contrib import admin
 from .models import (
     Empresa, Interes, Cliente, Interaccion, Taller, Enrollment, 
     Producto, VentaProducto, DetalleVenta, EmailLog, Curso, 
-    Post, Contacto, Resena, Transaccion, Seccion, Leccion
+    Post, Contacto, Resena, Transaccion, Seccion, Leccion, NotificacionPendiente,
+    WebhookOutbox, ReservaStock, IdempotencyKey, MovimientoPago, AlertaStock,
+    MovimientoInventario, SnapshotInventario, ExportJob
 )
 
 @admin.register(Empresa)
@@ -65,6 +67,58 @@ class EmailLogAdmin(admin.ModelAdmin):
     list_display = ('recipient', 'subject', 'status', 'created_at')
     list_filter = ('status',)
 
+@admin.register(NotificacionPendiente)
+class NotificacionPendienteAdmin(admin.ModelAdmin):
+    list_display = ('cliente', 'taller', 'tipo', 'creado_en', 'enviado_en')
+    list_filter = ('tipo', 'enviado_en')
+    raw_id_fields = ('cliente', 'taller')
+
+@admin.register(WebhookOutbox)
+class WebhookOutboxAdmin(admin.ModelAdmin):
+    list_display = ('orden', 'evento', 'estado', 'intentos', 'proximo_intento', 'enviado_en')
+    list_filter = ('estado', 'evento')
+    raw_id_fields = ('orden',)
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('orden', 'producto', 'cantidad', 'estado', 'expira_en')
+    list_filter = ('estado',)
+    raw_id_fields = ('orden', 'producto')
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'endpoint', 'clave', 'estado', 'status_code', 'expira_en')
+    list_filter = ('endpoint', 'estado')
+    raw_id_fields = ('usuario',)
+
+@admin.register(MovimientoPago)
+class MovimientoPagoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'orden', 'inscripcion', 'transaccion', 'monto', 'saldo', 'creado_en')
+    raw_id_fields = ('orden', 'inscripcion', 'transaccion')
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'estado', 'stock_al_alertar', 'stock_critico', 'creado_en', 'resuelta_en')
+    list_filter = ('estado',)
+    raw_id_fields = ('producto',)
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'tipo', 'cantidad', 'stock_resultante', 'orden', 'referencia', 'creado_en')
+    list_filter = ('tipo',)
+    raw_id_fields = ('producto', 'orden')
+
+@admin.register(SnapshotInventario)
+class SnapshotInventarioAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'stock', 'tomado_en')
+    raw_id_fields = ('producto',)
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'modelo', 'formato', 'estado', 'filas_procesadas', 'usuario', 'creado_en', 'terminado_en')
+    list_filter = ('estado', 'modelo', 'formato')
+    raw_id_fields = ('usuario',)
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'autor', 'fecha_publicacion', 'esta_publicado')
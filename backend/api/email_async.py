@@ -0,0 +1,160 @@
+"""
+Transporte de email asíncrono para el despliegue ASGI.
+
+`AsyncEmailBackend` mantiene un pool acotado de conexiones aiosmtplib y envía
+mensajes de Django (EmailMessage / EmailMultiAlternatives) de forma concurrente,
+sin un hilo del sistema por conexión. El pool vive lo que dura el bloque
+`async with`, de modo que cada envío masivo reutiliza pocas sesiones SMTP.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import aiosmtplib
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models.query import QuerySet
+
+from .models import EmailLog
+
+logger = logging.getLogger('api')
+
+
+class AsyncEmailBackend:
+    """
+    Async counterpart of django.core.mail.backends.smtp.EmailBackend.
+
+    At most `pool_size` messages are in flight at once and at most
+    `pool_size` SMTP sessions are opened; idle sessions are reused.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None,
+                 use_tls=None, use_ssl=None, timeout=None, pool_size=None,
+                 fail_silently=False):
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = settings.EMAIL_HOST_USER if username is None else username
+        self.password = settings.EMAIL_HOST_PASSWORD if password is None else password
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = getattr(settings, 'EMAIL_USE_SSL', False) if use_ssl is None else use_ssl
+        self.timeout = getattr(settings, 'EMAIL_TIMEOUT', None) if timeout is None else timeout
+        self.pool_size = pool_size or settings.EMAIL_ASYNC_POOL_SIZE
+        self.fail_silently = fail_silently
+
+        self._idle = []
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self.sessions_opened = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for smtp in idle:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            use_tls=self.use_ssl,
+            start_tls=self.use_tls,
+            timeout=self.timeout or 60,
+        )
+        await smtp.connect()
+        self.sessions_opened += 1
+        return smtp
+
+    @asynccontextmanager
+    async def _connection(self):
+        async with self._slots:
+            smtp = self._idle.pop() if self._idle else await self._connect()
+            try:
+                yield smtp
+            except aiosmtplib.SMTPResponseException:
+                # The server rejected this message but the session is still usable
+                self._idle.append(smtp)
+                raise
+            except Exception:
+                smtp.close()
+                raise
+            else:
+                self._idle.append(smtp)
+
+    async def _send(self, message):
+        recipients = message.recipients()
+        if not recipients:
+            return False
+        payload = message.message().as_bytes(linesep='\r\n')
+
+        for attempt in (1, 2):
+            try:
+                async with self._connection() as smtp:
+                    await smtp.sendmail(message.from_email, recipients, payload)
+                return True
+            except aiosmtplib.SMTPServerDisconnected:
+                # Pooled session was dropped by the server; retry once on a fresh one
+                if attempt == 2:
+                    raise
+
+    async def send_each(self, email_messages):
+        """Sends every message concurrently. Returns a list with None or the exception per message."""
+        results = await asyncio.gather(
+            *(self._send(message) for message in email_messages),
+            return_exceptions=True,
+        )
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    async def send_messages(self, email_messages):
+        """Same contract as BaseEmailBackend.send_messages: returns the number sent."""
+        errors = await self.send_each(email_messages)
+        if not self.fail_silently:
+            for error in errors:
+                if error is not None:
+                    raise error
+        return sum(1 for error in errors if error is None)
+
+
+async def asend_personalized(recipients, build_message, backend=None):
+    """
+    Sends one email per recipient and logs every attempt in EmailLog with a
+    single bulk insert.
+
+    recipients: iterable (or QuerySet) of objects with `.email`
+    build_message: callable(recipient) -> (subject, plain_message, html_message)
+    Returns the number of messages accepted by the SMTP server.
+    """
+    if isinstance(recipients, QuerySet):
+        recipients = [r async for r in recipients]
+
+    messages = []
+    for recipient in recipients:
+        subject, plain_message, html_message = build_message(recipient)
+        message = EmailMultiAlternatives(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+        message.attach_alternative(html_message, 'text/html')
+        messages.append(message)
+
+    if backend is None:
+        async with AsyncEmailBackend() as pooled:
+            errors = await pooled.send_each(messages)
+    else:
+        errors = await backend.send_each(messages)
+
+    logs = []
+    for message, error in zip(messages, errors):
+        if error is None:
+            logs.append(EmailLog(recipient=message.to[0], subject=message.subject, body_text=message.body, status='SUCCESS'))
+        else:
+            logger.warning(f"Async email to {message.to[0]} failed: {error}")
+            logs.append(EmailLog(recipient=message.to[0], subject=message.subject, body_text=message.body, status='FAIL', error_message=str(error)))
+    await EmailLog.objects.abulk_create(logs, batch_size=1000)
+
+    return sum(1 for error in errors if error is None)
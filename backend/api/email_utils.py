@@ -3,6 +3,10 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from .models import EmailLog
 from django.utils.html import strip_tags
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('api')
 
 def get_html_template(subject, body, action_url=None, action_text=None):
     """
@@ -158,15 +162,10 @@ def send_enrollment_confirmation(inscripcion, tipo='taller'):
         )
         return False
 
-def send_workshop_cancellation(taller, clientes):
-    """Send email to all enrolled clients when a workshop is cancelled"""
-    print(f"DEBUG: send_workshop_cancellation called for {taller.nombre}")
-    try:
-        subject = f'Taller Cancelado: {taller.nombre}'
-        
-        for cliente in clientes:
-            print(f"DEBUG: Sending cancellation email to {cliente.email}")
-            body = f"""
+def build_workshop_cancellation_email(taller, cliente):
+    """Returns (subject, plain_message, html_message) for a cancelled workshop notice."""
+    subject = f'Taller Cancelado: {taller.nombre}'
+    body = f"""
             Hola {cliente.nombre_completo},
             
             Lamentamos informarte que el taller "{taller.nombre}" programado para el {taller.fecha_taller.strftime('%d de %B de %Y')} ha sido cancelado.
@@ -175,9 +174,16 @@ def send_workshop_cancellation(taller, clientes):
             
             Disculpa las molestias.
             """
-            
-            html_message = get_html_template(subject, body)
-            plain_message = strip_tags(html_message)
+    html_message = get_html_template(subject, body)
+    return subject, strip_tags(html_message), html_message
+
+def send_workshop_cancellation(taller, clientes):
+    """Send email to all enrolled clients when a workshop is cancelled"""
+    print(f"DEBUG: send_workshop_cancellation called for {taller.nombre}")
+    try:
+        for cliente in clientes:
+            print(f"DEBUG: Sending cancellation email to {cliente.email}")
+            subject, plain_message, html_message = build_workshop_cancellation_email(taller, cliente)
             
             send_mail(
                 subject,
@@ -301,29 +307,50 @@ def send_admin_email(recipient_data_list, subject_template, message_template):
     
     return success_count, errors
 
-def send_receipt_accepted_email(transaccion):
-    """Notify user that their payment receipt was accepted"""
-    try:
-        if transaccion.inscripcion:
-            cliente = transaccion.inscripcion.cliente
-            item_name = str(transaccion.inscripcion.content_object)
-        elif transaccion.orden:
-            cliente = transaccion.orden.cliente
-            item_name = f"Orden #{transaccion.orden.id}"
-        else:
-            return False
-        
-        subject = f'Pago Aprobado: {item_name}'
-        body = f"""
+def _receipt_recipient(transaccion):
+    """(cliente, item_name) for a payment receipt, or None if it has no owner."""
+    if transaccion.inscripcion:
+        return transaccion.inscripcion.cliente, str(transaccion.inscripcion.content_object)
+    if transaccion.orden:
+        return transaccion.orden.cliente, f"Orden #{transaccion.orden.id}"
+    return None
+
+def build_receipt_accepted_email(cliente, item_name):
+    """Returns (subject, plain_message, html_message) for an approved receipt."""
+    subject = f'Pago Aprobado: {item_name}'
+    body = f"""
         Hola {cliente.nombre_completo},
         
         ¡Buenas noticias! Tu comprobante de pago para "{item_name}" ha sido verificado y aprobado exitosamente.
         
         Ya tienes acceso confirmado.
         """
+    html_message = get_html_template(subject, body, "http://localhost:5173/profile", "Ver mi Inscripción")
+    return subject, strip_tags(html_message), html_message
+
+def build_receipt_rejected_email(cliente, item_name, motivo=''):
+    """Returns (subject, plain_message, html_message) for a rejected receipt."""
+    subject = f'Problema con tu pago: {item_name}'
+    body = f"""
+        Hola {cliente.nombre_completo},
         
-        html_message = get_html_template(subject, body, "http://localhost:5173/profile", "Ver mi Inscripción")
-        plain_message = strip_tags(html_message)
+        Hemos revisado tu comprobante de pago para "{item_name}" y no hemos podido aprobarlo.
+        
+        <strong>Motivo:</strong> {motivo if motivo else 'La imagen no es legible o el monto no coincide.'}
+        
+        Por favor, intenta subir el comprobante nuevamente o contáctanos si tienes dudas.
+        """
+    html_message = get_html_template(subject, body, "http://localhost:5173/profile?tab=payments", "Subir Nuevo Comprobante")
+    return subject, strip_tags(html_message), html_message
+
+def send_receipt_accepted_email(transaccion):
+    """Notify user that their payment receipt was accepted"""
+    try:
+        destinatario = _receipt_recipient(transaccion)
+        if destinatario is None:
+            return False
+        cliente, item_name = destinatario
+        subject, plain_message, html_message = build_receipt_accepted_email(cliente, item_name)
         
         send_mail(
             subject,
@@ -348,28 +375,11 @@ def send_receipt_accepted_email(transaccion):
 def send_receipt_rejected_email(transaccion, motivo=''):
     """Notify user that their payment receipt was rejected"""
     try:
-        if transaccion.inscripcion:
-            cliente = transaccion.inscripcion.cliente
-            item_name = str(transaccion.inscripcion.content_object)
-        elif transaccion.orden:
-            cliente = transaccion.orden.cliente
-            item_name = f"Orden #{transaccion.orden.id}"
-        else:
+        destinatario = _receipt_recipient(transaccion)
+        if destinatario is None:
             return False
-        
-        subject = f'Problema con tu pago: {item_name}'
-        body = f"""
-        Hola {cliente.nombre_completo},
-        
-        Hemos revisado tu comprobante de pago para "{item_name}" y no hemos podido aprobarlo.
-        
-        <strong>Motivo:</strong> {motivo if motivo else 'La imagen no es legible o el monto no coincide.'}
-        
-        Por favor, intenta subir el comprobante nuevamente o contáctanos si tienes dudas.
-        """
-        
-        html_message = get_html_template(subject, body, "http://localhost:5173/profile?tab=payments", "Subir Nuevo Comprobante")
-        plain_message = strip_tags(html_message)
+        cliente, item_name = destinatario
+        subject, plain_message, html_message = build_receipt_rejected_email(cliente, item_name, motivo)
         
         send_mail(
             subject,
@@ -391,6 +401,52 @@ def send_receipt_rejected_email(transaccion, motivo=''):
     except Exception as e:
         return False
 
+def send_receipt_emails(transaccion_ids, aprobado=True, motivo=''):
+    """
+    Sends the approved/rejected receipt emails for a batch of transactions over
+    a single SMTP connection and logs them with one bulk insert.
+    Returns the number of emails sent.
+    """
+    from django.core.mail import EmailMultiAlternatives, get_connection
+    from .models import Transaccion
+
+    transacciones = (
+        Transaccion.objects
+        .filter(id__in=transaccion_ids)
+        .select_related('inscripcion__cliente', 'orden__cliente')
+        .prefetch_related('inscripcion__content_object')
+    )
+
+    logs = []
+    connection = get_connection()
+    connection.open()
+    try:
+        for transaccion in transacciones:
+            destinatario = _receipt_recipient(transaccion)
+            if destinatario is None:
+                continue
+            cliente, item_name = destinatario
+            if aprobado:
+                subject, plain_message, html_message = build_receipt_accepted_email(cliente, item_name)
+            else:
+                subject, plain_message, html_message = build_receipt_rejected_email(cliente, item_name, motivo)
+            message = EmailMultiAlternatives(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [cliente.email], connection=connection)
+            message.attach_alternative(html_message, 'text/html')
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.exception(f"Error sending receipt email to {cliente.email}")
+                logs.append(EmailLog(recipient=cliente.email, subject=subject, body_text=plain_message, status='FAIL',
+                                     error_message=str(e), inscripcion=transaccion.inscripcion))
+                continue
+            logs.append(EmailLog(recipient=cliente.email, subject=subject, body_text=plain_message, status='SUCCESS',
+                                 inscripcion=transaccion.inscripcion))
+    finally:
+        connection.close()
+
+    EmailLog.objects.bulk_create(logs)
+    return sum(1 for log in logs if log.status == 'SUCCESS')
+
 
 def send_receipt_received_email(transaccion):
     """Notify user that their payment receipt was received and is under review"""
@@ -438,17 +494,22 @@ def send_receipt_received_email(transaccion):
     except Exception as e:
         return False
 
-def send_waitlist_notification(user, taller):
+def send_waitlist_notification(user, taller, reserva_expira=None):
     """
     Envía un correo al usuario avisando que se liberó un cupo.
+    Si se le reservó el cupo, indica hasta cuándo lo tiene.
     """
     subject = f"¡Cupo disponible en {taller.nombre}!"
+    if reserva_expira:
+        plazo = f"Te lo reservamos hasta el {timezone.localtime(reserva_expira).strftime('%d/%m/%Y a las %H:%M')}. Después pasará a la siguiente persona en la lista."
+    else:
+        plazo = "Ingresa ahora a la plataforma para inscribirte antes de que se ocupe nuevamente."
     body = f"""
     Hola {user.first_name},
     
     ¡Buenas noticias! Se ha liberado un cupo en el taller "{taller.nombre}" que estabas esperando.
     
-    Ingresa ahora a la plataforma para inscribirte antes de que se ocupe nuevamente.
+    {plazo}
     """
     
     try:
@@ -475,18 +536,10 @@ def send_waitlist_notification(user, taller):
         print(f"Error enviando email lista espera: {e}")
         return False
 
-def send_new_workshop_notification(taller, clientes):
-    """
-    Send email to clients interested in the workshop's category.
-    """
-    print(f"DEBUG: send_new_workshop_notification called for {taller.nombre}")
-    try:
-        subject = f'Nuevo Taller: {taller.nombre}'
-        
-        count = 0
-        for cliente in clientes:
-            print(f"DEBUG: Sending new workshop notification to {cliente.email}")
-            body = f"""
+def build_new_workshop_email(taller, cliente):
+    """Returns (subject, plain_message, html_message) for a new workshop announcement."""
+    subject = f'Nuevo Taller: {taller.nombre}'
+    body = f"""
             Hola {cliente.nombre_completo},
             
             ¡Tenemos un nuevo taller que te podría interesar!
@@ -501,9 +554,19 @@ def send_new_workshop_notification(taller, clientes):
             
             ¡Inscríbete ahora y asegura tu cupo!
             """
-            
-            html_message = get_html_template(subject, body, f"http://localhost:5173/talleres/{taller.id}", "Ver Taller")
-            plain_message = strip_tags(html_message)
+    html_message = get_html_template(subject, body, f"http://localhost:5173/talleres/{taller.id}", "Ver Taller")
+    return subject, strip_tags(html_message), html_message
+
+def send_new_workshop_notification(taller, clientes):
+    """
+    Send email to clients interested in the workshop's category.
+    """
+    print(f"DEBUG: send_new_workshop_notification called for {taller.nombre}")
+    try:
+        count = 0
+        for cliente in clientes:
+            print(f"DEBUG: Sending new workshop notification to {cliente.email}")
+            subject, plain_message, html_message = build_new_workshop_email(taller, cliente)
             
             send_mail(
                 subject,
@@ -527,17 +590,10 @@ def send_new_workshop_notification(taller, clientes):
         print(f"DEBUG: Error sending new workshop notification: {e}")
         return 0
 
-def send_workshop_update_notification(taller, clientes, old_date, old_time):
-    """
-    Send email to enrolled clients when workshop date/time changes.
-    """
-    print(f"DEBUG: send_workshop_update_notification called for {taller.nombre}")
-    try:
-        subject = f'Actualización: {taller.nombre}'
-        
-        for cliente in clientes:
-            print(f"DEBUG: Sending update email to {cliente.email}")
-            body = f"""
+def build_workshop_update_email(taller, cliente, old_date, old_time):
+    """Returns (subject, plain_message, html_message) for a workshop reschedule notice."""
+    subject = f'Actualización: {taller.nombre}'
+    body = f"""
             Hola {cliente.nombre_completo},
             
             Te informamos que hubo un cambio en la programación del taller "{taller.nombre}".
@@ -550,9 +606,18 @@ def send_workshop_update_notification(taller, clientes, old_date, old_time):
             
             Si tienes dudas o no puedes asistir en la nueva fecha, por favor contáctanos.
             """
-            
-            html_message = get_html_template(subject, body, f"http://localhost:5173/profile", "Ver mi Inscripción")
-            plain_message = strip_tags(html_message)
+    html_message = get_html_template(subject, body, f"http://localhost:5173/profile", "Ver mi Inscripción")
+    return subject, strip_tags(html_message), html_message
+
+def send_workshop_update_notification(taller, clientes, old_date, old_time):
+    """
+    Send email to enrolled clients when workshop date/time changes.
+    """
+    print(f"DEBUG: send_workshop_update_notification called for {taller.nombre}")
+    try:
+        for cliente in clientes:
+            print(f"DEBUG: Sending update email to {cliente.email}")
+            subject, plain_message, html_message = build_workshop_update_email(taller, cliente, old_date, old_time)
             
             send_mail(
                 subject,
@@ -574,3 +639,158 @@ def send_workshop_update_notification(taller, clientes, old_date, old_time):
     except Exception as e:
         print(f"DEBUG: Error sending update notification: {e}")
         return False
+
+def build_notification_digest_email(cliente, eventos):
+    """
+    Returns (subject, plain_message, html_message) summarising every queued
+    NotificacionPendiente of one client in a single email.
+    Several events for the same workshop collapse into one line: a new workshop
+    already shows its current schedule, and repeated reschedules show the
+    original date next to the latest one.
+    """
+    from datetime import date, time
+
+    nuevos = {}
+    cambios = {}
+    for evento in eventos:
+        if evento.tipo == 'NUEVO_TALLER':
+            nuevos[evento.taller_id] = evento.taller
+        else:
+            # Keep the earliest event: it holds the schedule the client last heard about
+            cambios.setdefault(evento.taller_id, evento)
+    for taller_id in nuevos:
+        cambios.pop(taller_id, None)
+
+    def horario(fecha, hora):
+        return f"{fecha.strftime('%d de %B de %Y')} a las {hora.strftime('%H:%M') if hora else 'Por confirmar'}"
+
+    secciones = []
+    if nuevos:
+        lineas = [
+            f"- <strong>{taller.nombre}</strong>: {horario(taller.fecha_taller, taller.hora_taller)} ({taller.modalidad})"
+            for taller in nuevos.values()
+        ]
+        secciones.append("<strong>Nuevos talleres que te podrían interesar:</strong>\n" + "\n".join(lineas))
+    if cambios:
+        lineas = []
+        for evento in cambios.values():
+            taller = evento.taller
+            old_date = date.fromisoformat(evento.datos['old_date'])
+            old_time = time.fromisoformat(evento.datos['old_time']) if evento.datos.get('old_time') else None
+            lineas.append(
+                f"- <strong>{taller.nombre}</strong>: ahora el {horario(taller.fecha_taller, taller.hora_taller)} "
+                f"(anteriormente: {horario(old_date, old_time)})"
+            )
+        secciones.append("<strong>Cambios en tus talleres:</strong>\n" + "\n".join(lineas))
+
+    talleres = list(nuevos.values()) + [evento.taller for evento in cambios.values()]
+    subject = f'Novedades: {talleres[0].nombre}' if len(talleres) == 1 else 'Novedades de TMM Bienestar'
+    body = f"""
+            Hola {cliente.nombre_completo},
+            
+            Te contamos las novedades de nuestros talleres:
+            
+            {chr(10).join(secciones)}
+            
+            Si tienes dudas, por favor contáctanos.
+            """
+    html_message = get_html_template(subject, body, "http://localhost:5173/talleres", "Ver Talleres")
+    return subject, strip_tags(html_message), html_message
+
+def send_notification_digests(batch_size=1000):
+    """
+    Sends one digest email per client with pending notifications, reusing a
+    single SMTP connection for the whole run. Events are marked as sent only
+    when their email was accepted; failed clients are retried on the next run.
+    Returns the number of digest emails sent.
+    """
+    from itertools import groupby
+    from django.core.mail import EmailMultiAlternatives, get_connection
+    from .models import NotificacionPendiente
+
+    pendientes = (
+        NotificacionPendiente.objects
+        .filter(enviado_en__isnull=True)
+        .select_related('cliente', 'taller')
+        .order_by('cliente_id', 'creado_en')
+    )
+
+    sent = 0
+    sent_ids = []
+    logs = []
+
+    def flush():
+        # Se guarda lo ya enviado cada batch_size clientes: un corte a mitad de corrida no reenvía esos resúmenes
+        now = timezone.now()
+        for start in range(0, len(sent_ids), batch_size):
+            NotificacionPendiente.objects.filter(id__in=sent_ids[start:start + batch_size]).update(enviado_en=now)
+        EmailLog.objects.bulk_create(logs, batch_size=batch_size)
+        sent_ids.clear()
+        logs.clear()
+
+    connection = get_connection()
+    connection.open()
+    try:
+        for _, grupo in groupby(pendientes.iterator(chunk_size=batch_size), key=lambda p: p.cliente_id):
+            eventos = list(grupo)
+            cliente = eventos[0].cliente
+            subject, plain_message, html_message = build_notification_digest_email(cliente, eventos)
+            message = EmailMultiAlternatives(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [cliente.email], connection=connection)
+            message.attach_alternative(html_message, 'text/html')
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.exception(f"Error sending digest to {cliente.email}")
+                logs.append(EmailLog(recipient=cliente.email, subject=subject, body_text=plain_message, status='FAIL', error_message=str(e)))
+            else:
+                sent_ids.extend(evento.id for evento in eventos)
+                logs.append(EmailLog(recipient=cliente.email, subject=subject, body_text=plain_message, status='SUCCESS'))
+                sent += 1
+            if len(logs) >= batch_size:
+                flush()
+    finally:
+        connection.close()
+        flush()
+
+    return sent
+
+def send_low_stock_alert(producto_ids):
+    """
+    Notifies staff of products that just crossed their low-stock threshold.
+    One email per batch of newly opened alerts, sent to every staff user with an email.
+    """
+    from django.contrib.auth.models import User
+    from .models import Producto
+
+    recipients = list(
+        User.objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    productos = list(Producto.objects.filter(id__in=producto_ids).order_by('stock_actual', 'nombre'))
+    if not recipients or not productos:
+        return False
+
+    subject = f'Stock bajo: {len(productos)} producto(s)'
+    filas = "".join(
+        f"<li><strong>{p.nombre}</strong>: {p.stock_actual} unidades (umbral {p.stock_critico})</li>"
+        for p in productos
+    )
+    body = f"""
+        Los siguientes productos quedaron bajo su stock crítico:
+        <ul>{filas}</ul>
+        """
+    html_message = get_html_template(subject, body, "http://localhost:5173/admin/productos", "Ver Inventario")
+    plain_message = strip_tags(html_message)
+    try:
+        send_mail(subject, plain_message, settings.DEFAULT_FROM_EMAIL, recipients,
+                  html_message=html_message, fail_silently=False)
+    except Exception as e:
+        logger.exception("Error sending low stock alert")
+        EmailLog.objects.bulk_create([
+            EmailLog(recipient=email, subject=subject, body_text=plain_message, status='FAIL', error_message=str(e))
+            for email in recipients
+        ])
+        return False
+    EmailLog.objects.bulk_create([
+        EmailLog(recipient=email, subject=subject, body_text=plain_message, status='SUCCESS') for email in recipients
+    ])
+    return True
@@ -0,0 +1,162 @@
+"""
+Exports en segundo plano para tablas que no conviene generar dentro del request.
+
+`request_export` normaliza el pedido (modelo, formato, filtros) y crea un
+ExportJob PENDIENTE; si ya hay uno activo con la misma huella lo devuelve en vez
+de crear otro (índice único parcial, mismo patrón que api/idempotency.py).
+`run_export_jobs` los genera fuera del request con los mismos generadores de
+api/exports.py, escribe el archivo en MEDIA_ROOT/exports/ y va guardando las
+filas procesadas para que el admin vea el avance.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .exports import CHUNK_SIZE, build_export, filtros_validos, write_csv, write_xlsx
+from .models import ExportJob
+
+logger = logging.getLogger('api')
+
+EXTENSIONES = {'csv': 'csv', 'excel': 'xlsx'}
+FILTROS_FECHA = ('start_date', 'end_date')
+
+
+def normalize_request(modelo, formato, filtros):
+    """
+    Devuelve (filtros normalizados, huella). Los filtros vacíos o desconocidos se
+    descartan para que pedidos equivalentes compartan huella. ValueError si el
+    pedido no es válido.
+    """
+    permitidos = filtros_validos(modelo)
+    if permitidos is None:
+        raise ValueError("Modelo no válido")
+    if formato not in EXTENSIONES:
+        raise ValueError("Formato no válido")
+    if not isinstance(filtros, dict):
+        raise ValueError("Los filtros deben ser un objeto")
+
+    normalizados = {}
+    for clave in permitidos:
+        valor = filtros.get(clave)
+        if valor in (None, ''):
+            continue
+        valor = str(valor)
+        if clave in FILTROS_FECHA and parse_date(valor) is None:
+            raise ValueError(f"Fecha no válida en '{clave}': {valor}")
+        normalizados[clave] = valor
+
+    raw = json.dumps({'modelo': modelo, 'formato': formato, 'filtros': normalizados}, sort_keys=True)
+    return normalizados, hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def request_export(usuario, modelo, formato='csv', filtros=None):
+    """Devuelve (job, creado). Un pedido idéntico a un job activo se une a ese job."""
+    filtros, huella = normalize_request(modelo, formato, filtros or {})
+    try:
+        with transaction.atomic():
+            return ExportJob.objects.create(
+                usuario=usuario, modelo=modelo, formato=formato, filtros=filtros, huella=huella
+            ), True
+    except IntegrityError:
+        pass
+
+    job = ExportJob.objects.filter(huella=huella, estado__in=ExportJob.ACTIVOS).first()
+    if job is None:
+        # El job activo terminó entre el INSERT y la lectura: se crea uno nuevo
+        return request_export(usuario, modelo, formato, filtros)
+    return job, False
+
+
+def _claim_batch(batch_size):
+    """
+    Toma jobs PENDIENTE (o EN_PROCESO abandonados por un worker caído) saltando
+    los que otro worker tiene bloqueados, y los marca EN_PROCESO.
+    """
+    now = timezone.now()
+    abandonado = now - timedelta(minutes=settings.EXPORT_JOB_STALE_MINUTES)
+    with transaction.atomic():
+        jobs = list(
+            ExportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(estado='PENDIENTE') | Q(estado='EN_PROCESO', actualizado_en__lt=abandonado))
+            .order_by('creado_en', 'id')[:batch_size]
+        )
+        if jobs:
+            ExportJob.objects.filter(id__in=[j.id for j in jobs]).update(
+                estado='EN_PROCESO', filas_procesadas=0, actualizado_en=now
+            )
+    return jobs
+
+
+def _with_progress(job, rows):
+    """Pasa las filas tal cual, guardando el avance (y el latido) cada CHUNK_SIZE filas."""
+    procesadas = 0
+    for row in rows:
+        yield row
+        procesadas += 1
+        if procesadas % CHUNK_SIZE == 0:
+            ExportJob.objects.filter(pk=job.pk).update(filas_procesadas=procesadas, actualizado_en=timezone.now())
+    job.filas_procesadas = procesadas
+
+
+def generate(job):
+    """Genera el archivo del job y lo guarda en el storage (MEDIA_ROOT/exports/)."""
+    header, rows = build_export(job.modelo, job.filtros)
+    rows = _with_progress(job, rows)
+    with tempfile.TemporaryFile() as archivo:
+        if job.formato == 'excel':
+            write_xlsx(archivo, header, rows, sheet_title=job.modelo.capitalize())
+        else:
+            write_csv(archivo, header, rows)
+        archivo.seek(0)
+        # Nombre no adivinable: MEDIA_URL puede quedar expuesto por el servidor web
+        nombre = f"{job.modelo}_{timezone.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:12]}.{EXTENSIONES[job.formato]}"
+        job.archivo.save(nombre, File(archivo), save=False)
+
+
+def run_export_jobs(batch_size=10):
+    """
+    Procesa todos los jobs pendientes, `batch_size` a la vez.
+    Devuelve (completados, fallidos) de esta corrida.
+    """
+    completados = fallidos = 0
+    while True:
+        jobs = _claim_batch(batch_size)
+        if not jobs:
+            break
+        for job in jobs:
+            try:
+                generate(job)
+            except Exception as e:
+                logger.exception(f"Export job {job.id} ({job.modelo}) failed")
+                job.estado = 'FALLIDO'
+                job.error = str(e)
+                fallidos += 1
+            else:
+                job.estado = 'COMPLETADO'
+                job.error = ''
+                completados += 1
+            job.terminado_en = job.actualizado_en = timezone.now()
+            job.save(update_fields=['estado', 'error', 'archivo', 'filas_procesadas', 'terminado_en', 'actualizado_en'])
+    return completados, fallidos
+
+
+def purge_expired_exports():
+    """Borra los jobs terminados hace más de EXPORT_JOB_TTL_HOURS junto con su archivo."""
+    limite = timezone.now() - timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+    vencidos = list(ExportJob.objects.filter(estado__in=['COMPLETADO', 'FALLIDO'], terminado_en__lt=limite))
+    for job in vencidos:
+        if job.archivo:
+            job.archivo.delete(save=False)
+    ExportJob.objects.filter(id__in=[j.id for j in vencidos]).delete()
+    return len(vencidos)
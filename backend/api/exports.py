@@ -0,0 +1,317 @@
+"""
+Exportaciones en streaming: cada export es un encabezado y un generador de filas
+que lee la BD por bloques (`.values_list().iterator(chunk_size)`) con los datos
+relacionados resueltos en la misma consulta. La memoria no crece con la tabla y
+el primer byte sale apenas llega el primer bloque. El mismo generador alimenta
+el CSV y el XLSX (openpyxl en modo write_only, vía archivo temporal).
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, CharField, IntegerField, OuterRef, Q, Subquery, When
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from .models import Cliente, Curso, DetalleOrden, Enrollment, Orden, Producto, Taller, Transaccion
+
+CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve cada línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(filename, header, rows):
+    response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class FileFormatNegotiation(DefaultContentNegotiation):
+    """
+    En las vistas de exportación `?format=` elige el archivo (csv/excel), no el
+    renderer de DRF: sin esto DRF responde 404 a `format=excel`.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def _celda_xlsx(value):
+    # Excel no guarda zonas horarias: fechas con zona pasan a la hora local
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_csv(archivo, header, rows):
+    """Escribe el CSV en un archivo binario abierto, fila por fila."""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8', newline='')
+    writer = csv.writer(texto)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+    texto.flush()
+    texto.detach()
+
+
+def write_xlsx(archivo, header, rows, sheet_title='Datos'):
+    """
+    XLSX con openpyxl en modo write_only: cada fila se escribe al disco apenas se
+    agrega y el libro se arma al guardar, sin tener la hoja completa en memoria.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(header)
+    for row in rows:
+        sheet.append([_celda_xlsx(value) for value in row])
+    workbook.save(archivo)
+
+
+def xlsx_response(filename, header, rows, sheet_title='Datos'):
+    """
+    El libro terminado (un archivo temporal) se devuelve en bloques con
+    FileResponse, que lo cierra y borra al terminar.
+    """
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_xlsx(archivo, header, rows, sheet_title)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        bloque = list(islice(iterator, size))
+        if not bloque:
+            return
+        yield bloque
+
+
+def item_annotations(prefix=''):
+    """
+    Nombre y categoría del taller/curso de una inscripción (GenericForeignKey) como
+    subconsultas, para no cargar `content_object` fila por fila. `prefix` es el
+    camino a la inscripción (p. ej. 'inscripcion__' desde Transaccion).
+    """
+    object_id = OuterRef(f'{prefix}object_id')
+    es_taller = Q(**{f'{prefix}content_type': ContentType.objects.get_for_model(Taller)})
+    es_curso = Q(**{f'{prefix}content_type': ContentType.objects.get_for_model(Curso)})
+
+    def por_tipo(campo_taller, campo_curso, output_field):
+        return Case(
+            When(es_taller, then=Subquery(Taller.objects.filter(pk=object_id).values(campo_taller)[:1])),
+            When(es_curso, then=Subquery(Curso.objects.filter(pk=object_id).values(campo_curso)[:1])),
+            default=None,
+            output_field=output_field,
+        )
+
+    return {
+        'item_nombre': por_tipo('nombre', 'titulo', CharField()),
+        'item_categoria_id': por_tipo('categoria_id', 'categoria_id', IntegerField()),
+        'item_categoria': por_tipo('categoria__nombre', 'categoria__nombre', CharField()),
+    }
+
+
+def _si_no(valor):
+    return 'Si' if valor else 'No'
+
+
+# --- ExportDataView: (encabezado, filas) por modelo ---
+
+def export_clientes(client_type=None):
+    queryset = Cliente.objects.order_by('pk')
+    if client_type:
+        queryset = queryset.filter(tipo_cliente=client_type)
+    ciclos = dict(Cliente.ESTADO_LIFECYCLE_CHOICES)
+    origenes = dict(Cliente.ORIGEN_CHOICES)
+    header = ['Nombre', 'Email', 'Telefono', 'Tipo', 'Empresa', 'Ciclo', 'Origen', 'Fecha Registro']
+    rows = (
+        (nombre, email, telefono, tipo, empresa or '', ciclos.get(ciclo, ciclo), origenes.get(origen, origen),
+         fecha.strftime('%Y-%m-%d'))
+        for nombre, email, telefono, tipo, empresa, ciclo, origen, fecha in queryset.values_list(
+            'nombre_completo', 'email', 'telefono', 'tipo_cliente', 'empresa__razon_social',
+            'estado_ciclo', 'origen', 'fecha_registro',
+        ).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, rows
+
+
+def export_talleres(client_type=None):
+    queryset = Taller.objects.order_by('pk')
+    if client_type:
+        queryset = queryset.filter(Q(tipo_cliente=client_type) | Q(tipo_cliente='AMBOS'))
+    header = ['Nombre', 'Fecha', 'Modalidad', 'Precio', 'Cupos Totales', 'Cupos Disponibles', 'Tipo Cliente']
+    rows = queryset.values_list(
+        'nombre', 'fecha_taller', 'modalidad', 'precio', 'cupos_totales', 'cupos_disponibles', 'tipo_cliente'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return header, rows
+
+
+def export_cursos(client_type=None):
+    queryset = Curso.objects.order_by('pk')
+    if client_type:
+        queryset = queryset.filter(Q(tipo_cliente=client_type) | Q(tipo_cliente='AMBOS'))
+    header = ['Titulo', 'Precio', 'Duracion', 'Categoria', 'Activo', 'Rating', 'Tipo Cliente']
+    rows = (
+        (titulo, precio, duracion, categoria or '', _si_no(activo), rating, tipo)
+        for titulo, precio, duracion, categoria, activo, rating, tipo in queryset.values_list(
+            'titulo', 'precio', 'duracion', 'categoria__nombre', 'esta_activo', 'rating', 'tipo_cliente'
+        ).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, rows
+
+
+def export_productos(client_type=None):
+    header = ['Nombre', 'Precio', 'Stock', 'Disponible', 'Fisico', 'Descripcion']
+    rows = (
+        (nombre, precio, stock, _si_no(disponible), _si_no(fisico), descripcion)
+        for nombre, precio, stock, disponible, fisico, descripcion in Producto.objects.order_by('pk').values_list(
+            'nombre', 'precio_venta', 'stock_actual', 'esta_disponible', 'es_fisico', 'descripcion'
+        ).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, rows
+
+
+def export_ingresos(client_type=None):
+    taller_ct = ContentType.objects.get_for_model(Taller).id
+    queryset = Transaccion.objects.order_by('-fecha', '-pk').annotate(**item_annotations('inscripcion__'))
+    header = ['ID Transaccion', 'Fecha', 'Cliente', 'Item', 'Monto', 'Estado', 'Observacion']
+
+    def rows():
+        for (id_, fecha, inscripcion_id, ct_id, item_nombre, cliente_insc,
+             orden_id, cliente_orden, monto, estado, observacion) in queryset.values_list(
+                'id', 'fecha', 'inscripcion_id', 'inscripcion__content_type_id', 'item_nombre',
+                'inscripcion__cliente__nombre_completo', 'orden_id', 'orden__cliente__nombre_completo',
+                'monto', 'estado', 'observacion',
+        ).iterator(chunk_size=CHUNK_SIZE):
+            if inscripcion_id:
+                item = f"{'Taller' if ct_id == taller_ct else 'Curso'}: {item_nombre}"
+                cliente = cliente_insc
+            elif orden_id:
+                item = f"Orden #{orden_id}"
+                cliente = cliente_orden
+            else:
+                item, cliente = "Desconocido", 'Unknown'
+            yield (id_, fecha.strftime('%Y-%m-%d %H:%M') if fecha else '', cliente, item, monto, estado, observacion)
+
+    return header, rows()
+
+
+EXPORTS = {
+    'clientes': export_clientes,
+    'talleres': export_talleres,
+    'cursos': export_cursos,
+    'productos': export_productos,
+    'ingresos': export_ingresos,
+}
+
+
+# --- AdminTransactionListView ---
+
+TRANSACTION_CSV_HEADER = ['ID', 'Fecha', 'Cliente', 'Email', 'Item/Concepto', 'Monto', 'Estado', 'Tipo']
+
+
+def admin_transaction_rows(transaction_type, status_filter=None, start_date=None, end_date=None, category_id=None):
+    """
+    Filas del listado de transacciones del admin, ya ordenadas por fecha descendente
+    en la BD. Generador: el listado JSON lo materializa, el export CSV lo transmite.
+    """
+    if transaction_type in ('services', 'pending'):
+        queryset = Enrollment.objects.annotate(**item_annotations())
+        # 'pending' fuerza PENDIENTE; 'services' respeta el filtro o muestra PAGADO por defecto
+        if transaction_type == 'pending':
+            queryset = queryset.filter(estado_pago='PENDIENTE')
+        else:
+            queryset = queryset.filter(estado_pago=status_filter or 'PAGADO')
+        if start_date:
+            queryset = queryset.filter(fecha_inscripcion__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(fecha_inscripcion__date__lte=end_date)
+        if category_id:
+            queryset = queryset.filter(item_categoria_id=category_id) if str(category_id).isdigit() else queryset.none()
+
+        for id_, fecha, cliente, cliente_id, email, item, categoria, monto, estado in queryset.order_by(
+                '-fecha_inscripcion', '-pk').values_list(
+                'id', 'fecha_inscripcion', 'cliente__nombre_completo', 'cliente_id', 'cliente__email',
+                'item_nombre', 'item_categoria', 'monto_pagado', 'estado_pago',
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                'id': id_, 'date': fecha, 'client': cliente, 'client_id': cliente_id, 'email': email,
+                'item': item or "Desconocido", 'category': categoria or "Sin Categoría",
+                'amount': monto, 'status': estado, 'type': 'Inscripción',
+            }
+
+    elif transaction_type == 'products':
+        queryset = Orden.objects.all()
+        if status_filter:
+            queryset = queryset.filter(estado_pago=status_filter)
+        if start_date:
+            queryset = queryset.filter(fecha__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(fecha__date__lte=end_date)
+        ordenes = queryset.order_by('-fecha', '-pk').values_list(
+            'id', 'fecha', 'cliente__nombre_completo', 'cliente_id', 'cliente__email', 'monto_total', 'estado_pago'
+        ).iterator(chunk_size=CHUNK_SIZE)
+
+        # Detalle de productos: una consulta por bloque de órdenes, no una por orden
+        for bloque in chunks(ordenes):
+            items = {}
+            for orden_id, cantidad, producto in DetalleOrden.objects.filter(
+                    orden_id__in=[o[0] for o in bloque]).order_by('pk').values_list('orden_id', 'cantidad', 'producto__nombre'):
+                items.setdefault(orden_id, []).append(f"{cantidad}x {producto}")
+            for id_, fecha, cliente, cliente_id, email, monto, estado in bloque:
+                yield {
+                    'id': id_, 'date': fecha, 'client': cliente, 'client_id': cliente_id, 'email': email,
+                    'item': ", ".join(items.get(id_, [])), 'amount': monto, 'status': estado, 'type': 'Orden',
+                }
+
+
+def admin_transaction_csv(rows):
+    for row in rows:
+        yield (row['id'], row['date'].strftime('%Y-%m-%d %H:%M'), row['client'], row['email'],
+               row['item'], row['amount'], row['status'], row['type'])
+
+
+# Filtros que acepta cada export (ExportDataView y AdminTransactionListView)
+FILTROS_EXPORT = ('type',)
+FILTROS_TRANSACCIONES = ('type', 'status', 'start_date', 'end_date', 'category')
+
+
+def filtros_validos(modelo):
+    if modelo in EXPORTS:
+        return FILTROS_EXPORT
+    if modelo == 'transacciones':
+        return FILTROS_TRANSACCIONES
+    return None
+
+
+def build_export(modelo, filtros):
+    """(encabezado, filas) de un export por nombre, con filtros ya normalizados."""
+    if modelo == 'transacciones':
+        rows = admin_transaction_rows(
+            filtros.get('type'), status_filter=filtros.get('status'), start_date=filtros.get('start_date'),
+            end_date=filtros.get('end_date'), category_id=filtros.get('category'),
+        )
+        return TRANSACTION_CSV_HEADER, admin_transaction_csv(rows)
+    return EXPORTS[modelo](filtros.get('type'))
@@ -0,0 +1,131 @@
+"""
+Soporte para la cabecera `Idempotency-Key` en POST que los clientes móviles reintentan.
+
+La primera solicitud reclama la clave (fila EN_CURSO, única por usuario/endpoint/clave),
+ejecuta la vista y guarda su respuesta. Los reintentos con la misma clave reciben esa
+respuesta sin volver a ejecutar la operación; si la original sigue en curso reciben 409.
+Las respuestas 5xx y las excepciones liberan la clave para que el reintento se ejecute.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger('api')
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """sha256 del cuerpo ya parseado; los archivos cuentan por nombre y tamaño."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    data = dict(data) if isinstance(data, dict) else data
+    for key, upload in request.FILES.lists():
+        data[key] = [(f.name, f.size) for f in upload]
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _claim(user, endpoint, clave, huella):
+    """Devuelve (registro, creado). Una clave vencida se trata como nueva."""
+    expira = timezone.now() + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                usuario=user, endpoint=endpoint, clave=clave, huella=huella, expira_en=expira
+            ), True
+    except IntegrityError:
+        pass
+
+    registro = IdempotencyKey.objects.get(usuario=user, endpoint=endpoint, clave=clave)
+    if registro.expira_en > timezone.now():
+        return registro, False
+    # Vencida y aún no purgada: se reutiliza solo si nadie la reclamó antes que nosotros
+    reclamada = IdempotencyKey.objects.filter(id=registro.id, expira_en=registro.expira_en).update(
+        huella=huella, estado='EN_CURSO', status_code=None, respuesta=None, expira_en=expira
+    )
+    if reclamada:
+        registro.refresh_from_db()
+        return registro, True
+    return IdempotencyKey.objects.get(id=registro.id), False
+
+
+def _replay(registro, huella):
+    if registro.huella != huella:
+        return Response(
+            {"error": f"La {HEADER} ya se usó con otra solicitud"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if registro.estado == 'EN_CURSO':
+        return Response(
+            {"error": "Una solicitud con esta Idempotency-Key aún se está procesando"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    response = Response(registro.respuesta, status=registro.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(endpoint):
+    """
+    Decorador para métodos de vista (`post`, `create`). Sin cabecera la vista
+    se ejecuta como siempre; con cabecera la operación corre una sola vez.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            clave = request.headers.get(HEADER)
+            if not clave or not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+            if len(clave) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{HEADER} no puede superar {MAX_KEY_LENGTH} caracteres"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            huella = request_fingerprint(request)
+            registro, creado = _claim(request.user, endpoint, clave, huella)
+            if not creado:
+                logger.info(f"Idempotency: replaying {endpoint} key {clave} for user {request.user.id}")
+                return _replay(registro, huella)
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                registro.delete()
+                raise
+            if response.status_code >= 500:
+                registro.delete()
+                return response
+
+            IdempotencyKey.objects.filter(id=registro.id).update(
+                estado='COMPLETADA', status_code=response.status_code, respuesta=response.data
+            )
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired(batch_size=5000):
+    """Borra hasta `batch_size` claves vencidas con un solo DELETE. Devuelve cuántas."""
+    ids = list(
+        IdempotencyKey.objects.filter(expira_en__lte=timezone.now())
+        .order_by('expira_en')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+    return deleted
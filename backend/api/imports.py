@@ -0,0 +1,253 @@
+"""
+Importación masiva desde planillas (ImportDataView).
+
+`read_rows` lee la planilla en streaming (CSV por bloques, XLSX fila a fila) y
+las filas se procesan por bloques de CHUNK_SIZE: cada bloque se valida en Python
+(fila por fila, para reportar errores por fila), precarga en una consulta las
+claves que ya existen y escribe con un solo upsert
+(`bulk_create(update_conflicts=True)`), en vez de un `update_or_create` por fila.
+Los cambios de stock de productos pasan igual por el kardex y las alertas.
+"""
+import math
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .exports import chunks
+from .models import Cliente, Curso, Producto, Taller
+
+CHUNK_SIZE = 1000
+VERDADERO = ('si', 'yes', 'true', '1')
+
+# fila: arma los campos del modelo desde la fila de la planilla (None = fila sin clave, se omite)
+Importacion = namedtuple('Importacion', 'modelo clave fila actualizar')
+
+
+def _valor(row, columna, default=None):
+    """Celda de la planilla; las vacías (NaN de pandas, '') toman el default."""
+    valor = row.get(columna)
+    if valor is None or valor == '' or (isinstance(valor, float) and math.isnan(valor)):
+        return default
+    # Números enteros leídos como float (teléfonos, precios): sin el '.0'
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _booleano(row, columna, default='Si'):
+    return str(_valor(row, columna, default)).lower() in VERDADERO
+
+
+def fila_cliente(row):
+    email = _valor(row, 'Email')
+    if not email:
+        return None
+    return {
+        'email': email,
+        'nombre_completo': _valor(row, 'Nombre', 'Sin Nombre'),
+        'telefono': _valor(row, 'Telefono', ''),
+        'tipo_cliente': _valor(row, 'Tipo', 'B2C'),
+    }
+
+
+def fila_taller(row):
+    nombre = _valor(row, 'Nombre')
+    if not nombre:
+        return None
+    cupos = _valor(row, 'Cupos', 10)
+    return {
+        'nombre': nombre,
+        'fecha_taller': _valor(row, 'Fecha'),  # YYYY-MM-DD
+        'hora_taller': _valor(row, 'Hora', '10:00'),
+        'precio': _valor(row, 'Precio', 0),
+        'cupos_totales': cupos,
+        'cupos_disponibles': cupos,
+        'modalidad': _valor(row, 'Modalidad', 'PRESENCIAL'),
+        'tipo_cliente': _valor(row, 'Tipo Cliente', 'AMBOS'),
+    }
+
+
+def fila_curso(row):
+    titulo = _valor(row, 'Titulo')
+    if not titulo:
+        return None
+    return {
+        'titulo': titulo,
+        'precio': _valor(row, 'Precio', 0),
+        'duracion': _valor(row, 'Duracion', '0 horas'),
+        'descripcion': _valor(row, 'Descripcion', ''),
+        'tipo_cliente': _valor(row, 'Tipo Cliente', 'AMBOS'),
+        'esta_activo': _booleano(row, 'Activo'),
+    }
+
+
+def fila_producto(row):
+    nombre = _valor(row, 'Nombre')
+    if not nombre:
+        return None
+    return {
+        'nombre': nombre,
+        'precio_venta': _valor(row, 'Precio', 0),
+        'stock_actual': _valor(row, 'Stock', 0),
+        'descripcion': _valor(row, 'Descripcion', ''),
+        'esta_disponible': _booleano(row, 'Disponible'),
+        'es_fisico': _booleano(row, 'Fisico'),
+    }
+
+
+IMPORTS = {
+    'clientes': Importacion(Cliente, 'email', fila_cliente, ('nombre_completo', 'telefono', 'tipo_cliente')),
+    'talleres': Importacion(Taller, 'nombre', fila_taller, (
+        'fecha_taller', 'hora_taller', 'precio', 'cupos_totales', 'cupos_disponibles', 'modalidad', 'tipo_cliente',
+    )),
+    'cursos': Importacion(Curso, 'titulo', fila_curso, (
+        'precio', 'duracion', 'descripcion', 'tipo_cliente', 'esta_activo',
+    )),
+    'productos': Importacion(Producto, 'nombre', fila_producto, (
+        'precio_venta', 'stock_actual', 'descripcion', 'esta_disponible', 'es_fisico',
+    )),
+}
+
+
+def rows_from_frame(df, start=1):
+    """(número de fila, dict columna -> valor) de un DataFrame, sin iterrows()."""
+    columnas = list(df.columns)
+    for numero, valores in enumerate(df.itertuples(index=False, name=None), start=start):
+        yield numero, dict(zip(columnas, valores))
+
+
+def _csv_rows(archivo, chunk_size):
+    import pandas as pd
+
+    numero = 1
+    for df in pd.read_csv(archivo, chunksize=chunk_size):
+        yield from rows_from_frame(df, start=numero)
+        numero += len(df)
+
+
+def _xlsx_rows(archivo):
+    """Primera hoja con openpyxl en modo read_only: las filas se leen del zip a medida que se piden."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = workbook.active.iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else None for c in next(filas, ())]
+        for numero, valores in enumerate(filas, start=1):
+            yield numero, {columna: valor for columna, valor in zip(encabezado, valores) if columna}
+    finally:
+        workbook.close()
+
+
+def read_rows(archivo, chunk_size=CHUNK_SIZE):
+    """
+    Filas (número, dict) de la planilla subida, sin cargarla entera en memoria:
+    CSV por bloques de `chunk_size` con pandas y XLSX fila a fila con openpyxl.
+    El archivo se lee directo desde el upload (en disco si superó el umbral de Django).
+    ValueError si la extensión no es soportada.
+    """
+    nombre = archivo.name.lower()
+    if nombre.endswith('.csv'):
+        return _csv_rows(archivo, chunk_size)
+    if nombre.endswith('.xlsx'):
+        return _xlsx_rows(archivo)
+    if nombre.endswith('.xls'):
+        # Formato binario antiguo: openpyxl no lo lee, se mantiene pandas (xlrd)
+        import pandas as pd
+        return rows_from_frame(pd.read_excel(archivo))
+    raise ValueError("Formato no soportado. Use CSV o Excel.")
+
+
+def _mensaje(error):
+    if hasattr(error, 'message_dict'):
+        return '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in error.message_dict.items())
+    return str(error)
+
+
+def _registrar_kardex(objetos, previos, referencia):
+    """Movimientos IMPORTACION y alertas de stock: el upsert no pasa por save() ni por los signals."""
+    from .services import CambioStock, KardexService, NivelStock
+
+    cambios = []
+    for nombre, producto in objetos.items():
+        previo = previos.get(nombre)
+        if previo is None:
+            cambios.append(CambioStock(producto.pk, None, NivelStock(
+                producto.stock_actual, producto.stock_critico, producto.controlar_stock)))
+        elif previo.stock_actual != producto.stock_actual:
+            antes = NivelStock(*(getattr(previo, f) for f in Producto.tracked_fields))
+            cambios.append(CambioStock(producto.pk, antes, antes._replace(stock_actual=producto.stock_actual)))
+    KardexService.record(cambios, 'IMPORTACION', referencia=referencia)
+
+
+def _import_chunk(spec, bloque, resultado, referencia):
+    modelo, clave = spec.modelo, spec.clave
+    campos_modelo = [f.name for f in modelo._meta.concrete_fields]
+
+    # La última fila con la misma clave gana, como en el update_or_create fila a fila
+    objetos, filas = {}, 0
+    for numero, row in bloque:
+        try:
+            campos = spec.fila(row)
+            if campos is None:
+                continue
+            objeto = modelo(**campos)
+            # Conversión y validadores por campo; los textos vacíos se aceptan como antes
+            objeto.clean_fields(exclude=[f for f in campos_modelo if campos.get(f, '') == ''])
+        except (ValidationError, TypeError, ValueError) as e:
+            resultado['errors'].append(f"Fila {numero}: {_mensaje(e)}")
+            continue
+        objetos[getattr(objeto, clave)] = objeto
+        filas += 1
+    if not objetos:
+        return
+
+    extra = Producto.tracked_fields if modelo is Producto else ()
+    with transaction.atomic():
+        # Una consulta por bloque para saber qué claves ya existen. Las filas quedan bloqueadas
+        # (en orden de pk) hasta el upsert: el stock previo que va al kardex no puede cambiar
+        # entremedio por una venta concurrente
+        previos = {}
+        existentes_qs = modelo.objects.filter(**{f'{clave}__in': list(objetos)}).only(clave, *extra)
+        for o in existentes_qs.select_for_update().order_by('pk'):
+            previos.setdefault(getattr(o, clave), o)
+
+        if modelo._meta.get_field(clave).unique:
+            modelo.objects.bulk_create(
+                list(objetos.values()), update_conflicts=True, unique_fields=[clave], update_fields=list(spec.actualizar)
+            )
+        else:
+            # Curso.titulo no es único en la BD: nuevos con bulk_create, existentes con bulk_update
+            existentes = []
+            for valor, objeto in objetos.items():
+                if valor in previos:
+                    objeto.pk = previos[valor].pk
+                    existentes.append(objeto)
+            modelo.objects.bulk_create([o for o in objetos.values() if o.pk is None])
+            modelo.objects.bulk_update(existentes, list(spec.actualizar))
+
+        if modelo is Producto:
+            sin_pk = [valor for valor, objeto in objetos.items() if objeto.pk is None]
+            if sin_pk:
+                # Backends que no devuelven ids desde un upsert
+                pks = dict(modelo.objects.filter(**{f'{clave}__in': sin_pk}).values_list(clave, 'pk'))
+                for valor in sin_pk:
+                    objetos[valor].pk = pks[valor]
+            _registrar_kardex(objetos, previos, referencia)
+
+    nuevos = sum(1 for valor in objetos if valor not in previos)
+    resultado['created'] += nuevos
+    resultado['updated'] += filas - nuevos
+
+
+def import_rows(model_name, rows, referencia='Importación', chunk_size=CHUNK_SIZE):
+    """
+    Importa filas (número, dict) en bloques. Devuelve {'created', 'updated', 'errors'}.
+    Las filas inválidas se reportan y se omiten sin detener la importación.
+    """
+    spec = IMPORTS[model_name]
+    resultado = {'created': 0, 'updated': 0, 'errors': []}
+    for bloque in chunks(rows, chunk_size):
+        _import_chunk(spec, bloque, resultado, referencia)
+    return resultado
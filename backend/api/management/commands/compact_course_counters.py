@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.services import CourseCounterService
+
+
+class Command(BaseCommand):
+    help = 'Folds pending course enrollment deltas into Curso.estudiantes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            compacted = CourseCounterService.compact(batch_size=options['batch_size'])
+            if not compacted:
+                break
+            total += compacted
+        self.stdout.write(self.style.SUCCESS(f'Compacted {total} course counter deltas'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.webhooks import dispatch_pending_webhooks
+
+
+class Command(BaseCommand):
+    help = 'Delivers pending outbound webhooks (WebhookOutbox) with retries and exponential backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        sent, failed = dispatch_pending_webhooks(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Webhooks sent: {sent}, failed attempts: {failed}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.services import WaitlistService
+
+
+class Command(BaseCommand):
+    help = 'Expires waitlist seat holds and passes each seat to the next person in line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            expired = WaitlistService.expire_holds(batch_size=options['batch_size'])
+            if not expired:
+                break
+            total += expired
+        self.stdout.write(self.style.SUCCESS(f'Expired {total} waitlist holds'))
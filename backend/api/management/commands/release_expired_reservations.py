@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.services import StockReservationService
+
+
+class Command(BaseCommand):
+    help = 'Releases stock reservations of unpaid orders whose hold has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            released = StockReservationService.expire(batch_size=options['batch_size'])
+            if not released:
+                break
+            total += released
+        self.stdout.write(self.style.SUCCESS(f'Released {total} expired stock reservations'))
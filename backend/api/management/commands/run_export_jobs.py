@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.export_jobs import purge_expired_exports, run_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Generates pending background exports (ExportJob) into MEDIA_ROOT and purges expired files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        completed, failed = run_export_jobs(batch_size=options['batch_size'])
+        purged = purge_expired_exports()
+        self.stdout.write(self.style.SUCCESS(f'Exports completed: {completed}, failed: {failed}, purged: {purged}'))
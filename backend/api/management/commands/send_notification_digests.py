@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = 'Sends one digest email per client with the queued workshop notifications (digest mode)'
+
+    def handle(self, *args, **kwargs):
+        sent = NotificationService.send_notification_digests()
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} digest emails'))
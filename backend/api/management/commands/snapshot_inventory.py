@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.services import KardexService
+
+
+class Command(BaseCommand):
+    help = 'Stores a point-in-time stock snapshot per product from the inventory journal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # One cut-off for the whole run: every product is snapshotted at the same instant
+        tomado_en = timezone.now()
+        total = 0
+        after_id = 0
+        while True:
+            count, after_id = KardexService.snapshot(tomado_en, after_id=after_id, batch_size=options['batch_size'])
+            if not count:
+                break
+            total += count
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted stock of {total} products at {tomado_en:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_orden_estado_entrega'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('NUEVO_TALLER', 'Nuevo Taller'), ('ACTUALIZACION', 'Cambio de Fecha/Hora')], max_length=20)),
+                ('datos', models.JSONField(blank=True, default=dict)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_pendientes', to='api.cliente')),
+                ('taller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_pendientes', to='api.taller')),
+            ],
+            options={
+                'verbose_name': 'Notificación Pendiente',
+                'verbose_name_plural': 'Notificaciones Pendientes',
+                'ordering': ['creado_en'],
+                'indexes': [models.Index(fields=['enviado_en', 'cliente'], name='notif_pendiente_envio_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_notificacion_pendiente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['estado_ciclo'], name='cliente_estado_ciclo_idx'),
+        ),
+        # Auto-created M2M table: lookup by interes returning cliente_id from the index alone
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS api_cliente_intereses_interes_cliente_idx '
+                'ON api_cliente_intereses_cliente (interes_id, cliente_id);',
+            reverse_sql='DROP INDEX IF EXISTS api_cliente_intereses_interes_cliente_idx;',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_audiencia_intereses_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento', models.CharField(choices=[('ORDEN_PAGADA', 'Orden Pagada')], max_length=30)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhooks', to='api.orden')),
+            ],
+            options={
+                'verbose_name': 'Webhook Saliente',
+                'verbose_name_plural': 'Webhooks Salientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='webhook_pendientes_idx')],
+                'constraints': [models.UniqueConstraint(fields=('orden', 'evento'), name='webhook_unico_por_orden_evento')],
+            },
+        ),
+    ]
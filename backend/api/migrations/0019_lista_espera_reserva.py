@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listaespera',
+            name='reserva_expira',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listaespera',
+            index=models.Index(fields=['reserva_expira'], name='lista_espera_reserva_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_lista_espera_reserva'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listaespera',
+            index=models.Index(fields=['taller', 'notificado', 'fecha_registro'], name='lista_espera_fifo_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_lista_espera_fifo_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('ACTIVA', 'Activa'), ('CONVERTIDA', 'Convertida en Venta'), ('LIBERADA', 'Liberada')], default='ACTIVA', max_length=10)),
+                ('expira_en', models.DateTimeField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_stock', to='api.orden')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='api.producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'indexes': [models.Index(condition=models.Q(('estado', 'ACTIVA')), fields=['producto', 'expira_en'], name='reserva_stock_activa_idx'), models.Index(condition=models.Q(('estado', 'ACTIVA')), fields=['expira_en'], name='reserva_stock_vencida_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:36
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_reserva_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100)),
+                ('clave', models.CharField(max_length=255)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('EN_CURSO', 'En Curso'), ('COMPLETADA', 'Completada')], default='EN_CURSO', max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'indexes': [models.Index(fields=['expira_en'], name='idempotency_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'endpoint', 'clave'), name='idempotency_clave_unica')],
+            },
+        ),
+    ]
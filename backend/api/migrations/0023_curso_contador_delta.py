@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CursoContadorDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.SmallIntegerField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contador_deltas', to='api.curso')),
+            ],
+            options={
+                'verbose_name': 'Delta de Estudiantes',
+                'verbose_name_plural': 'Deltas de Estudiantes',
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_libro_pagos(apps, schema_editor):
+    """Un movimiento por transacción ya aprobada y el saldo acumulado en cada destino."""
+    Transaccion = apps.get_model('api', 'Transaccion')
+    MovimientoPago = apps.get_model('api', 'MovimientoPago')
+    destinos = (('orden', apps.get_model('api', 'Orden')), ('inscripcion', apps.get_model('api', 'Enrollment')))
+
+    for campo, model in destinos:
+        aprobadas = (
+            Transaccion.objects
+            .filter(estado='APROBADO', **{f'{campo}__isnull': False})
+            .order_by(f'{campo}_id', 'fecha', 'id')
+            .values_list('id', f'{campo}_id', 'monto')
+        )
+        saldos = {}
+        movimientos = []
+        for transaccion_id, destino_id, monto in aprobadas.iterator(chunk_size=2000):
+            saldos[destino_id] = saldos.get(destino_id, 0) + monto
+            movimientos.append(MovimientoPago(
+                transaccion_id=transaccion_id, monto=monto, saldo=saldos[destino_id], **{f'{campo}_id': destino_id}
+            ))
+            if len(movimientos) >= 2000:
+                MovimientoPago.objects.bulk_create(movimientos)
+                movimientos = []
+        MovimientoPago.objects.bulk_create(movimientos)
+        model.objects.bulk_update(
+            [model(pk=destino_id, total_aprobado=total) for destino_id, total in saldos.items()],
+            ['total_aprobado'], batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_curso_contador_delta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_aprobado',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orden',
+            name='total_aprobado',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='MovimientoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monto', models.DecimalField(decimal_places=0, max_digits=10)),
+                ('saldo', models.DecimalField(decimal_places=0, max_digits=10, verbose_name='Saldo Aprobado Resultante')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('inscripcion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_pago', to='api.enrollment')),
+                ('orden', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_pago', to='api.orden')),
+                ('transaccion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='api.transaccion')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Pago',
+                'verbose_name_plural': 'Movimientos de Pago',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(backfill_libro_pagos, migrations.RunPython.noop),
+    ]
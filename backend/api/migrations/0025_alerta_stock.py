@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_movimiento_pago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('ABIERTA', 'Abierta'), ('RESUELTA', 'Resuelta')], default='ABIERTA', max_length=10)),
+                ('stock_al_alertar', models.PositiveIntegerField()),
+                ('stock_critico', models.PositiveIntegerField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('resuelta_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('controlar_stock', True), ('stock_actual__lte', models.F('stock_critico'))), fields=['stock_actual'], name='producto_stock_bajo_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertastock',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='api.producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertastock',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'ABIERTA')), fields=('producto',), name='alerta_stock_abierta_unica'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_stock_inicial(apps, schema_editor):
+    """El kardex parte con un movimiento INICIAL por el stock actual de cada producto."""
+    Producto = apps.get_model('api', 'Producto')
+    MovimientoInventario = apps.get_model('api', 'MovimientoInventario')
+    existentes = Producto.objects.filter(stock_actual__gt=0).values_list('pk', 'stock_actual')
+    MovimientoInventario.objects.bulk_create(
+        (
+            MovimientoInventario(producto_id=pk, tipo='INICIAL', cantidad=stock, stock_resultante=stock,
+                                 referencia='Saldo inicial del kardex')
+            for pk, stock in existentes.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_alerta_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INICIAL', 'Stock Inicial'), ('VENTA', 'Venta (Orden Pagada)'), ('VENTA_DIRECTA', 'Venta Directa'), ('AJUSTE', 'Ajuste Manual'), ('IMPORTACION', 'Importación')], max_length=15)),
+                ('cantidad', models.IntegerField()),
+                ('stock_resultante', models.IntegerField()),
+                ('referencia', models.CharField(blank=True, max_length=100)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('orden', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_inventario', to='api.orden')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_inventario', to='api.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario (Kardex)',
+                'indexes': [models.Index(fields=['producto', 'creado_en'], name='mov_inventario_producto_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField()),
+                ('tomado_en', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_inventario', to='api.producto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Inventario',
+                'verbose_name_plural': 'Snapshots de Inventario',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'tomado_en'), name='snapshot_inventario_unico')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_inicial, migrations.RunPython.noop),
+    ]
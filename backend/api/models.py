@@ -1,12 +1,152 @@
-from django.db import models
-from django.db.models import F, Sum
+from django.db import models, transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from decimal import Decimal
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 import uuid  # Moved to top level
 import os    # Moved to top level
+import threading
+from contextlib import contextmanager
+
+class FieldTrackerMixin:
+    """
+    Rastreo liviano de cambios: guarda el valor inicial de `tracked_fields`
+    al cargar desde la BD y lo refresca después de cada save(), de modo que
+    los signals (que corren dentro de save) ven la transición real.
+    Instancias nuevas o campos diferidos cuentan siempre como cambiados.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _snapshot_tracked_fields(self, fields=None):
+        initial = getattr(self, '_tracked_initial', {})
+        for field in self.tracked_fields if fields is None else fields:
+            # __dict__ so deferred fields are skipped instead of loaded
+            if field in self.__dict__:
+                initial[field] = self.__dict__[field]
+        self._tracked_initial = initial
+
+    def has_changed(self, field):
+        initial = getattr(self, '_tracked_initial', {})
+        if field not in initial:
+            return True
+        return initial[field] != getattr(self, field)
+
+    def previous_value(self, field):
+        return getattr(self, '_tracked_initial', {}).get(field)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._snapshot_tracked_fields(
+            [f for f in self.tracked_fields if f in update_fields] if update_fields is not None else None
+        )
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(
+            [f for f in self.tracked_fields if f in fields] if fields is not None else None
+        )
+
+class SaldoMaterializadoMixin:
+    """
+    `total_aprobado` lo escribe solo MovimientoPago.registrar, con la fila bloqueada.
+    Un save() completo de una fila existente no lo incluye, para no pisarlo con un
+    valor leído antes de la última aprobación.
+    """
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not args:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'total_aprobado'
+            ]
+        super().save(*args, **kwargs)
+        _invalidar_recalculo(type(self), [self.pk])
+
+
+_recalculo = threading.local()
+
+
+@contextmanager
+def recalculo_diferido():
+    """
+    Agrupa los `actualizar_estado_pago()` pedidos dentro del bloque: cada orden
+    o inscripción se recalcula una sola vez, al salir sin errores. Los bloques
+    anidados se suman al exterior.
+
+    Dentro de una transacción, un pedido repetido sin cambios de saldo entremedio
+    ya no recalcula (ver `_recalculo_vigente`); el bloque sirve además para lotes
+    que aprueban varias transacciones del mismo destino.
+    """
+    if getattr(_recalculo, 'pendientes', None) is not None:
+        yield
+        return
+    _recalculo.pendientes = {}
+    try:
+        yield
+        pendientes = list(_recalculo.pendientes.values())
+    finally:
+        _recalculo.pendientes = None
+    for obj in pendientes:
+        obj.actualizar_estado_pago()
+
+
+def _diferir_recalculo(obj):
+    """True si hay un recalculo_diferido() activo: obj queda anotado para el final."""
+    pendientes = getattr(_recalculo, 'pendientes', None)
+    if pendientes is None:
+        return False
+    pendientes[(type(obj), obj.pk)] = obj
+    return True
+
+
+def _recalculo_vigente(obj):
+    """
+    True si obj ya se recalculó en la transacción en curso y nada lo cambió desde
+    entonces (ni el libro de pagos ni un save()). La marca es un callback on_commit
+    de esa transacción: si se revierte (o el savepoint donde se recalculó), Django
+    descarta el callback y la marca deja de valer junto con el recálculo.
+    """
+    hechos = getattr(_recalculo, 'hechos', None)
+    marca = hechos.get((type(obj), obj.pk)) if hechos else None
+    if marca is None:
+        return False
+    conexion = transaction.get_connection()
+    if conexion.in_atomic_block and any(callback[1] is marca for callback in conexion.run_on_commit):
+        return True
+    del hechos[(type(obj), obj.pk)]
+    return False
+
+
+def _marcar_recalculado(obj):
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        return
+    hechos = _recalculo.__dict__.setdefault('hechos', {})
+    clave = (type(obj), obj.pk)
+
+    def marca():
+        if hechos.get(clave) is marca:
+            del hechos[clave]
+
+    hechos[clave] = marca
+    transaction.on_commit(marca)
+
+
+def _invalidar_recalculo(model, pks):
+    hechos = getattr(_recalculo, 'hechos', None)
+    if hechos:
+        for pk in pks:
+            hechos.pop((model, pk), None)
+
 
 # --- MODELO NUEVO: Empresa ---
 class Empresa(models.Model):
@@ -86,6 +226,12 @@ class Cliente(models.Model):
     intereses_cliente = models.ManyToManyField(Interes, blank=True, related_name='clientes', verbose_name="Intereses")
     fecha_registro = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Audiencia de notificaciones: filtra por estado_ciclo tras el join de intereses
+            models.Index(fields=['estado_ciclo'], name='cliente_estado_ciclo_idx'),
+        ]
+
     def __str__(self):
         etiqueta = f" [{self.get_estado_ciclo_display()}]"
         if self.tipo_cliente == 'B2B' and self.empresa:
@@ -169,12 +315,24 @@ class ListaEspera(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     notificado = models.BooleanField(default=False)
+    # Cupo reservado para este usuario hasta esta fecha (ver WaitlistService).
+    # notificado=True y reserva_expira=None: la reserva venció sin usarse.
+    reserva_expira = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['fecha_registro'] # FIFO
         unique_together = ['taller', 'usuario']
         verbose_name = "Lista de Espera"
         verbose_name_plural = "Listas de Espera"
+        indexes = [
+            models.Index(fields=['reserva_expira'], name='lista_espera_reserva_idx'),
+            # Fila FIFO por taller: posición y siguiente en la fila con un rango sobre el índice
+            models.Index(fields=['taller', 'notificado', 'fecha_registro'], name='lista_espera_fifo_idx'),
+        ]
+
+    @property
+    def reserva_activa(self):
+        return self.reserva_expira is not None and self.reserva_expira > timezone.now()
 
     def __str__(self):
         return f"{self.usuario.email} esperando {self.taller.nombre}"
@@ -201,8 +359,27 @@ class Curso(models.Model):
     def __str__(self):
         return self.titulo
 
+# --- MODELO NUEVO: CursoContadorDelta (Contador de estudiantes) ---
+class CursoContadorDelta(models.Model):
+    """
+    Cambio pendiente (+1 / -1) de Curso.estudiantes. Las inscripciones solo
+    insertan filas aquí, sin tocar la fila del curso; `manage.py
+    compact_course_counters` suma los deltas en Curso.estudiantes y los borra.
+    El total visible es estudiantes + deltas pendientes.
+    """
+    curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='contador_deltas')
+    delta = models.SmallIntegerField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Delta de Estudiantes"
+        verbose_name_plural = "Deltas de Estudiantes"
+
+    def __str__(self):
+        return f"{self.curso_id}: {self.delta:+d}"
+
 # --- MODELO UNIFICADO: Enrollment (Inscripción) ---
-class Enrollment(models.Model):
+class Enrollment(SaldoMaterializadoMixin, FieldTrackerMixin, models.Model):
     """
     Modelo unificado para inscripciones a Talleres y Cursos.
     Reemplaza a Inscripcion e InscripcionCurso.
@@ -214,6 +391,7 @@ class Enrollment(models.Model):
         ('ANULADO', 'Anulado'),
         ('RECHAZADO', 'Rechazado'),
     ]
+    tracked_fields = ('estado_pago',)
 
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='enrollments')
     
@@ -223,6 +401,8 @@ class Enrollment(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
 
     monto_pagado = models.DecimalField(max_digits=10, decimal_places=0, default=0)
+    # Saldo materializado del libro MovimientoPago (transacciones aprobadas de esta inscripción)
+    total_aprobado = models.DecimalField(max_digits=10, decimal_places=0, default=0)
     estado_pago = models.CharField(max_length=10, choices=ESTADO_PAGO_CHOICES, default='PENDIENTE')
     fecha_inscripcion = models.DateTimeField(auto_now_add=True)
     
@@ -264,7 +444,14 @@ class Enrollment(models.Model):
 
     def actualizar_estado_pago(self):
         """Actualiza el monto pagado y el estado basado en transacciones aprobadas."""
-        total_aprobado = self.transacciones.filter(estado='APROBADO').aggregate(Sum('monto'))['monto__sum'] or 0
+        if _diferir_recalculo(self):
+            return
+        if _recalculo_vigente(self):
+            # Ya recalculada en esta transacción: solo se trae el resultado
+            self.refresh_from_db(fields=['total_aprobado', 'monto_pagado', 'estado_pago'])
+            return
+        self.refresh_from_db(fields=['total_aprobado'])
+        total_aprobado = self.total_aprobado
         self.monto_pagado = total_aprobado
         
         if self.saldo_pendiente <= 0:
@@ -274,6 +461,21 @@ class Enrollment(models.Model):
         else:
             self.estado_pago = 'PENDIENTE'
         self.save()
+        _marcar_recalculado(self)
+
+def precios_de_inscripciones(enrollments):
+    """{(content_type_id, object_id): precio} de los talleres/cursos, con una consulta por tipo."""
+    ids_por_tipo = {}
+    for enrollment in enrollments:
+        ids_por_tipo.setdefault(enrollment.content_type_id, set()).add(enrollment.object_id)
+    precios = {}
+    for ct_id, ids in ids_por_tipo.items():
+        model_class = ContentType.objects.get_for_id(ct_id).model_class()
+        if model_class is None or not hasattr(model_class, 'precio'):
+            continue
+        for pk, precio in model_class.objects.filter(pk__in=ids).values_list('pk', 'precio'):
+            precios[(ct_id, pk)] = precio
+    return precios
 
 def transaction_file_path(instance, filename):
     ext = filename.split('.')[-1]
@@ -281,16 +483,19 @@ def transaction_file_path(instance, filename):
     return os.path.join('comprobantes/', filename)
 
 # --- MODELO NUEVO: Orden (Carrito Unificado) ---
-class Orden(models.Model):
+class Orden(SaldoMaterializadoMixin, FieldTrackerMixin, models.Model):
     ESTADO_PAGO_CHOICES = [
         ('PENDIENTE', 'Pago Pendiente'),
         ('PAGADO', 'Pagado Completo'),
         ('RECHAZADO', 'Rechazado'),
     ]
+    tracked_fields = ('estado_pago',)
     
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ordenes')
     fecha = models.DateTimeField(auto_now_add=True)
     monto_total = models.DecimalField(max_digits=10, decimal_places=0)
+    # Saldo materializado del libro MovimientoPago (transacciones aprobadas de esta orden)
+    total_aprobado = models.DecimalField(max_digits=10, decimal_places=0, default=0)
     estado_pago = models.CharField(max_length=10, choices=ESTADO_PAGO_CHOICES, default='PENDIENTE')
     
     ESTADO_ENTREGA_CHOICES = [
@@ -317,7 +522,14 @@ class Orden(models.Model):
         """Actualiza el estado basado en transacciones aprobadas."""
         import logging
         logger = logging.getLogger('api')
-        total_aprobado = self.transacciones.filter(estado='APROBADO').aggregate(Sum('monto'))['monto__sum'] or 0
+        if _diferir_recalculo(self):
+            return
+        if _recalculo_vigente(self):
+            # Transaccion.save() ya la recalculó en esta misma transacción
+            self.refresh_from_db(fields=['total_aprobado', 'estado_pago'])
+            return
+        self.refresh_from_db(fields=['total_aprobado'])
+        total_aprobado = self.total_aprobado
         
         logger.info(f"Updating Order {self.id} Status. Total Approved: {total_aprobado}, Total Required: {self.monto_total}")
 
@@ -332,6 +544,7 @@ class Orden(models.Model):
             self.estado_pago = 'PENDIENTE'
         
         self.save()
+        _marcar_recalculado(self)
 
         # Distribute payment to enrollments proportionally
         # This ensures individual items reflect the partial payment status and correct remaining balance
@@ -342,17 +555,26 @@ class Orden(models.Model):
         else:
             ratio = 1.0 if total_aprobado >= 0 else 0 # Edge case empty order?
         
-        for enrollment in self.enrollments.all():
-            if hasattr(enrollment.content_object, 'precio'):
-                full_price = float(enrollment.content_object.precio)
-                new_monto_pagado = full_price * ratio
-                enrollment.monto_pagado = int(new_monto_pagado)
-            
+        enrollments = list(self.enrollments.all())
+        if not enrollments:
+            return
+
+        # Precios de todos los talleres/cursos de la orden: una consulta por tipo, no por ítem
+        precios = precios_de_inscripciones(enrollments)
+
+        for enrollment in enrollments:
+            full_price = precios.get((enrollment.content_type_id, enrollment.object_id))
+            if full_price is not None:
+                enrollment.monto_pagado = int(float(full_price) * ratio)
             # Synchronize status with Order unless specific logic dictates otherwise
             enrollment.estado_pago = self.estado_pago
-            
-            logger.info(f"Updated Enrollment {enrollment.id}: Paid {enrollment.monto_pagado} (Ratio {ratio:.2f}), Status {enrollment.estado_pago}")
-            enrollment.save()
+
+        # Sin post_save: la orden nunca deja una inscripción en ANULADO (único estado con handler)
+        Enrollment.objects.bulk_update(enrollments, ['monto_pagado', 'estado_pago'])
+        _invalidar_recalculo(Enrollment, [e.pk for e in enrollments])
+        for enrollment in enrollments:
+            enrollment._snapshot_tracked_fields()
+        logger.info(f"Order {self.id}: synced {len(enrollments)} enrollments (Ratio {ratio:.2f}), Status {self.estado_pago}")
 
 # --- MODELO NUEVO: Cotizacion (B2B) ---
 class Cotizacion(models.Model):
@@ -396,12 +618,13 @@ class DetalleOrden(models.Model):
         return self.cantidad * self.precio_unitario
 
 # --- MODELO NUEVO: Transaccion (Pagos) ---
-class Transaccion(models.Model):
+class Transaccion(FieldTrackerMixin, models.Model):
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente de Revisión'),
         ('APROBADO', 'Aprobado'),
         ('RECHAZADO', 'Rechazado'),
     ]
+    tracked_fields = ('estado', 'monto')
 
     # Vinculado a Enrollment (legacy/single item) OR Orden (cart)
     inscripcion = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='transacciones', null=True, blank=True)
@@ -424,17 +647,99 @@ class Transaccion(models.Model):
         cliente = self.inscripcion.cliente if self.inscripcion else "Sin Cliente"
         return f"Pago Inscripción - ${self.monto} - {cliente} ({self.estado})"
 
+    def monto_aprobado_delta(self):
+        """Cuánto cambia lo aprobado con este guardado (entrar/salir de APROBADO o cambiar el monto)."""
+        antes = self.previous_value('monto') if self.previous_value('estado') == 'APROBADO' else 0
+        despues = self.monto if self.estado == 'APROBADO' else 0
+        return Decimal(str(despues or 0)) - Decimal(str(antes or 0))
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Al guardar una transacción, actualizamos el estado
-        if self.estado == 'APROBADO':
+        # Recalcular solo si cambia la aprobación (entrar o salir de APROBADO) o el monto aprobado
+        recalcular = (self.has_changed('estado') or self.has_changed('monto')) and \
+            'APROBADO' in (self.estado, self.previous_value('estado'))
+        if not recalcular:
+            return super().save(*args, **kwargs)
+        delta = self.monto_aprobado_delta()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if delta:
+                MovimientoPago.registrar(self, delta)
+            # Al guardar una transacción, actualizamos el estado
             if self.inscripcion:
                 self.inscripcion.actualizar_estado_pago()
             if self.orden:
                 self.orden.actualizar_estado_pago()
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.estado == 'APROBADO' and self.monto:
+                MovimientoPago.registrar(self, -Decimal(str(self.monto)))
+            return super().delete(*args, **kwargs)
+
+# --- MODELO NUEVO: MovimientoPago (Libro de pagos) ---
+class MovimientoPago(models.Model):
+    """
+    Libro append-only de lo aprobado por orden/inscripción. Cada aprobación,
+    des-aprobación o ajuste de monto agrega un movimiento con signo y deja el
+    saldo resultante; el saldo vigente está materializado en `total_aprobado`
+    del destino, así validar saldos y derivar estados es O(1).
+    """
+    transaccion = models.ForeignKey(Transaccion, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos')
+    orden = models.ForeignKey(Orden, on_delete=models.CASCADE, null=True, blank=True, related_name='movimientos_pago')
+    inscripcion = models.ForeignKey(Enrollment, on_delete=models.CASCADE, null=True, blank=True, related_name='movimientos_pago')
+    monto = models.DecimalField(max_digits=10, decimal_places=0)
+    saldo = models.DecimalField(max_digits=10, decimal_places=0, verbose_name="Saldo Aprobado Resultante")
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Movimiento de Pago"
+        verbose_name_plural = "Movimientos de Pago"
+
+    def __str__(self):
+        destino = f"Orden #{self.orden_id}" if self.orden_id else f"Inscripción #{self.inscripcion_id}"
+        return f"{destino} {self.monto:+} -> {self.saldo}"
+
+    @classmethod
+    def registrar(cls, transaccion, delta):
+        """
+        Suma `delta` al saldo de la orden y/o inscripción de la transacción, con la
+        fila del destino bloqueada, y agrega el movimiento. Debe correr en la misma
+        transacción que el cambio de la Transaccion.
+        """
+        return cls.registrar_lote([(transaccion, delta)])
+
+    @classmethod
+    def registrar_lote(cls, pares):
+        """
+        Versión por lotes de `registrar` para [(transaccion, delta), ...]: bloquea
+        los destinos en orden de pk, una consulta por tipo, actualiza los saldos con
+        un bulk_update y agrega todos los movimientos con un solo INSERT.
+        """
+        movimientos = []
+        with transaction.atomic():
+            for campo, model in (('orden', Orden), ('inscripcion', Enrollment)):
+                del_destino = [(t, delta) for t, delta in pares if delta and getattr(t, f'{campo}_id')]
+                if not del_destino:
+                    continue
+                ids = sorted({getattr(t, f'{campo}_id') for t, _ in del_destino})
+                saldos = dict(
+                    model.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'total_aprobado')
+                )
+                for t, delta in del_destino:
+                    destino_id = getattr(t, f'{campo}_id')
+                    saldos[destino_id] += delta
+                    movimientos.append(cls(transaccion=t, monto=delta, saldo=saldos[destino_id], **{f'{campo}_id': destino_id}))
+                model.objects.bulk_update([model(pk=pk, total_aprobado=saldo) for pk, saldo in saldos.items()], ['total_aprobado'])
+                _invalidar_recalculo(model, saldos)
+            cls.objects.bulk_create(movimientos)
+        return movimientos
+
 # --- MODELO 5: Producto ---
-class Producto(models.Model):
+class Producto(FieldTrackerMixin, models.Model):
+    # Mismo orden que services.NivelStock (alertas de stock bajo)
+    tracked_fields = ('stock_actual', 'stock_critico', 'controlar_stock')
+
     nombre = models.CharField(max_length=200, unique=True)
     descripcion = models.TextField(blank=True)
     precio_venta = models.DecimalField(max_digits=10, decimal_places=0)
@@ -449,6 +754,15 @@ class Producto(models.Model):
 
     class Meta:
         verbose_name_plural = "Productos (Kits)"
+        indexes = [
+            # Listado de stock bajo: parcial, solo cubre los productos bajo el umbral
+            models.Index(fields=['stock_actual'], name='producto_stock_bajo_idx',
+                         condition=models.Q(controlar_stock=True, stock_actual__lte=F('stock_critico'))),
+        ]
+
+    @property
+    def stock_bajo(self):
+        return self.controlar_stock and self.stock_actual <= self.stock_critico
 
     def __str__(self):
         return f"{self.nombre} (Stock: {self.stock_actual})"
@@ -496,8 +810,15 @@ class DetalleVenta(models.Model):
         super().save(*args, **kwargs)
         
         if es_nuevo:
-            # Descontar stock
-            Producto.objects.filter(id=self.producto.id).update(stock_actual=F('stock_actual') - self.cantidad)
+            # Descontar stock: la fila bloqueada da el valor previo para el kardex y las alertas
+            with transaction.atomic():
+                from .services import CambioStock, NivelStock, KardexService
+                antes = NivelStock(*Producto.objects.select_for_update().values_list(
+                    'stock_actual', 'stock_critico', 'controlar_stock').get(id=self.producto_id))
+                Producto.objects.filter(id=self.producto_id).update(stock_actual=F('stock_actual') - self.cantidad)
+                despues = antes._replace(stock_actual=antes.stock_actual - self.cantidad)
+                KardexService.record([CambioStock(self.producto_id, antes, despues)], 'VENTA_DIRECTA',
+                                     referencia=f"Venta #{self.venta_id}")
             # Actualizar ciclo del cliente
             if self.venta.cliente.estado_ciclo in ['LEAD', 'PROSPECTO']:
                 self.venta.cliente.estado_ciclo = 'CLIENTE'
@@ -525,6 +846,286 @@ class EmailLog(models.Model):
     def __str__(self):
         return f"Email to {self.recipient} [{self.status}]"
 
+# --- MODELO NUEVO: NotificacionPendiente (Modo Resumen) ---
+class NotificacionPendiente(models.Model):
+    """
+    Evento de notificación encolado para el resumen (digest) por cliente.
+    Se llena cuando NOTIFICATION_DIGEST_ENABLED está activo y lo vacía el
+    comando `send_notification_digests`, que envía un solo correo por cliente.
+    """
+    TIPO_CHOICES = [
+        ('NUEVO_TALLER', 'Nuevo Taller'),
+        ('ACTUALIZACION', 'Cambio de Fecha/Hora'),
+    ]
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='notificaciones_pendientes')
+    taller = models.ForeignKey(Taller, on_delete=models.CASCADE, related_name='notificaciones_pendientes')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    # Para ACTUALIZACION: fecha/hora anteriores ({'old_date': 'YYYY-MM-DD', 'old_time': 'HH:MM:SS' | None})
+    datos = models.JSONField(default=dict, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['creado_en']
+        verbose_name = "Notificación Pendiente"
+        verbose_name_plural = "Notificaciones Pendientes"
+        indexes = [
+            models.Index(fields=['enviado_en', 'cliente'], name='notif_pendiente_envio_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.taller.nombre} -> {self.cliente.email}"
+
+# --- MODELO NUEVO: WebhookOutbox (Integración n8n) ---
+class WebhookOutbox(models.Model):
+    """
+    Webhook saliente pendiente de entrega (patrón outbox).
+    Se escribe en la misma transacción que el cambio de la orden y lo entrega
+    el comando `dispatch_webhooks`, con reintentos y backoff exponencial.
+    Un solo registro por (orden, evento): los re-guardados no duplican envíos.
+    """
+    EVENTO_CHOICES = [
+        ('ORDEN_PAGADA', 'Orden Pagada'),
+    ]
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIADO', 'Enviado'),
+        ('FALLIDO', 'Fallido'),  # Agotó los reintentos
+    ]
+
+    orden = models.ForeignKey(Orden, on_delete=models.CASCADE, related_name='webhooks')
+    evento = models.CharField(max_length=30, choices=EVENTO_CHOICES)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, null=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Webhook Saliente"
+        verbose_name_plural = "Webhooks Salientes"
+        constraints = [
+            models.UniqueConstraint(fields=['orden', 'evento'], name='webhook_unico_por_orden_evento'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='webhook_pendientes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_evento_display()} Orden #{self.orden_id} [{self.estado}]"
+
+# --- MODELO NUEVO: ReservaStock (Inventario) ---
+class ReservaStock(models.Model):
+    """
+    Stock apartado por una orden impaga. El checkout reserva en vez de descontar:
+    el stock disponible es stock_actual menos las reservas ACTIVAS no vencidas.
+    Al aprobarse el pago la reserva se convierte en venta (descuenta stock_actual);
+    si se rechaza o vence, se libera sin tocar el producto.
+    """
+    ESTADO_CHOICES = [
+        ('ACTIVA', 'Activa'),
+        ('CONVERTIDA', 'Convertida en Venta'),
+        ('LIBERADA', 'Liberada'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    orden = models.ForeignKey(Orden, on_delete=models.CASCADE, related_name='reservas_stock')
+    cantidad = models.PositiveIntegerField()
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='ACTIVA')
+    expira_en = models.DateTimeField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Reserva de Stock"
+        verbose_name_plural = "Reservas de Stock"
+        indexes = [
+            # Suma de reservado por producto (stock disponible) y barrido de vencidas:
+            # parciales, solo cubren las reservas que siguen activas
+            models.Index(fields=['producto', 'expira_en'], name='reserva_stock_activa_idx',
+                         condition=models.Q(estado='ACTIVA')),
+            models.Index(fields=['expira_en'], name='reserva_stock_vencida_idx',
+                         condition=models.Q(estado='ACTIVA')),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad}x {self.producto.nombre} Orden #{self.orden_id} [{self.estado}]"
+
+# --- MODELO NUEVO: AlertaStock (Inventario) ---
+class AlertaStock(models.Model):
+    """
+    Aviso de stock bajo. Se abre cuando un cambio de stock cruza el umbral
+    (stock_actual <= stock_critico) y se resuelve cuando vuelve a superarlo.
+    A lo más una alerta ABIERTA por producto.
+    """
+    ESTADO_CHOICES = [
+        ('ABIERTA', 'Abierta'),
+        ('RESUELTA', 'Resuelta'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='alertas_stock')
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='ABIERTA')
+    stock_al_alertar = models.PositiveIntegerField()
+    stock_critico = models.PositiveIntegerField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+    resuelta_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Alerta de Stock"
+        verbose_name_plural = "Alertas de Stock"
+        constraints = [
+            models.UniqueConstraint(fields=['producto'], condition=models.Q(estado='ABIERTA'),
+                                    name='alerta_stock_abierta_unica'),
+        ]
+
+    def __str__(self):
+        return f"Stock bajo {self.producto.nombre}: {self.stock_al_alertar} <= {self.stock_critico} [{self.estado}]"
+
+# --- MODELO NUEVO: MovimientoInventario (Kardex) ---
+class MovimientoInventario(models.Model):
+    """
+    Libro de inventario, solo de agregado: una fila por cada cambio de
+    stock_actual con la cantidad (con signo) y el stock resultante.
+    El stock a una fecha es la última SnapshotInventario anterior más la suma
+    de los movimientos posteriores a ella.
+    """
+    TIPO_CHOICES = [
+        ('INICIAL', 'Stock Inicial'),
+        ('VENTA', 'Venta (Orden Pagada)'),
+        ('VENTA_DIRECTA', 'Venta Directa'),
+        ('AJUSTE', 'Ajuste Manual'),
+        ('IMPORTACION', 'Importación'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_inventario')
+    tipo = models.CharField(max_length=15, choices=TIPO_CHOICES)
+    cantidad = models.IntegerField()
+    stock_resultante = models.IntegerField()
+    orden = models.ForeignKey(Orden, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_inventario')
+    referencia = models.CharField(max_length=100, blank=True)
+    creado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario (Kardex)"
+        indexes = [
+            # Kardex de un producto y suma de movimientos desde su última snapshot
+            models.Index(fields=['producto', 'creado_en'], name='mov_inventario_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre} {self.cantidad:+d} = {self.stock_resultante} [{self.tipo}]"
+
+# --- MODELO NUEVO: SnapshotInventario (Kardex) ---
+class SnapshotInventario(models.Model):
+    """
+    Stock de un producto a una fecha, calculado desde el kardex por
+    `manage.py snapshot_inventory`. Acota las consultas históricas a los
+    movimientos posteriores a la snapshot más cercana.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots_inventario')
+    stock = models.IntegerField()
+    tomado_en = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Snapshot de Inventario"
+        verbose_name_plural = "Snapshots de Inventario"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'tomado_en'], name='snapshot_inventario_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre} @ {self.tomado_en:%Y-%m-%d %H:%M}: {self.stock}"
+
+# --- MODELO NUEVO: IdempotencyKey (Reintentos de clientes) ---
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada de un POST enviado con cabecera `Idempotency-Key`.
+    Un reintento con la misma clave recibe la respuesta original sin volver a
+    ejecutar la operación (ver api/idempotency.py). Las claves vencidas se
+    borran con `manage.py purge_idempotency_keys`.
+    """
+    ESTADO_CHOICES = [
+        ('EN_CURSO', 'En Curso'),
+        ('COMPLETADA', 'Completada'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    endpoint = models.CharField(max_length=100)
+    clave = models.CharField(max_length=255)
+    # sha256 del cuerpo: la misma clave con otro contenido es un error del cliente
+    huella = models.CharField(max_length=64)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='EN_CURSO')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'endpoint', 'clave'], name='idempotency_clave_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['expira_en'], name='idempotency_expira_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.clave} ({self.usuario_id}) [{self.estado}]"
+
+# --- MODELO NUEVO: ExportJob (Exportaciones en segundo plano) ---
+class ExportJob(models.Model):
+    """
+    Export pedido desde el admin que se genera fuera del request con
+    `manage.py run_export_jobs`: el archivo queda en MEDIA_ROOT/exports/ y se
+    descarga por un endpoint autenticado. Dos pedidos idénticos (mismo modelo,
+    formato y filtros) mientras uno sigue activo comparten el mismo job.
+    """
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En Proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+    ]
+    ACTIVOS = ('PENDIENTE', 'EN_PROCESO')
+
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    modelo = models.CharField(max_length=30)
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default='csv')
+    filtros = models.JSONField(default=dict, blank=True)
+    # sha256 de modelo/formato/filtros normalizados: agrupa pedidos idénticos
+    huella = models.CharField(max_length=64)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='PENDIENTE')
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    archivo = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    # Latido del worker: un job EN_PROCESO sin avances por EXPORT_JOB_STALE_MINUTES se reintenta
+    actualizado_en = models.DateTimeField(default=timezone.now)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportación"
+        verbose_name_plural = "Exportaciones"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['huella'], condition=models.Q(estado__in=['PENDIENTE', 'EN_PROCESO']),
+                name='export_job_activo_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'creado_en'], name='export_job_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Export {self.modelo} ({self.formato}) #{self.id} [{self.estado}]"
+
 # --- MODELO 10: Post (Blog) ---
 class Post(models.Model):
     titulo = models.CharField(max_length=200)
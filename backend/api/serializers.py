@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User
-from .models import Taller, Cliente, Curso, Post, Contacto, Interes, Enrollment, Resena, Interaccion, Transaccion, Producto, Orden, DetalleOrden, Certificado
+from .models import Taller, Cliente, Curso, Post, Contacto, Interes, Enrollment, Resena, Interaccion, Transaccion, Producto, Orden, DetalleOrden, Certificado, MovimientoInventario
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -89,11 +89,32 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 class CursoSerializer(serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
+    # Con annotate_students se lee compactado + inscripciones aún no compactadas (CursoContadorDelta);
+    # sin anotar (p. ej. anidado en una inscripción) se usa la columna compactada, sin consulta extra
+    estudiantes = serializers.IntegerField(min_value=0, required=False)
 
     class Meta:
         model = Curso
         fields = '__all__'
 
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        if hasattr(obj, 'estudiantes_total'):
+            data['estudiantes'] = obj.estudiantes_total
+        return data
+
+    def update(self, instance, validated_data):
+        # Una corrección del admin entra como delta: no pisa inscripciones pendientes de compactar
+        estudiantes = validated_data.pop('estudiantes', None)
+        instance = super().update(instance, validated_data)
+        if estudiantes is not None:
+            from .services import CourseCounterService
+            delta = estudiantes - CourseCounterService.students(instance)
+            if delta:
+                CourseCounterService.record(instance.id, delta)
+            instance.estudiantes_total = estudiantes
+        return instance
+
 class PostSerializer(serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     autor_nombre = serializers.CharField(source='autor.first_name', read_only=True)
@@ -247,10 +268,24 @@ class InteraccionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class ProductoSerializer(serializers.ModelSerializer):
+    # stock_actual menos lo reservado por órdenes impagas
+    stock_disponible = serializers.SerializerMethodField()
+
     class Meta:
         model = Producto
         fields = '__all__'
 
+    def get_stock_disponible(self, obj):
+        # Viene anotado (StockReservationService.annotate_available) o calculado por la vista
+        return getattr(obj, 'stock_disponible', None)
+
+class MovimientoInventarioSerializer(serializers.ModelSerializer):
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'tipo', 'tipo_display', 'cantidad', 'stock_resultante', 'orden', 'referencia', 'creado_en']
+
 class DetalleOrdenSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     
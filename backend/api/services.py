@@ -1,13 +1,19 @@
 from django.db.models import Sum, Count
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.db import transaction, IntegrityError
 from django.contrib.contenttypes.models import ContentType
-from .models import Enrollment, Cliente, Taller, Resena, Curso, Orden, DetalleOrden, Producto, Transaccion
+from .models import Enrollment, Cliente, Taller, Resena, Curso, Orden, DetalleOrden, Producto, Transaccion, ListaEspera, ReservaStock, CursoContadorDelta
+from .models import MovimientoPago, AlertaStock, MovimientoInventario, SnapshotInventario, VentaProducto, DetalleVenta
+from .models import precios_de_inscripciones, recalculo_diferido
 import logging
+from collections import namedtuple
 
 logger = logging.getLogger('api')
 
+# Lightweight recipient row for bulk notifications (quacks like Cliente for the email builders)
+Destinatario = namedtuple('Destinatario', ['id', 'email', 'nombre_completo'])
+
 class ClientService:
     @staticmethod
     def resolve_client(user, data=None):
@@ -42,6 +48,32 @@ class ClientService:
 
 class NotificationService:
     """Delagates to email_utils but provides a service interface."""
+    AUDIENCE_STATES = ['CLIENTE', 'LEAD', 'PROSPECTO']
+
+    @staticmethod
+    def iter_interest_audience(interes, estados=None, chunk_size=500):
+        """
+        Streams the clients interested in `interes` as lists of Destinatario
+        (at most `chunk_size` each) without materializing Cliente instances.
+        One query, served by the (interes_id, cliente_id) index on the M2M table.
+        No DISTINCT needed: the through table is unique per (cliente, interes).
+        """
+        rows = (
+            Cliente.objects
+            .filter(intereses_cliente=interes, estado_ciclo__in=estados or NotificationService.AUDIENCE_STATES)
+            .order_by()
+            .values_list('id', 'email', 'nombre_completo')
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(Destinatario._make(row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
     @staticmethod
     def notify_new_workshop(taller, clients):
         from .email_utils import send_new_workshop_notification
@@ -56,7 +88,58 @@ class NotificationService:
     def notify_workshop_cancellation(taller, clients):
         from .email_utils import send_workshop_cancellation
         return send_workshop_cancellation(taller, clients)
-        
+
+    # Digest mode (settings.NOTIFICATION_DIGEST_ENABLED): events are queued per
+    # client and `send_notification_digests` sends one combined email per client.
+    @staticmethod
+    def dispatch_new_workshop(taller, clients):
+        from django.conf import settings
+        if settings.NOTIFICATION_DIGEST_ENABLED:
+            return NotificationService.queue_notifications(taller, clients, 'NUEVO_TALLER')
+        return NotificationService.notify_new_workshop(taller, clients)
+
+    @staticmethod
+    def dispatch_workshop_update(taller, clients, old_date, old_time):
+        from django.conf import settings
+        if settings.NOTIFICATION_DIGEST_ENABLED:
+            datos = {'old_date': old_date.isoformat(), 'old_time': old_time.isoformat() if old_time else None}
+            return NotificationService.queue_notifications(taller, clients, 'ACTUALIZACION', datos)
+        return NotificationService.notify_workshop_update(taller, clients, old_date, old_time)
+
+    @staticmethod
+    def queue_notifications(taller, clients, tipo, datos=None):
+        from .models import NotificacionPendiente
+        pendientes = NotificacionPendiente.objects.bulk_create(
+            [NotificacionPendiente(cliente_id=c.id, taller=taller, tipo=tipo, datos=datos or {}) for c in clients],
+            batch_size=1000,
+        )
+        return len(pendientes)
+
+    @staticmethod
+    def send_notification_digests():
+        from .email_utils import send_notification_digests
+        return send_notification_digests()
+
+    # Async variants for the ASGI deployment: same emails, sent concurrently over
+    # a bounded pool of SMTP connections (see email_async.AsyncEmailBackend).
+    @staticmethod
+    async def anotify_new_workshop(taller, clients):
+        from .email_async import asend_personalized
+        from .email_utils import build_new_workshop_email
+        return await asend_personalized(clients, lambda cliente: build_new_workshop_email(taller, cliente))
+
+    @staticmethod
+    async def anotify_workshop_update(taller, clients, old_date, old_time):
+        from .email_async import asend_personalized
+        from .email_utils import build_workshop_update_email
+        return await asend_personalized(clients, lambda cliente: build_workshop_update_email(taller, cliente, old_date, old_time))
+
+    @staticmethod
+    async def anotify_workshop_cancellation(taller, clients):
+        from .email_async import asend_personalized
+        from .email_utils import build_workshop_cancellation_email
+        return await asend_personalized(clients, lambda cliente: build_workshop_cancellation_email(taller, cliente))
+
     @staticmethod
     def notify_activation(user, uid, token):
          from .email_utils import send_activation_email
@@ -67,12 +150,101 @@ class NotificationService:
          from .email_utils import send_password_reset_email
          return send_password_reset_email(user, uid, token)
 
+# Ítem de carrito resuelto: objeto, precio y disponibilidad (error=None si se puede comprar)
+ItemCarrito = namedtuple(
+    'ItemCarrito', ['tipo', 'id', 'cantidad', 'objeto', 'nombre', 'precio', 'subtotal', 'disponible', 'error']
+)
+
+
+class CartPricingService:
+    """
+    Resolución por lotes de precios y disponibilidad de un carrito o cotización:
+    un in_bulk() por tipo (productos, talleres, cursos), a lo más tres consultas
+    sin importar la cantidad de ítems.
+    """
+    TIPOS = {
+        'product': 'product', 'producto': 'product',
+        'taller': 'taller', 'workshop': 'taller',
+        'curso': 'curso', 'course': 'curso',
+    }
+    NOMBRES = {'product': 'Producto', 'taller': 'Taller', 'curso': 'Curso'}
+
+    @staticmethod
+    def resolve(items, lock_products=False, cupos_por_item=False):
+        """
+        Devuelve un ItemCarrito por ítem, en el orden recibido. Con `lock_products`
+        los productos se leen con select_for_update en orden de pk (checkout).
+        En un carrito cada taller/curso es una inscripción; `cupos_por_item` respeta
+        la cantidad pedida también para ellos (cotizaciones B2B).
+        El stock se valida contra el total pedido de cada producto en el carrito,
+        neto de las reservas de otras órdenes.
+        """
+        lineas, ids = [], {'product': set(), 'taller': set(), 'curso': set()}
+        for item in items:
+            tipo = CartPricingService.TIPOS.get(item.get('type'))
+            try:
+                item_id = int(item.get('id'))
+                cantidad = int(item.get('quantity', 1)) if tipo == 'product' or cupos_por_item else 1
+            except (TypeError, ValueError):
+                lineas.append((tipo, item.get('id'), 0, "Ítem inválido"))
+                continue
+            if tipo is None:
+                lineas.append((tipo, item_id, cantidad, f"Tipo de ítem inválido: {item.get('type')}"))
+            elif cantidad <= 0:
+                lineas.append((tipo, item_id, cantidad, "La cantidad debe ser positiva"))
+            else:
+                ids[tipo].add(item_id)
+                lineas.append((tipo, item_id, cantidad, None))
+
+        productos = StockReservationService.annotate_available(Producto.objects.all())
+        if lock_products:
+            productos = productos.select_for_update().order_by('pk')
+        objetos = {
+            'product': productos.in_bulk(ids['product']),
+            'taller': Taller.objects.in_bulk(ids['taller']),
+            'curso': Curso.objects.in_bulk(ids['curso']),
+        }
+        pedido = {}
+        for tipo, item_id, cantidad, error in lineas:
+            if tipo == 'product' and error is None:
+                pedido[item_id] = pedido.get(item_id, 0) + cantidad
+
+        resueltos = []
+        for tipo, item_id, cantidad, error in lineas:
+            obj = objetos[tipo].get(item_id) if error is None else None
+            if obj is None:
+                error = error or f"{CartPricingService.NOMBRES[tipo]} {item_id} no encontrado"
+                resueltos.append(ItemCarrito(tipo, item_id, cantidad, None, None, 0, 0, False, error))
+                continue
+            if tipo == 'product':
+                nombre, precio = obj.nombre, obj.precio_venta
+                if obj.controlar_stock and obj.stock_disponible < pedido[item_id]:
+                    error = f"Stock insuficiente para {obj.nombre}. Disponible: {obj.stock_disponible}"
+            elif tipo == 'taller':
+                nombre, precio = obj.nombre, obj.precio
+                if obj.cupos_disponibles < cantidad:
+                    error = EnrollmentService.SIN_CUPOS
+            else:
+                nombre, precio = obj.titulo, obj.precio
+            resueltos.append(ItemCarrito(tipo, item_id, cantidad, obj, nombre, precio, precio * cantidad, error is None, error))
+        return resueltos
+
+
 class OrderService:
     @staticmethod
     def create_order_from_cart(user, cart_items):
         """
         Creates an Order from cart items, handling stock locking and enrollments.
+
+        Products are locked up front in primary-key order and workshop seats
+        are taken with conditional UPDATEs in primary-key order too, so two
+        carts with the same items in a different order queue behind each
+        other instead of deadlocking. Stock is
+        validated in memory against what is left after active reservations,
+        and reserved (not decremented) until the payment is approved.
         """
+        from collections import OrderedDict
+
         cliente = ClientService.resolve_client(user)
         
         if not cart_items:
@@ -83,70 +255,74 @@ class OrderService:
 
         try:
             with transaction.atomic():
-                # 1. Create Order Shell
+                # 1-2. Resolve the whole cart in one query per type, locking products in pk order
+                resueltos = [r for r in CartPricingService.resolve(cart_items, lock_products=True) if r.tipo is not None]
+
+                # 3. Stock was validated in memory, net of other orders' reservations; workshop
+                # seats are left to create_enrollment (a waitlist hold may cover a full workshop)
+                for r in resueltos:
+                    if r.objeto is None or (r.tipo == 'product' and r.error):
+                        raise ValueError(r.error)
+                product_qty = OrderedDict()
+                productos = {}
+                for r in resueltos:
+                    if r.tipo == 'product':
+                        product_qty[r.id] = product_qty.get(r.id, 0) + r.cantidad
+                        productos[r.id] = r.objeto
+                controlled = {pid: qty for pid, qty in product_qty.items() if productos[pid].controlar_stock}
+
+                # 4. Create Order with its lines
                 orden = Orden.objects.create(
                     cliente=cliente,
                     monto_total=0 
                 )
-
-                # 2. Process Items
-                for item in cart_items:
-                    item_type = item.get('type')
-                    item_id = item.get('id')
-                    quantity = item.get('quantity', 1)
-
-                    if item_type == 'product':
-                        # Lock Product
-                        producto = Producto.objects.select_for_update().get(id=item_id)
-                        
-                        if not producto.tiene_stock(quantity):
-                            raise ValueError(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock_actual}")
-                        
-                        DetalleOrden.objects.create(
-                            orden=orden,
-                            producto=producto,
-                            cantidad=quantity,
-                            precio_unitario=producto.precio_venta
-                        )
-                        
-                        if producto.controlar_stock:
-                            producto.stock_actual -= quantity
-                            producto.save()
-                        
-                        total_amount += (producto.precio_venta * quantity)
-
-                    elif item_type in ['workshop', 'course', 'taller', 'curso']:
-                        if item_type in ['workshop', 'taller']:
-                            backend_type = 'taller'
-                        else:
-                            backend_type = 'curso'
-                        
-                        # Use EnrollmentService logic (which handles locking too)
-                        # Check existance first to avoid overhead if duplicate
-                        ct = ContentType.objects.get_for_model(Taller if backend_type == 'taller' else Curso)
-                        if Enrollment.objects.filter(cliente=cliente, content_type=ct, object_id=item_id).exists():
-                            logger.info(f"User {user.email} already enrolled in {item_type} {item_id}, skipping in order.")
+                DetalleOrden.objects.bulk_create([
+                    DetalleOrden(
+                        orden=orden,
+                        producto=productos[product_id],
+                        cantidad=quantity,
+                        precio_unitario=productos[product_id].precio_venta
+                    )
+                    for product_id, quantity in product_qty.items()
+                ])
+                total_amount += sum(productos[pid].precio_venta * qty for pid, qty in product_qty.items())
+
+                # 5. Reserve stock until the payment is approved
+                if controlled:
+                    StockReservationService.reserve(orden, controlled)
+
+                # 6. Enrollments, in pk order so workshop seat UPDATEs lock rows in pk order too
+                for backend_type, model_class in (('taller', Taller), ('curso', Curso)):
+                    items = {r.id: r.objeto for r in resueltos if r.tipo == backend_type}
+                    if not items:
+                        continue
+                    ct = ContentType.objects.get_for_model(model_class)
+                    already_enrolled = set(Enrollment.objects.filter(
+                        cliente=cliente, content_type=ct, object_id__in=items
+                    ).values_list('object_id', flat=True))
+
+                    for item_id in sorted(items):
+                        if item_id in already_enrolled:
+                            logger.info(f"User {user.email} already enrolled in {backend_type} {item_id}, skipping in order.")
                             continue
 
                         enrollment, _ = EnrollmentService.create_enrollment(
                             user=user, 
                             item_type=backend_type, 
                             item_id=item_id, 
-                            cliente=cliente
+                            cliente=cliente,
+                            item=items[item_id]
                         )
                         if enrollment:
                             enrollments_created.append(enrollment)
                             # Add full price to order total
-                            if hasattr(enrollment.content_object, 'precio'):
-                                total_amount += enrollment.content_object.precio
-                            else:
-                                total_amount += enrollment.monto_pagado
+                            total_amount += items[item_id].precio
 
-                # 3. Link Enrollments
+                # 7. Link Enrollments
                 if enrollments_created:
                     orden.enrollments.set(enrollments_created)
 
-                # 4. Update Total
+                # 8. Update Total
                 orden.monto_total = total_amount
                 orden.save()
                 
@@ -156,6 +332,565 @@ class OrderService:
             logger.error(f"Error creating order: {e}")
             raise e
 
+class NivelStock(namedtuple('NivelStock', ['stock_actual', 'stock_critico', 'controlar_stock'])):
+    """Valores de un producto que definen si está bajo el umbral de stock."""
+    @property
+    def bajo(self):
+        return self.controlar_stock and self.stock_actual <= self.stock_critico
+
+# Cambio de stock de un producto; `antes` es None para productos nuevos
+CambioStock = namedtuple('CambioStock', ['producto_id', 'antes', 'despues'])
+
+
+class StockAlertService:
+    """
+    Alertas de stock bajo (AlertaStock) a partir de los valores antes/después de
+    cada cambio de stock, sin recorrer la tabla de productos. Solo los cruces del
+    umbral abren o resuelven alertas; el aviso al staff sale al confirmar.
+    """
+    @staticmethod
+    def process(cambios):
+        """Abre/resuelve alertas para los CambioStock dados. Devuelve las alertas abiertas."""
+        abrir, resolver = {}, set()
+        for c in cambios:
+            bajo_antes = c.antes is not None and c.antes.bajo
+            bajo_despues = c.despues.bajo
+            if bajo_despues and not bajo_antes:
+                abrir[c.producto_id] = c
+            elif bajo_antes and not bajo_despues:
+                resolver.add(c.producto_id)
+
+        if resolver:
+            AlertaStock.objects.filter(producto_id__in=resolver, estado='ABIERTA').update(
+                estado='RESUELTA', resuelta_en=timezone.now()
+            )
+        if not abrir:
+            return []
+
+        # Dedupe por producto: el índice único parcial descarta la segunda alerta abierta
+        ya_abiertas = set(
+            AlertaStock.objects.filter(producto_id__in=abrir, estado='ABIERTA').values_list('producto_id', flat=True)
+        )
+        nuevas = [
+            AlertaStock(producto_id=pid, stock_al_alertar=c.despues.stock_actual, stock_critico=c.despues.stock_critico)
+            for pid, c in abrir.items() if pid not in ya_abiertas
+        ]
+        AlertaStock.objects.bulk_create(nuevas, ignore_conflicts=True)
+        if nuevas:
+            from .email_utils import send_low_stock_alert
+            producto_ids = [a.producto_id for a in nuevas]
+            transaction.on_commit(lambda: send_low_stock_alert(producto_ids))
+        return nuevas
+
+    @staticmethod
+    def low_stock(queryset=None):
+        """Productos con control de stock bajo el umbral; resuelto por el índice parcial producto_stock_bajo_idx."""
+        from django.db.models import F
+        queryset = Producto.objects.all() if queryset is None else queryset
+        return queryset.filter(controlar_stock=True, stock_actual__lte=F('stock_critico')).order_by('stock_actual', 'pk')
+
+
+class KardexService:
+    """
+    Kardex de inventario (MovimientoInventario) y stock histórico. Todo cambio de
+    stock_actual pasa por `record`, que también alimenta las alertas de stock bajo.
+    """
+    # Sin snapshot previa se suman todos los movimientos (el kardex parte con INICIAL)
+    DESDE_SIEMPRE = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    @staticmethod
+    def record(cambios, tipo, orden=None, referencia=''):
+        """Agrega un movimiento por cada CambioStock que mueve stock_actual (un INSERT) y revisa alertas."""
+        movimientos = []
+        for c in cambios:
+            cantidad = c.despues.stock_actual - (c.antes.stock_actual if c.antes is not None else 0)
+            if cantidad:
+                movimientos.append(MovimientoInventario(
+                    producto_id=c.producto_id, tipo=tipo, cantidad=cantidad,
+                    stock_resultante=c.despues.stock_actual, orden=orden, referencia=referencia,
+                ))
+        MovimientoInventario.objects.bulk_create(movimientos)
+        StockAlertService.process(cambios)
+        return movimientos
+
+    @staticmethod
+    def annotate_stock_at(queryset, momento):
+        """
+        Anota `stock_historico` (stock al `momento`) en un queryset de Producto:
+        snapshot más cercana anterior + suma de los movimientos entre ella y `momento`,
+        dos subconsultas por índice, sin recorrer el kardex completo.
+        """
+        from django.db.models import DateTimeField, F, IntegerField, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+
+        snapshot = (
+            SnapshotInventario.objects
+            .filter(producto=OuterRef('pk'), tomado_en__lte=momento)
+            .order_by('-tomado_en')
+        )
+        delta = (
+            MovimientoInventario.objects
+            .filter(producto=OuterRef('pk'), creado_en__gt=OuterRef('snapshot_en'), creado_en__lte=momento)
+            .values('producto')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        )
+        return queryset.annotate(
+            snapshot_en=Coalesce(Subquery(snapshot.values('tomado_en')[:1]), Value(KardexService.DESDE_SIEMPRE),
+                                 output_field=DateTimeField()),
+            snapshot_stock=Coalesce(Subquery(snapshot.values('stock')[:1]), Value(0), output_field=IntegerField()),
+        ).annotate(
+            stock_historico=F('snapshot_stock') + Coalesce(Subquery(delta), Value(0), output_field=IntegerField())
+        )
+
+    @staticmethod
+    def stock_at(producto_id, momento):
+        return KardexService.annotate_stock_at(Producto.objects.filter(pk=producto_id), momento).values_list(
+            'stock_historico', flat=True).get()
+
+    @staticmethod
+    def movements(producto_id, desde, hasta):
+        """Movimientos de un producto en (desde, hasta], por el índice (producto, creado_en)."""
+        return (
+            MovimientoInventario.objects
+            .filter(producto_id=producto_id, creado_en__gt=desde, creado_en__lte=hasta)
+            .order_by('creado_en', 'id')
+        )
+
+    @staticmethod
+    def snapshot(tomado_en, after_id=0, batch_size=1000):
+        """
+        Guarda la snapshot al `tomado_en` de hasta `batch_size` productos con id > after_id,
+        calculada con la misma fórmula que las consultas históricas (un INSERT por lote).
+        Devuelve (productos procesados, último id).
+        """
+        filas = list(
+            KardexService.annotate_stock_at(Producto.objects.filter(pk__gt=after_id).order_by('pk'), tomado_en)
+            .values_list('pk', 'stock_historico')[:batch_size]
+        )
+        if not filas:
+            return 0, after_id
+        SnapshotInventario.objects.bulk_create(
+            [SnapshotInventario(producto_id=pk, stock=stock, tomado_en=tomado_en) for pk, stock in filas],
+            ignore_conflicts=True,
+        )
+        return len(filas), filas[-1][0]
+
+
+class StockReservationService:
+    """
+    Reservas de stock de órdenes impagas (ReservaStock). El checkout reserva,
+    la aprobación del pago convierte la reserva en venta y el rechazo o el
+    vencimiento (STOCK_RESERVATION_MINUTES) la liberan.
+    """
+    @staticmethod
+    def reserved(product_ids):
+        """Unidades reservadas vigentes por producto: un solo SUM agrupado sobre el índice parcial."""
+        return dict(
+            ReservaStock.objects
+            .filter(producto_id__in=product_ids, estado='ACTIVA', expira_en__gt=timezone.now())
+            .values('producto_id')
+            .annotate(total=Sum('cantidad'))
+            .values_list('producto_id', 'total')
+        )
+
+    @staticmethod
+    def available(productos):
+        """Stock disponible (stock_actual - reservado) por id, para productos ya cargados."""
+        productos = list(productos)
+        reservado = StockReservationService.reserved([p.id for p in productos])
+        return {p.id: max(p.stock_actual - reservado.get(p.id, 0), 0) for p in productos}
+
+    @staticmethod
+    def annotate_available(queryset):
+        """Anota `stock_disponible` en un queryset de Producto sin consultas por fila."""
+        from django.db.models import F, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce, Greatest
+        reservado = (
+            ReservaStock.objects
+            .filter(producto=OuterRef('pk'), estado='ACTIVA', expira_en__gt=timezone.now())
+            .values('producto')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        )
+        return queryset.annotate(
+            stock_disponible=Greatest(F('stock_actual') - Coalesce(Subquery(reservado), Value(0)), Value(0))
+        )
+
+    @staticmethod
+    def reserve(orden, product_qty):
+        """Crea las reservas de una orden ({producto_id: cantidad}); el llamador ya validó y bloqueó."""
+        from django.conf import settings
+        expira = timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+        return ReservaStock.objects.bulk_create([
+            ReservaStock(orden=orden, producto_id=pid, cantidad=qty, expira_en=expira)
+            for pid, qty in product_qty.items()
+        ])
+
+    @staticmethod
+    def convert(orden):
+        """
+        Pago aprobado: descuenta del stock todo lo reservado por la orden que aún
+        no se vendió, incluso si la reserva ya había vencido (la venta está pagada).
+        """
+        from django.db.models import Case, When, F, Value, PositiveIntegerField
+        from django.db.models.functions import Greatest
+
+        with transaction.atomic():
+            reservas = list(
+                ReservaStock.objects.select_for_update()
+                .filter(orden=orden).exclude(estado='CONVERTIDA')
+                .order_by('producto_id')
+            )
+            if not reservas:
+                return 0
+            cantidades = {}
+            for reserva in reservas:
+                cantidades[reserva.producto_id] = cantidades.get(reserva.producto_id, 0) + reserva.cantidad
+            # Valores previos con las filas bloqueadas: el descuento de abajo es determinista
+            # y da el valor posterior para el kardex y las alertas sin releer la tabla
+            antes = list(
+                Producto.objects.select_for_update().filter(pk__in=cantidades).order_by('pk')
+                .values_list('pk', 'stock_actual', 'stock_critico', 'controlar_stock')
+            )
+            cambios = [
+                CambioStock(pid, NivelStock(stock, critico, controlar), NivelStock(max(stock - cantidades[pid], 0), critico, controlar))
+                for pid, stock, critico, controlar in antes
+            ]
+            # Sobreventa: una reserva vencida o liberada se pagó después de que sus unidades
+            # se vendieran por otro lado. El stock no baja de 0, pero el faltante queda a la vista
+            faltantes = {
+                pid: cantidades[pid] - stock
+                for pid, stock, critico, controlar in antes if controlar and stock < cantidades[pid]
+            }
+            Producto.objects.filter(pk__in=cantidades).update(
+                stock_actual=Case(
+                    *[When(pk=pid, then=Greatest(F('stock_actual') - qty, Value(0))) for pid, qty in cantidades.items()],
+                    default=F('stock_actual'),
+                    output_field=PositiveIntegerField(),
+                )
+            )
+            ReservaStock.objects.filter(id__in=[r.id for r in reservas]).update(estado='CONVERTIDA')
+            KardexService.record([c for c in cambios if c.producto_id not in faltantes], 'VENTA', orden=orden)
+            for cambio in cambios:
+                if cambio.producto_id in faltantes:
+                    faltan = faltantes[cambio.producto_id]
+                    logger.error(f"Orden #{orden.id}: pago aprobado sin stock suficiente del producto "
+                                 f"{cambio.producto_id} (faltan {faltan} unidades)")
+                    KardexService.record([cambio], 'VENTA', orden=orden, referencia=f"Sobreventa: faltan {faltan} unidades")
+        return len(reservas)
+
+    @staticmethod
+    def release(orden):
+        """Pago rechazado: libera las reservas activas de la orden. El stock_actual no cambia."""
+        return ReservaStock.objects.filter(orden=orden, estado='ACTIVA').update(estado='LIBERADA')
+
+    @staticmethod
+    def release_many(orden_ids):
+        """`release` para varias órdenes con un solo UPDATE."""
+        return ReservaStock.objects.filter(orden_id__in=orden_ids, estado='ACTIVA').update(estado='LIBERADA')
+
+    @staticmethod
+    def expire(batch_size=1000):
+        """
+        Libera hasta `batch_size` reservas vencidas con un UPDATE. Ya no contaban
+        como reservado; el barrido solo las saca del índice de activas.
+        """
+        with transaction.atomic():
+            vencidas = list(
+                ReservaStock.objects
+                .select_for_update(skip_locked=True)
+                .filter(estado='ACTIVA', expira_en__lte=timezone.now())
+                .order_by('expira_en')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if vencidas:
+                ReservaStock.objects.filter(id__in=vencidas, estado='ACTIVA').update(estado='LIBERADA')
+        return len(vencidas)
+
+class SalesIngestionService:
+    """
+    Carga masiva de ventas presenciales (VentaProducto/DetalleVenta). Hace lo mismo
+    que DetalleVenta.save() línea a línea, pero por lote: una lectura bloqueada del
+    stock, bulk_create de ventas y detalles, un UPDATE de stock agregado por producto
+    y un UPDATE del ciclo de los clientes.
+    """
+    @staticmethod
+    def _parse(ventas):
+        """Normaliza el payload; devuelve (ventas, errores) con errores por índice de venta."""
+        normalizadas, errores = [], {}
+        for i, venta in enumerate(ventas):
+            try:
+                detalles = venta['detalles']
+                if not detalles:
+                    raise ValueError("La venta no tiene detalles")
+                normalizadas.append({
+                    'cliente_id': int(venta['cliente_id']) if venta.get('cliente_id') is not None else None,
+                    'cliente_email': (venta.get('cliente_email') or '').strip().lower() or None,
+                    'estado_pago': venta.get('estado_pago', 'PAGADO'),
+                    'detalles': [
+                        {
+                            'producto_id': int(d['producto_id']),
+                            'cantidad': int(d.get('cantidad', 1)),
+                            'precio_unitario': int(d['precio_unitario']) if d.get('precio_unitario') is not None else None,
+                        }
+                        for d in detalles
+                    ],
+                })
+            except (KeyError, TypeError, ValueError) as e:
+                errores[i] = f"Formato inválido: {e}"
+                continue
+            venta_n = normalizadas[-1]
+            if venta_n['cliente_id'] is None and venta_n['cliente_email'] is None:
+                errores[i] = "Falta cliente_id o cliente_email"
+            elif venta_n['estado_pago'] not in dict(VentaProducto.ESTADO_PAGO_CHOICES):
+                errores[i] = f"Estado de pago inválido: {venta_n['estado_pago']}"
+            elif any(d['cantidad'] <= 0 for d in venta_n['detalles']):
+                errores[i] = "Las cantidades deben ser positivas"
+        return normalizadas, errores
+
+    @staticmethod
+    def ingest(ventas, referencia='Carga masiva de ventas'):
+        """
+        Registra todas las ventas o ninguna. Devuelve (ventas_creadas, errores);
+        errores es {índice de venta: mensaje}.
+        """
+        from django.db.models import Case, When, F, Value, PositiveIntegerField
+        from django.db.models.functions import Greatest
+
+        ventas, errores = SalesIngestionService._parse(ventas)
+        if errores:
+            return [], errores
+
+        cantidades = {}
+        for venta in ventas:
+            for d in venta['detalles']:
+                cantidades[d['producto_id']] = cantidades.get(d['producto_id'], 0) + d['cantidad']
+
+        with transaction.atomic():
+            # Clientes: una consulta por tipo de identificador
+            por_id = set(Cliente.objects.filter(pk__in={v['cliente_id'] for v in ventas if v['cliente_id']}).values_list('pk', flat=True))
+            emails = {v['cliente_email'] for v in ventas if v['cliente_id'] is None}
+            por_email = dict(Cliente.objects.filter(email__in=emails).values_list('email', 'pk')) if emails else {}
+
+            # Stock: una lectura bloqueada, en orden de pk como el checkout
+            productos = {
+                p.pk: p for p in Producto.objects.select_for_update().filter(pk__in=cantidades).order_by('pk')
+            }
+            disponible = StockReservationService.available(productos.values())
+
+            for i, venta in enumerate(ventas):
+                if venta['cliente_id'] is None:
+                    venta['cliente_id'] = por_email.get(venta['cliente_email'])
+                    if venta['cliente_id'] is None:
+                        errores[i] = f"Cliente no encontrado: {venta['cliente_email']}"
+                elif venta['cliente_id'] not in por_id:
+                    errores[i] = f"Cliente no encontrado: {venta['cliente_id']}"
+                faltantes = [str(d['producto_id']) for d in venta['detalles'] if d['producto_id'] not in productos]
+                if faltantes:
+                    errores[i] = f"Producto(s) no encontrado(s): {', '.join(faltantes)}"
+            if errores:
+                return [], errores
+
+            # Igual que DetalleVenta.clean(), contra el total pedido en el lote y sin tocar lo reservado
+            sin_stock = [
+                f"{productos[pid].nombre} (pedido: {qty}, disponible: {disponible[pid]})"
+                for pid, qty in cantidades.items()
+                if productos[pid].controlar_stock and qty > disponible[pid]
+            ]
+            if sin_stock:
+                return [], {'stock': f"No hay suficiente stock de {', '.join(sin_stock)}"}
+
+            nuevas = []
+            for venta in ventas:
+                for d in venta['detalles']:
+                    if d['precio_unitario'] is None:
+                        d['precio_unitario'] = productos[d['producto_id']].precio_venta
+                nuevas.append(VentaProducto(
+                    cliente_id=venta['cliente_id'], estado_pago=venta['estado_pago'],
+                    monto_total=sum(d['cantidad'] * d['precio_unitario'] for d in venta['detalles']),
+                ))
+            VentaProducto.objects.bulk_create(nuevas)
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(venta=nueva, producto_id=d['producto_id'], cantidad=d['cantidad'], precio_unitario=d['precio_unitario'])
+                for nueva, venta in zip(nuevas, ventas) for d in venta['detalles']
+            ])
+
+            Producto.objects.filter(pk__in=cantidades).update(
+                stock_actual=Case(
+                    *[When(pk=pid, then=Greatest(F('stock_actual') - qty, Value(0))) for pid, qty in cantidades.items()],
+                    default=F('stock_actual'),
+                    output_field=PositiveIntegerField(),
+                )
+            )
+            KardexService.record([
+                CambioStock(pid, NivelStock(p.stock_actual, p.stock_critico, p.controlar_stock),
+                            NivelStock(max(p.stock_actual - cantidades[pid], 0), p.stock_critico, p.controlar_stock))
+                for pid, p in productos.items()
+            ], 'VENTA_DIRECTA', referencia=referencia)
+
+            Cliente.objects.filter(
+                pk__in={v['cliente_id'] for v in ventas}, estado_ciclo__in=['LEAD', 'PROSPECTO']
+            ).update(estado_ciclo='CLIENTE')
+        return nuevas, {}
+
+
+class PaymentReviewService:
+    """
+    Revisión por lotes de comprobantes pendientes. Todo el lote se valida antes de
+    escribir nada: si algún ítem falla no se aplica ninguno.
+    """
+
+    @staticmethod
+    def _parse_monto(valor):
+        try:
+            monto = int(valor)
+        except (TypeError, ValueError):
+            return None, "Monto inválido"
+        if monto < 0:
+            return None, "El monto no puede ser negativo"
+        return monto, None
+
+    @staticmethod
+    def _lock_pending(ids, errores, verbo):
+        """Bloquea las transacciones en orden de pk y anota las que no existen o no están pendientes."""
+        transacciones = list(Transaccion.objects.select_for_update().filter(id__in=ids).order_by('pk'))
+        encontradas = {t.id for t in transacciones}
+        for transaccion_id in ids:
+            if transaccion_id not in encontradas:
+                errores[transaccion_id] = "Transacción no encontrada"
+        for t in transacciones:
+            if t.estado != 'PENDIENTE':
+                errores[t.id] = f"Solo se pueden {verbo} transacciones pendientes"
+        return transacciones
+
+    @staticmethod
+    def approve_many(items):
+        """
+        Aprueba [{'id': ..., 'monto': opcional}, ...].
+        Los saldos de órdenes e inscripciones se bloquean y validan con una consulta por
+        tipo; estados y montos se escriben con un bulk_update, el libro de pagos con un
+        INSERT, y cada orden/inscripción afectada se recalcula una sola vez.
+        Los correos se envían en un lote al confirmar la transacción.
+        Devuelve (transacciones, errores); con errores no se modifica nada.
+        """
+        from .email_utils import send_receipt_emails
+
+        errores = {}
+        montos = {}
+        for item in items:
+            try:
+                transaccion_id = int(item['id'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Cada ítem debe tener un id válido")
+            montos[transaccion_id] = None
+            if item.get('monto') is not None:
+                montos[transaccion_id], error = PaymentReviewService._parse_monto(item['monto'])
+                if error:
+                    errores[transaccion_id] = error
+        if errores:
+            return [], errores
+
+        with transaction.atomic():
+            with recalculo_diferido():
+                destinos = Transaccion.objects.filter(id__in=montos).values_list('orden_id', 'inscripcion_id')
+                orden_ids = sorted({o for o, _ in destinos if o})
+                inscripcion_ids = sorted({i for _, i in destinos if i})
+
+                # Destinos primero, luego transacciones, siempre en orden de pk: mismo orden
+                # de bloqueo que la aprobación individual
+                ordenes = {o.pk: o for o in Orden.objects.select_for_update().filter(pk__in=orden_ids).order_by('pk')}
+                inscripciones = {
+                    e.pk: e for e in Enrollment.objects.select_for_update().filter(pk__in=inscripcion_ids).order_by('pk')
+                }
+                precios = precios_de_inscripciones(inscripciones.values())
+                restante = {('orden', pk): o.monto_total - o.total_aprobado for pk, o in ordenes.items()}
+                for pk, e in inscripciones.items():
+                    precio = precios.get((e.content_type_id, e.object_id))
+                    if precio is not None:
+                        restante[('inscripcion', pk)] = precio - e.total_aprobado
+
+                transacciones = PaymentReviewService._lock_pending(list(montos), errores, 'aprobar')
+                for t in transacciones:
+                    if t.id in errores:
+                        continue
+                    monto = t.monto if montos[t.id] is None else montos[t.id]
+                    destino = ('orden', t.orden_id) if t.orden_id else ('inscripcion', t.inscripcion_id)
+                    saldo = restante.get(destino)
+                    # Igual que la aprobación individual: solo el monto corregido se valida
+                    if montos[t.id] is not None and saldo is not None and monto > saldo:
+                        errores[t.id] = f"El monto ({monto}) excede el saldo pendiente ({saldo})"
+                        continue
+                    if saldo is not None:
+                        restante[destino] = saldo - monto
+                    t.monto = monto
+                    t.estado = 'APROBADO'
+                if errores:
+                    return [], errores
+
+                # bulk_update no pasa por Transaccion.save(): el libro y los recálculos van aquí
+                Transaccion.objects.bulk_update(transacciones, ['estado', 'monto'])
+                MovimientoPago.registrar_lote([(t, t.monto) for t in transacciones])
+                for orden in ordenes.values():
+                    orden.actualizar_estado_pago()
+                for inscripcion in inscripciones.values():
+                    inscripcion.actualizar_estado_pago()
+
+            # Saldo restante de abonos parciales: un pendiente nuevo por inscripción que no tenga uno
+            con_pendiente = set(
+                Transaccion.objects.filter(inscripcion_id__in=inscripciones, estado='PENDIENTE')
+                .values_list('inscripcion_id', flat=True)
+            )
+            saldos = []
+            for pk, e in inscripciones.items():
+                precio = precios.get((e.content_type_id, e.object_id))
+                if precio is not None and precio - e.monto_pagado > 0 and pk not in con_pendiente:
+                    saldos.append(Transaccion(
+                        inscripcion=e, monto=precio - e.monto_pagado, estado='PENDIENTE',
+                        observacion='Saldo restante generado automáticamente tras abono parcial'
+                    ))
+            Transaccion.objects.bulk_create(saldos)
+
+            ids = [t.id for t in transacciones]
+            transaction.on_commit(lambda: send_receipt_emails(ids, aprobado=True))
+        return transacciones, {}
+
+    @staticmethod
+    def reject_many(ids, observacion=''):
+        """
+        Rechaza las transacciones `ids` con un bulk_update, marca sus órdenes como
+        RECHAZADO y libera sus reservas de stock con un UPDATE cada una.
+        Devuelve (transacciones, errores); con errores no se modifica nada.
+        """
+        from .email_utils import send_receipt_emails
+
+        errores = {}
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            raise ValueError("Los ids deben ser numéricos")
+
+        with transaction.atomic():
+            transacciones = PaymentReviewService._lock_pending(ids, errores, 'rechazar')
+            if errores:
+                return [], errores
+
+            # PENDIENTE -> RECHAZADO no mueve el libro de pagos: no hace falta Transaccion.save()
+            for t in transacciones:
+                t.estado = 'RECHAZADO'
+                t.observacion = observacion
+            Transaccion.objects.bulk_update(transacciones, ['estado', 'observacion'])
+
+            # Equivalente por lotes a guardar cada orden como RECHAZADO (gestionar_reservas_stock)
+            orden_ids = {t.orden_id for t in transacciones if t.orden_id}
+            if orden_ids:
+                Orden.objects.filter(pk__in=orden_ids).update(estado_pago='RECHAZADO')
+                StockReservationService.release_many(orden_ids)
+
+            transaction.on_commit(lambda: send_receipt_emails(ids, aprobado=False, motivo=observacion))
+        return transacciones, {}
+
+
 class RevenueService:
     @staticmethod
     def get_total_revenue(client_type=None, period='all', start_date=None, end_date=None):
@@ -615,12 +1350,99 @@ class RevenueService:
                 continue
         return results
 
+class CourseCounterService:
+    """
+    Curso.estudiantes como contador sin contención: cada cambio es un INSERT en
+    CursoContadorDelta y la compactación periódica los suma en el curso.
+    """
+    @staticmethod
+    def record(curso_id, delta):
+        CursoContadorDelta.objects.create(curso_id=curso_id, delta=delta)
+
+    @staticmethod
+    def _pending():
+        from django.db.models import OuterRef, Subquery
+        return Subquery(
+            CursoContadorDelta.objects
+            .filter(curso=OuterRef('pk'))
+            .values('curso')
+            .annotate(total=Sum('delta'))
+            .values('total')
+        )
+
+    @staticmethod
+    def annotate_students(queryset):
+        """Anota `estudiantes_total` (compactado + pendiente) en un queryset de Curso."""
+        from django.db.models import F, Value
+        from django.db.models.functions import Coalesce
+        return queryset.annotate(
+            estudiantes_total=F('estudiantes') + Coalesce(CourseCounterService._pending(), Value(0))
+        )
+
+    @staticmethod
+    def students(curso):
+        pendiente = curso.contador_deltas.aggregate(total=Sum('delta'))['total'] or 0
+        return curso.estudiantes + pendiente
+
+    @staticmethod
+    def compact(batch_size=5000):
+        """
+        Suma hasta `batch_size` deltas en Curso.estudiantes (un UPDATE) y los borra,
+        en una sola transacción: una lectura ve el delta o el total, nunca ambos.
+        Devuelve cuántos deltas se compactaron.
+        """
+        from django.db.models import Case, When, F, IntegerField
+
+        with transaction.atomic():
+            deltas = list(
+                CursoContadorDelta.objects
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'curso_id', 'delta')[:batch_size]
+            )
+            if not deltas:
+                return 0
+            por_curso = {}
+            for _, curso_id, delta in deltas:
+                por_curso[curso_id] = por_curso.get(curso_id, 0) + delta
+            por_curso = {curso_id: total for curso_id, total in por_curso.items() if total}
+            if por_curso:
+                Curso.objects.filter(pk__in=por_curso).update(
+                    estudiantes=Case(
+                        *[When(pk=curso_id, then=F('estudiantes') + total) for curso_id, total in por_curso.items()],
+                        default=F('estudiantes'),
+                        output_field=IntegerField(),
+                    )
+                )
+            CursoContadorDelta.objects.filter(id__in=[id_ for id_, _, _ in deltas]).delete()
+        return len(deltas)
+
+
 class EnrollmentService:
+    SIN_CUPOS = "Lo sentimos, no quedan cupos disponibles para este taller."
+
+    @staticmethod
+    def allocate_seat(taller_id):
+        """
+        Toma un cupo con un solo UPDATE condicional
+        (cupos_disponibles = cupos_disponibles - 1 WHERE cupos_disponibles > 0).
+        Devuelve False si el taller ya no tenía cupos; no hace SELECT ... FOR UPDATE.
+        """
+        from django.db.models import F
+        return Taller.objects.filter(id=taller_id, cupos_disponibles__gt=0).update(
+            cupos_disponibles=F('cupos_disponibles') - 1
+        ) == 1
+
     @staticmethod
-    def create_enrollment(user, item_type, item_id, cliente=None):
+    def create_enrollment(user, item_type, item_id, cliente=None, item=None):
         """
         Creates an enrollment with STRICT ACID compliance.
-        Can be called with 'user' (resolves client) or explicit 'cliente'.
+        Can be called with 'user' (resolves client) or explicit 'cliente', and
+        with the already loaded Taller/Curso as 'item' (e.g. from CartPricingService).
+
+        Workshop seats are taken with `allocate_seat` as the last statement of
+        the transaction, so the Taller row is only locked from that UPDATE to
+        the commit instead of across the client and interest writes.
         """
         # 1. Resolver el Cliente
         if cliente is None:
@@ -636,16 +1458,13 @@ class EnrollmentService:
 
         try:
             with transaction.atomic():
-                if item_type == 'taller':
+                if item is None:
                     try:
-                        item = model_class.objects.select_for_update().get(id=item_id)
+                        item = model_class.objects.get(id=item_id)
                     except model_class.DoesNotExist:
-                        raise ValueError(f"{item_type.capitalize()} no encontrado")
-                    
-                    if item.cupos_disponibles <= 0:
-                        raise ValueError("Lo sentimos, no quedan cupos disponibles para este taller.")
-                else:
-                    item = model_class.objects.get(id=item_id)
+                        if item_type == 'taller':
+                            raise ValueError(f"{item_type.capitalize()} no encontrado")
+                        raise
 
                 ct = ContentType.objects.get_for_model(model_class)
 
@@ -659,6 +1478,14 @@ class EnrollmentService:
                     else:
                         return existing_enrollment, "Ya estás inscrito en este item"
 
+                # Un cupo reservado desde la lista de espera ya está descontado de cupos_disponibles
+                usa_reserva = False
+                if item_type == 'taller':
+                    usa_reserva = WaitlistService.consume_hold(item.id, cliente.user_id)
+                    # Lectura sin bloqueo: descarta rápido los talleres agotados; allocate_seat decide
+                    if not usa_reserva and item.cupos_disponibles <= 0:
+                        raise ValueError(EnrollmentService.SIN_CUPOS)
+
                 if existing_enrollment and existing_enrollment.estado_pago == 'ANULADO':
                     enrollment = existing_enrollment
                     enrollment.estado_pago = 'PENDIENTE'
@@ -672,16 +1499,9 @@ class EnrollmentService:
                         estado_pago='PENDIENTE'
                     )
                 
-                if item_type == 'taller':
-                    item.cupos_disponibles -= 1
-                    item.save()
-                elif item_type == 'curso' and not existing_enrollment: 
-                    # For courses we just track students, unlimited quota usually?
-                    # Or should we lock course too? Course 'estudiantes' count update.
-                    # Let's lock to be safe if we are updating a counter.
-                    # But simpler to just update.
-                    from django.db.models import F
-                    Curso.objects.filter(id=item.id).update(estudiantes=F('estudiantes') + 1)
+                if item_type == 'curso' and not existing_enrollment: 
+                    # Courses have unlimited quota; the student count is an append-only delta
+                    CourseCounterService.record(item.id, 1)
 
                 enrollment.save()
 
@@ -692,6 +1512,11 @@ class EnrollmentService:
                     cliente.estado_ciclo = 'CLIENTE'
                     cliente.save()
 
+                # Último: toma el cupo (y el lock de la fila) justo antes del commit
+                if item_type == 'taller' and not usa_reserva:
+                    if not EnrollmentService.allocate_seat(item.id):
+                        raise ValueError(EnrollmentService.SIN_CUPOS)
+
                 return enrollment, "Inscripción creada exitosamente"
 
         except IntegrityError as e:
@@ -717,21 +1542,15 @@ class EnrollmentService:
             is_entering_anulado = (new_status == 'ANULADO' and old_status != 'ANULADO')
             
             if enrollment.content_type.model == 'taller':
-                taller = Taller.objects.select_for_update().get(id=enrollment.object_id)
-                if is_entering_anulado:
-                    taller.cupos_disponibles += 1
-                elif is_leaving_anulado:
-                    if taller.cupos_disponibles <= 0:
-                        raise ValueError("No hay cupos disponibles para reactivar esta inscripción.")
-                    taller.cupos_disponibles -= 1
-                taller.save()
+                # Entrar en ANULADO libera el cupo vía signal (WaitlistService.release_seats)
+                if is_leaving_anulado and not EnrollmentService.allocate_seat(enrollment.object_id):
+                    raise ValueError("No hay cupos disponibles para reactivar esta inscripción.")
                 
             elif enrollment.content_type.model == 'curso':
-                from django.db.models import F
                 if is_entering_anulado:
-                    Curso.objects.filter(id=enrollment.object_id).update(estudiantes=F('estudiantes') - 1)
+                    CourseCounterService.record(enrollment.object_id, -1)
                 elif is_leaving_anulado:
-                    Curso.objects.filter(id=enrollment.object_id).update(estudiantes=F('estudiantes') + 1)
+                    CourseCounterService.record(enrollment.object_id, 1)
 
             return enrollment
 
@@ -741,11 +1560,181 @@ class EnrollmentService:
             enrollment = Enrollment.objects.select_for_update().get(id=enrollment_id)
             
             if enrollment.content_type.model == 'taller':
-                taller = Taller.objects.select_for_update().get(id=enrollment.object_id)
-                taller.cupos_disponibles += 1
-                taller.save()
+                # Una inscripción ANULADA ya devolvió su cupo
+                if enrollment.estado_pago != 'ANULADO':
+                    WaitlistService.release_seats(enrollment.object_id)
             elif enrollment.content_type.model == 'curso':
-                from django.db.models import F
-                Curso.objects.filter(id=enrollment.object_id).update(estudiantes=F('estudiantes') - 1)
+                CourseCounterService.record(enrollment.object_id, -1)
             
             enrollment.delete()
+
+
+class WaitlistService:
+    """
+    Promoción desde la lista de espera con reservas temporales (holds).
+    Un cupo liberado no vuelve a la venta general si hay alguien esperando:
+    queda reservado para el primero de la fila durante WAITLIST_HOLD_MINUTES.
+    """
+    @staticmethod
+    def release_seats(taller_id, seats=1):
+        """
+        Libera `seats` cupos de un taller. Cada cupo se reserva para el siguiente
+        en la lista de espera (FIFO); los que sobran vuelven a cupos_disponibles
+        con un UPDATE condicional, sin bloquear la fila del taller.
+        Los avisos se envían recién al confirmar la transacción.
+        Devuelve las entradas de ListaEspera promovidas.
+        """
+        from django.conf import settings
+        from django.db.models import F
+        from .email_utils import send_waitlist_notification
+
+        with transaction.atomic():
+            siguientes = list(
+                ListaEspera.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('usuario', 'taller')
+                .filter(taller_id=taller_id, notificado=False)
+                .order_by('fecha_registro', 'id')[:seats]
+            )
+            expira = timezone.now() + timedelta(minutes=settings.WAITLIST_HOLD_MINUTES)
+            if siguientes:
+                ListaEspera.objects.filter(id__in=[s.id for s in siguientes]).update(notificado=True, reserva_expira=expira)
+
+            libres = seats - len(siguientes)
+            if libres:
+                Taller.objects.filter(id=taller_id).update(cupos_disponibles=F('cupos_disponibles') + libres)
+
+            for siguiente in siguientes:
+                logger.info(f"Waitlist: seat in taller {taller_id} held for {siguiente.usuario.email} until {expira}")
+                transaction.on_commit(
+                    lambda s=siguiente: send_waitlist_notification(s.usuario, s.taller, expira)
+                )
+        return siguientes
+
+    @staticmethod
+    def consume_hold(taller_id, user_id):
+        """
+        Si el usuario tiene una reserva vigente para el taller, la consume
+        (sale de la lista de espera) y devuelve True. Debe llamarse dentro de
+        la transacción de la inscripción.
+        """
+        if not user_id:
+            return False
+        deleted, _ = ListaEspera.objects.filter(
+            taller_id=taller_id,
+            usuario_id=user_id,
+            notificado=True,
+            reserva_expira__gt=timezone.now(),
+        ).delete()
+        return deleted > 0
+
+    @staticmethod
+    def expire_holds(batch_size=500):
+        """
+        Vence las reservas expiradas (hasta `batch_size`) y pasa cada cupo al
+        siguiente de la fila del mismo taller, o lo devuelve a la venta.
+        Devuelve cuántas reservas vencieron.
+        """
+        from collections import Counter
+
+        with transaction.atomic():
+            vencidas = list(
+                ListaEspera.objects
+                .select_for_update(skip_locked=True)
+                .filter(reserva_expira__lte=timezone.now())
+                .order_by('reserva_expira')
+                .values_list('id', 'taller_id')[:batch_size]
+            )
+            if not vencidas:
+                return 0
+            ListaEspera.objects.filter(id__in=[id_ for id_, _ in vencidas]).update(reserva_expira=None)
+
+            for taller_id, seats in Counter(taller_id for _, taller_id in vencidas).items():
+                WaitlistService.release_seats(taller_id, seats)
+        return len(vencidas)
+
+    @staticmethod
+    def position(entrada):
+        """
+        Posición (1-based) de una entrada que aún espera. Un solo COUNT sobre el
+        índice (taller, notificado, fecha_registro): solo recorre a quienes están
+        antes en la fila, sin materializarla.
+        """
+        from django.db.models import Q
+        delante = ListaEspera.objects.filter(taller_id=entrada.taller_id, notificado=False).filter(
+            Q(fecha_registro__lt=entrada.fecha_registro) |
+            Q(fecha_registro=entrada.fecha_registro, id__lt=entrada.id)
+        ).count()
+        return delante + 1
+
+    @staticmethod
+    def status(user, taller_id):
+        entrada = ListaEspera.objects.filter(taller_id=taller_id, usuario=user).first()
+        if entrada is None:
+            return {'en_lista': False, 'posicion': None, 'reserva_expira': None, 'notificado': False}
+        return {
+            'en_lista': True,
+            'posicion': WaitlistService.position(entrada) if not entrada.notificado else None,
+            'reserva_expira': entrada.reserva_expira if entrada.reserva_activa else None,
+            'notificado': entrada.notificado,
+        }
+
+    @staticmethod
+    def join(user, taller_id):
+        """
+        Agrega al usuario al final de la fila. Una entrada cuya reserva venció
+        vuelve a la fila como nueva. Devuelve (entrada, creada).
+        """
+        taller = Taller.objects.filter(id=taller_id, esta_activo=True).first()
+        if taller is None:
+            raise Taller.DoesNotExist("Taller no encontrado")
+        if taller.cupos_disponibles > 0:
+            raise ValueError("Aún hay cupos disponibles: puedes inscribirte directamente.")
+
+        ct = ContentType.objects.get_for_model(Taller)
+        if Enrollment.objects.filter(
+            cliente__user=user, content_type=ct, object_id=taller_id
+        ).exclude(estado_pago='ANULADO').exists():
+            raise ValueError("Ya estás inscrito en este taller.")
+
+        with transaction.atomic():
+            entrada, created = ListaEspera.objects.select_for_update().get_or_create(taller=taller, usuario=user)
+            if not created and entrada.notificado and not entrada.reserva_activa:
+                # Reserva vencida: vuelve al final de la fila
+                entrada.notificado = False
+                entrada.reserva_expira = None
+                entrada.fecha_registro = timezone.now()
+                entrada.save(update_fields=['notificado', 'reserva_expira', 'fecha_registro'])
+        return entrada, created
+
+    @staticmethod
+    def leave(user, taller_id):
+        """Saca al usuario de la fila; si tenía una reserva vigente, el cupo pasa al siguiente."""
+        with transaction.atomic():
+            entrada = ListaEspera.objects.select_for_update().filter(taller_id=taller_id, usuario=user).first()
+            if entrada is None:
+                return False
+            tenia_reserva = entrada.reserva_activa
+            entrada.delete()
+            if tenia_reserva:
+                WaitlistService.release_seats(taller_id)
+        return True
+
+    @staticmethod
+    def summary(taller_ids):
+        """
+        Resumen por taller para el listado admin, en una sola consulta agrupada:
+        {taller_id: {'esperando': n, 'reservas_activas': m}}
+        """
+        from django.db.models import Q
+        filas = (
+            ListaEspera.objects
+            .filter(taller_id__in=taller_ids)
+            .values('taller_id')
+            .annotate(
+                esperando=Count('id', filter=Q(notificado=False)),
+                reservas_activas=Count('id', filter=Q(reserva_expira__gt=timezone.now())),
+            )
+            .order_by()
+        )
+        return {fila['taller_id']: {'esperando': fila['esperando'], 'reservas_activas': fila['reservas_activas']} for fila in filas}
@@ -1,65 +1,65 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Enrollment, ListaEspera
-from .email_utils import send_waitlist_notification
+from django.contrib.contenttypes.models import ContentType
+from .models import Enrollment, Taller
 
 @receiver(post_save, sender=Enrollment)
-def liberar_cupo_handler(sender, instance, **kwargs):
+def liberar_cupo_handler(sender, instance, created, **kwargs):
     """
-    Cuando se anula una inscripción a un Taller, verificar si hay lista de espera
-    y notificar al siguiente usuario.
+    Cuando se anula una inscripción a un Taller, liberar su cupo: se reserva
+    para el siguiente de la lista de espera (con aviso por correo) o vuelve
+    a cupos_disponibles si no hay nadie esperando.
     """
-    # Solo nos interesa si el estado cambia a ANULADO y es un Taller
-    if instance.estado_pago == 'ANULADO' and instance.content_type.model == 'taller':
-        taller = instance.content_object
-        
-        # Buscar el siguiente en la lista que no haya sido notificado
-        siguiente = ListaEspera.objects.filter(taller=taller, notificado=False).first()
-        
-        if siguiente:
-            # Enviar notificación
-            send_waitlist_notification(siguiente.usuario, taller)
-            
-            # Marcar como notificado
-            siguiente.notificado = True
-            siguiente.save()
+    # Solo nos interesa la transición a ANULADO (no cada guardado) y que sea un Taller
+    if created or instance.estado_pago != 'ANULADO' or not instance.has_changed('estado_pago'):
+        return
+    # get_for_model usa la caché de ContentType: no carga instance.content_type
+    if instance.content_type_id != ContentType.objects.get_for_model(Taller).id:
+        return
+
+    from .services import WaitlistService
+    WaitlistService.release_seats(instance.object_id)
 
 @receiver(post_save, sender='api.Orden')
 def trigger_n8n_webhook(sender, instance, created, **kwargs):
     """
-    Cuando una orden se paga, enviar datos a n8n para automatización de fidelización.
+    Cuando una orden se paga, encolar el webhook de n8n para automatización de fidelización.
+    La entrega la hace `manage.py dispatch_webhooks` (api/webhooks.py), fuera del request.
+    """
+    if instance.estado_pago == 'PAGADO' and instance.has_changed('estado_pago'):
+        from .webhooks import enqueue_order_paid
+        enqueue_order_paid(instance)
+
+@receiver(post_save, sender='api.Orden')
+def gestionar_reservas_stock(sender, instance, created, **kwargs):
     """
+    El stock de una orden queda reservado hasta que se resuelve el pago:
+    al pagarse la reserva se convierte en venta, al rechazarse se libera.
+    """
+    if created or not instance.has_changed('estado_pago'):
+        return
+    from .services import StockReservationService
     if instance.estado_pago == 'PAGADO':
-        import requests
-        import json
-        from django.conf import settings
-        
-        # URL del Webhook de n8n (Debería estar en settings, hardcoded por ahora para demo)
-        WEBHOOK_URL = getattr(settings, 'N8N_WEBHOOK_URL', 'https://n8n.webhook.url/post-venta')
-        
-        # Skip if using placeholder
-        if 'n8n.webhook.url' in WEBHOOK_URL:
-            print("n8n Webhook skipped: Using placeholder URL.")
-            return
+        StockReservationService.convert(instance)
+    elif instance.estado_pago == 'RECHAZADO':
+        StockReservationService.release(instance)
 
-        payload = {
-            "cliente": {
-                "nombre": instance.cliente.nombre_completo,
-                "email": instance.cliente.email,
-                "tipo": instance.cliente.tipo_cliente
-            },
-            "compra": {
-                "id": instance.id,
-                "items": [d.producto.nombre for d in instance.detalles.all()],
-                "fecha": instance.fecha.strftime('%Y-%m-%d'),
-                "monto": int(instance.monto_total)
-            },
-            "accion_sugerida": "send_welcome_kit_email"
-        }
-        
-        try:
-            # Enviar async o fire-and-forget idealmente
-            # Aquí lo hacemos síncrono con timeout corto para no bloquear
-            requests.post(WEBHOOK_URL, json=payload, timeout=2)
-        except Exception as e:
-            print(f"Error enviando webhook n8n: {e}")
+@receiver(post_save, sender='api.Producto')
+def registrar_cambio_stock(sender, instance, created, **kwargs):
+    """
+    Ediciones de producto (admin, API): si stock_actual, stock_critico
+    o controlar_stock cambian, agregar el movimiento al kardex y revisar si se cruzó
+    el umbral de stock bajo. Las ventas y las importaciones escriben con UPDATE/upsert
+    y llaman a KardexService directamente.
+    """
+    if not created and not any(instance.has_changed(f) for f in instance.tracked_fields):
+        return
+    from .services import CambioStock, NivelStock, KardexService
+    despues = NivelStock(*(getattr(instance, f) for f in instance.tracked_fields))
+    antes = None
+    if not created:
+        antes = NivelStock(*(
+            instance.previous_value(f) if instance.previous_value(f) is not None else getattr(instance, f)
+            for f in instance.tracked_fields
+        ))
+    KardexService.record([CambioStock(instance.pk, antes, despues)], 'INICIAL' if created else 'AJUSTE')
@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks are slow, so tests marked `benchmark` only run with RUN_BENCHMARKS=1."""
+    if os.environ.get('RUN_BENCHMARKS'):
+        return
+    skip = pytest.mark.skip(reason='Set RUN_BENCHMARKS=1 to run benchmarks')
+    for item in items:
+        if item.get_closest_marker('benchmark'):
+            item.add_marker(skip)
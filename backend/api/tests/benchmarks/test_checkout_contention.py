@@ -0,0 +1,93 @@
+import multiprocessing
+import random
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+
+from api.models import Cliente, Orden, Producto, ReservaStock
+from api.services import OrderService
+
+# Row-lock contention needs real concurrent connections, so this one only
+# makes sense on PostgreSQL (SQLite serializes writers on a file lock):
+#   RUN_BENCHMARKS=1 DATABASE_URL=postgres://... pytest api/tests/benchmarks -s
+
+WORKERS = 8
+ROUNDS = 50
+PRODUCTS = 5
+
+
+def _checkout_worker(user_id, product_ids, rounds, seed, results):
+    """Buys every product in a random order, `rounds` times, and reports the outcome."""
+    rng = random.Random(seed)
+    user = User.objects.get(id=user_id)
+    ok = deadlocks = rejected = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cart = [{'type': 'product', 'id': pid, 'quantity': 1} for pid in rng.sample(product_ids, k=len(product_ids))]
+        try:
+            OrderService.create_order_from_cart(user, cart)
+            ok += 1
+        except ValueError:
+            rejected += 1
+        except DatabaseError as e:
+            if 'deadlock' not in str(e).lower():
+                raise
+            deadlocks += 1
+    results.put((ok, deadlocks, rejected, time.perf_counter() - start))
+    connections.close_all()
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_bench_checkout_contention(capsys):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Contention benchmark requires PostgreSQL')
+
+    productos = Producto.objects.bulk_create([
+        Producto(nombre=f'Kit Bench {i}', precio_venta=1000, stock_actual=WORKERS * ROUNDS) for i in range(PRODUCTS)
+    ])
+    product_ids = [p.id for p in productos]
+    users = []
+    for i in range(WORKERS):
+        user = User.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@bench.test')
+        Cliente.objects.create(user=user, nombre_completo=f'Buyer {i}', email=user.email)
+        users.append(user)
+
+    # Children inherit the test database settings; they must not share our socket
+    connections.close_all()
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_checkout_worker, args=(user.id, product_ids, ROUNDS, seed, results))
+        for seed, user in enumerate(users)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    outcomes = [results.get(timeout=300) for _ in procs]
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    ok = sum(o[0] for o in outcomes)
+    deadlocks = sum(o[1] for o in outcomes)
+    rejected = sum(o[2] for o in outcomes)
+    with capsys.disabled():
+        print(
+            f"\n[bench] checkout contention workers={WORKERS} rounds={ROUNDS} products={PRODUCTS} "
+            f"orders/s={ok / elapsed:>7.1f} ok={ok} deadlocks={deadlocks} rejected={rejected} elapsed={elapsed:.2f}s"
+        )
+
+    assert deadlocks == 0
+    assert Orden.objects.count() == ok
+    # Every successful order reserved exactly one unit of each product; stock only drops on payment
+    reservado = dict(
+        ReservaStock.objects.filter(producto_id__in=product_ids, estado='ACTIVA')
+        .values('producto').annotate(total=Sum('cantidad')).values_list('producto', 'total')
+    )
+    for producto in Producto.objects.filter(id__in=product_ids):
+        assert producto.stock_actual == WORKERS * ROUNDS
+        assert reservado.get(producto.id, 0) == ok
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Cliente, EmailLog, Interes, Taller
+from api.services import NotificationService
+
+# Benchmarks are slow (10k recipients) so they only run on demand:
+#   RUN_BENCHMARKS=1 pytest api/tests/benchmarks -s
+RECIPIENTS = [100, 1000, 10000]
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def measure(fn):
+    """Runs fn() and returns (result, elapsed seconds, write statements issued)."""
+    writes = 0
+
+    def count_writes(execute, sql, params, many, context):
+        nonlocal writes
+        if sql.lstrip().upper().startswith(WRITE_PREFIXES):
+            writes += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_writes):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, writes
+
+
+def report(capsys, label, recipients, sink, elapsed, writes):
+    with capsys.disabled():
+        print(
+            f"\n[bench] {label:<22} n={recipients:<6} "
+            f"msgs/s={sink.received / elapsed:>8.1f} "
+            f"sessions={sink.sessions:<6} db_writes={writes:<6} "
+            f"failures={sink.failures} elapsed={elapsed:.2f}s"
+        )
+
+
+def create_clients(n, interes=None):
+    clientes = Cliente.objects.bulk_create(
+        [
+            Cliente(nombre_completo=f'Cliente {i}', email=f'cliente{i}@bench.test', estado_ciclo='CLIENTE')
+            for i in range(n)
+        ],
+        batch_size=1000,
+    )
+    if interes:
+        Through = Cliente.intereses_cliente.through
+        Through.objects.bulk_create(
+            [Through(cliente_id=c.id, interes_id=interes.id) for c in clientes],
+            batch_size=1000,
+        )
+    return clientes
+
+
+@pytest.fixture
+def taller(db):
+    interes = Interes.objects.create(nombre='Bench')
+    return Taller.objects.create(
+        nombre='Taller Benchmark',
+        descripcion='Taller usado para medir el envío masivo.',
+        fecha_taller=timezone.now().date(),
+        precio=10000,
+        categoria=interes,
+    )
+
+
+@pytest.mark.django_db
+def test_smtp_sink_counts_sessions_and_failures(smtp_sink, taller):
+    """Sanity check for the harness itself: every message is one session today."""
+    smtp_sink.configure(fail_every=3)
+    clientes = create_clients(6)
+
+    sent = NotificationService.notify_new_workshop(taller, clientes)
+
+    assert sent == 6  # failures are swallowed (fail_silently=True)
+    assert smtp_sink.received == 4
+    assert smtp_sink.failures == 2
+    assert smtp_sink.sessions == 6
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipients', RECIPIENTS)
+def test_bench_notify_new_workshop(smtp_sink, taller, capsys, recipients):
+    clientes = create_clients(recipients, taller.categoria)
+
+    sent, elapsed, writes = measure(lambda: NotificationService.notify_new_workshop(taller, clientes))
+
+    report(capsys, 'notify_new_workshop', recipients, smtp_sink, elapsed, writes)
+    assert sent == recipients
+    assert smtp_sink.received == recipients
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipients', RECIPIENTS)
+def test_bench_bulk_email_view(smtp_sink, capsys, recipients):
+    admin = User.objects.create_superuser(username='bench_admin', email='admin@bench.test', password='x')
+    api = APIClient()
+    api.force_authenticate(user=admin)
+    ids = [c.id for c in create_clients(recipients)]
+    payload = {'client_ids': ids, 'subject': 'Hola {nombre}', 'message': 'Mensaje para {email}'}
+
+    response, elapsed, writes = measure(lambda: api.post('/api/admin/send-bulk-email/', payload, format='json'))
+
+    report(capsys, 'BulkEmailView', recipients, smtp_sink, elapsed, writes)
+    assert response.status_code == 200
+    assert smtp_sink.received == recipients
+    assert EmailLog.objects.filter(status='SUCCESS').count() == recipients
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_bench_slow_flaky_provider(smtp_sink, taller, capsys):
+    """1k recipients against a provider with 5 ms latency and 1% transient failures."""
+    smtp_sink.configure(latency=0.005, fail_every=100)
+    clientes = create_clients(1000)
+
+    _, elapsed, writes = measure(lambda: NotificationService.notify_new_workshop(taller, clientes))
+
+    report(capsys, 'slow/flaky provider', 1000, smtp_sink, elapsed, writes)
+    assert smtp_sink.received + smtp_sink.failures == 1000
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+
+from api.models import Cliente, Enrollment, Interes, Taller
+from api.services import ClientService, EnrollmentService
+
+# test_race_condition_enrollment scaled up: many buyers racing for a hot workshop.
+# Needs real row locks, so PostgreSQL only:
+#   RUN_BENCHMARKS=1 DATABASE_URL=postgres://... pytest api/tests/benchmarks -s
+
+BUYERS = 64
+SEATS = 40
+
+
+def locked_enroll(user, taller_id):
+    """The previous approach: lock the workshop first, hold it through every write."""
+    cliente = ClientService.resolve_client(user)
+    with transaction.atomic():
+        taller = Taller.objects.select_for_update().get(id=taller_id)
+        if taller.cupos_disponibles <= 0:
+            raise ValueError(EnrollmentService.SIN_CUPOS)
+        Enrollment.objects.create(
+            cliente=cliente, content_type=ContentType.objects.get_for_model(Taller),
+            object_id=taller.id, monto_pagado=0, estado_pago='PENDIENTE'
+        )
+        if taller.categoria:
+            cliente.intereses_cliente.add(taller.categoria)
+        if cliente.estado_ciclo in ['LEAD', 'PROSPECTO']:
+            cliente.estado_ciclo = 'CLIENTE'
+            cliente.save()
+        taller.cupos_disponibles -= 1
+        taller.save()
+
+
+def conditional_enroll(user, taller_id):
+    EnrollmentService.create_enrollment(user, 'taller', taller_id)
+
+
+def race(enroll, taller, users):
+    sold = []
+    barrier = threading.Barrier(len(users))
+
+    def buyer(user):
+        try:
+            barrier.wait()
+            enroll(user, taller.id)
+            sold.append(user.id)
+        except ValueError:
+            pass
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(sold), time.perf_counter() - start
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('name,enroll', [('select_for_update', locked_enroll), ('conditional_update', conditional_enroll)])
+def test_bench_hot_workshop_seats(name, enroll, capsys):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Seat contention benchmark requires PostgreSQL')
+
+    categoria = Interes.objects.create(nombre=f'Bench {name}')
+    taller = Taller.objects.create(
+        nombre=f'Taller Hot {name}', precio=1000, cupos_totales=SEATS, fecha_taller='2030-12-31', categoria=categoria
+    )
+    users = []
+    for i in range(BUYERS):
+        user = User.objects.create_user(username=f'{name}_{i}', email=f'{name}_{i}@bench.test')
+        Cliente.objects.create(user=user, nombre_completo=user.username, email=user.email)
+        users.append(user)
+
+    sold, elapsed = race(enroll, taller, users)
+    with capsys.disabled():
+        print(f"\n[bench] seats {name:<18} buyers={BUYERS} seats={SEATS} sold={sold} "
+              f"elapsed={elapsed * 1000:>8.1f}ms enrollments/s={sold / elapsed:>7.1f}")
+
+    taller.refresh_from_db()
+    assert sold == SEATS
+    assert taller.cupos_disponibles == 0
+    assert Enrollment.objects.filter(object_id=taller.id).count() == SEATS
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP
+
+
+class SinkHandler:
+    """
+    aiosmtpd handler that accepts and discards every message.
+    `latency` (seconds) is awaited before answering DATA and `fail_every`
+    rejects every N-th message with a transient 451, so tests can emulate a
+    slow or flaky provider.
+    """
+    def __init__(self, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.reset()
+
+    def reset(self):
+        self.sessions = 0
+        self.received = 0
+        self.failures = 0
+        self.recipients = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        attempt = self.received + self.failures + 1
+        if self.fail_every and attempt % self.fail_every == 0:
+            self.failures += 1
+            return '451 4.3.0 Injected failure'
+
+        self.received += 1
+        self.recipients.extend(envelope.rcpt_tos)
+        return '250 Message accepted for delivery'
+
+
+class _CountingSMTP(SMTP):
+    def connection_made(self, transport):
+        self.event_handler.sessions += 1
+        super().connection_made(transport)
+
+
+class SMTPSink(Controller):
+    """Local SMTP stand-in running on a background thread."""
+
+    def __init__(self, latency=0.0, fail_every=0):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        super().__init__(SinkHandler(latency, fail_every), hostname='127.0.0.1', port=port)
+
+    def factory(self):
+        return _CountingSMTP(self.handler, **self.SMTP_kwargs)
+
+    def start(self):
+        super().start()
+        # The controller opens a probe connection on startup; don't count it.
+        self.handler.reset()
+
+    # Shortcuts so tests read naturally
+    @property
+    def sessions(self):
+        return self.handler.sessions
+
+    @property
+    def received(self):
+        return self.handler.received
+
+    @property
+    def failures(self):
+        return self.handler.failures
+
+    def configure(self, latency=None, fail_every=None):
+        if latency is not None:
+            self.handler.latency = latency
+        if fail_every is not None:
+            self.handler.fail_every = fail_every
+        self.handler.reset()
+
+
+@pytest.fixture
+def smtp_sink(settings):
+    """
+    Starts an SMTPSink and points Django's SMTP backend at it.
+    """
+    sink = SMTPSink()
+    sink.start()
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = sink.hostname
+    settings.EMAIL_PORT = sink.port
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_HOST_USER = ''
+    settings.EMAIL_HOST_PASSWORD = ''
+    settings.DEFAULT_FROM_EMAIL = 'noreply@tmm.test'
+
+    yield sink
+    sink.stop()
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the n8n webhook. Records every JSON body and
+    answers with the next status in `statuses` (200 once exhausted).
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.connections = 0
+        super().__init__(('127.0.0.1', 0), _WebhookHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/post-venta'
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append({'headers': dict(self.headers), 'json': json.loads(body or b'null')})
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_receiver(settings):
+    """
+    Starts a WebhookReceiver and points N8N_WEBHOOK_URL at it.
+    """
+    server = WebhookReceiver()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    settings.N8N_WEBHOOK_URL = server.url
+    settings.WEBHOOK_BACKOFF_SECONDS = 30
+    settings.WEBHOOK_MAX_ATTEMPTS = 3
+
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,58 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from api.email_async import AsyncEmailBackend, asend_personalized
+from api.email_utils import build_new_workshop_email
+from api.models import Cliente, EmailLog, Taller
+from api.services import NotificationService
+
+
+@pytest.fixture
+def taller(db):
+    return Taller.objects.create(
+        nombre='Taller Async',
+        descripcion='Notificaciones concurrentes',
+        fecha_taller=timezone.now().date(),
+        precio=10000,
+    )
+
+
+def make_clients(n):
+    return Cliente.objects.bulk_create([
+        Cliente(nombre_completo=f'Async {i}', email=f'async{i}@test.com') for i in range(n)
+    ])
+
+
+@pytest.mark.django_db
+def test_async_notify_reuses_pooled_sessions(smtp_sink, settings, taller):
+    settings.EMAIL_ASYNC_POOL_SIZE = 4
+    make_clients(40)
+
+    sent = async_to_sync(NotificationService.anotify_new_workshop)(taller, Cliente.objects.all())
+
+    assert sent == 40
+    assert smtp_sink.received == 40
+    # Bounded concurrency: never more sessions than pool slots
+    assert smtp_sink.sessions <= 4
+    assert EmailLog.objects.filter(status='SUCCESS', subject=f'Nuevo Taller: {taller.nombre}').count() == 40
+
+
+@pytest.mark.django_db
+def test_async_send_logs_injected_failures(smtp_sink, taller, django_assert_max_num_queries):
+    smtp_sink.configure(fail_every=5)
+    clientes = make_clients(20)
+
+    async def run():
+        async with AsyncEmailBackend(pool_size=2) as backend:
+            sent = await asend_personalized(clientes, lambda c: build_new_workshop_email(taller, c), backend=backend)
+        return sent, backend.sessions_opened
+
+    # The whole batch is logged with one bulk insert
+    with django_assert_max_num_queries(1):
+        sent, sessions = async_to_sync(run)()
+
+    assert sent == 16
+    assert sessions <= 2
+    assert EmailLog.objects.filter(status='SUCCESS').count() == 16
+    assert EmailLog.objects.filter(status='FAIL').count() == 4
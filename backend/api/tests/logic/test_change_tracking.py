@@ -0,0 +1,83 @@
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+
+from api.models import Cliente, Enrollment, ListaEspera, Orden, Taller, Transaccion, WebhookOutbox
+
+
+@pytest.mark.django_db
+class TestChangeTracking:
+    def setup_method(self):
+        self.cliente = Cliente.objects.create(nombre_completo='Tracking', email='tracking@test.com')
+        self.taller = Taller.objects.create(
+            nombre='Taller Tracking', precio=10000, cupos_totales=1, fecha_taller='2030-01-01'
+        )
+        self.ct = ContentType.objects.get_for_model(Taller)
+        created = Enrollment.objects.create(
+            cliente=self.cliente, content_type=self.ct, object_id=self.taller.id, estado_pago='PAGADO'
+        )
+        self.enrollment = Enrollment.objects.get(pk=created.pk)
+
+    def test_tracks_transitions_and_resets_after_save(self):
+        enrollment = self.enrollment
+        assert not enrollment.has_changed('estado_pago')
+
+        enrollment.estado_pago = 'ANULADO'
+        assert enrollment.has_changed('estado_pago')
+        assert enrollment.previous_value('estado_pago') == 'PAGADO'
+
+        enrollment.save()
+        assert not enrollment.has_changed('estado_pago')
+        assert enrollment.previous_value('estado_pago') == 'ANULADO'
+
+    def test_non_state_save_runs_no_handler_queries(self, django_assert_num_queries):
+        # Progress update: only the UPDATE itself, no content_type / waitlist lookups
+        self.enrollment.progreso = 50
+        with django_assert_num_queries(1):
+            self.enrollment.save()
+
+    def test_resaving_anulado_does_not_notify_again(self, mailoutbox, django_assert_num_queries,
+                                                    django_capture_on_commit_callbacks):
+        for i in range(2):
+            user = User.objects.create_user(username=f'waiter{i}', email=f'waiter{i}@test.com')
+            ListaEspera.objects.create(taller=self.taller, usuario=user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.enrollment.estado_pago = 'ANULADO'
+            self.enrollment.save()
+        assert len(mailoutbox) == 1
+
+        # Re-save while already ANULADO: only the UPDATE, nobody else is notified
+        with django_assert_num_queries(1):
+            self.enrollment.save()
+        assert len(mailoutbox) == 1
+        assert ListaEspera.objects.filter(notificado=True).count() == 1
+
+    def test_orden_resave_skips_webhook_enqueue(self, settings, django_assert_num_queries):
+        settings.N8N_WEBHOOK_URL = 'http://127.0.0.1:9/post-venta'
+        orden = Orden.objects.create(cliente=self.cliente, monto_total=5000)
+        orden.estado_pago = 'PAGADO'
+        orden.save()
+        assert WebhookOutbox.objects.count() == 1
+
+        orden = Orden.objects.get(pk=orden.pk)
+        with django_assert_num_queries(1):
+            orden.save()
+
+    def test_transaccion_recomputes_only_on_approval_changes(self, django_assert_num_queries):
+        transaccion = Transaccion.objects.create(inscripcion=self.enrollment, monto=4000, estado='PENDIENTE')
+
+        transaccion.observacion = 'Revisado'
+        with django_assert_num_queries(1):
+            transaccion.save()
+
+        transaccion.estado = 'APROBADO'
+        transaccion.save()
+        self.enrollment.refresh_from_db()
+        assert (self.enrollment.monto_pagado, self.enrollment.estado_pago) == (4000, 'ABONADO')
+
+        # Un-approving gives the balance back
+        transaccion.estado = 'RECHAZADO'
+        transaccion.save()
+        self.enrollment.refresh_from_db()
+        assert (self.enrollment.monto_pagado, self.enrollment.estado_pago) == (0, 'PENDIENTE')
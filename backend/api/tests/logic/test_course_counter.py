@@ -0,0 +1,62 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from rest_framework.test import APIClient
+
+from api.models import Curso, CursoContadorDelta
+from api.services import EnrollmentService
+
+
+@pytest.mark.django_db
+class TestCourseCounter:
+    def setup_method(self):
+        self.curso = Curso.objects.create(titulo='Curso Viral', descripcion='-', precio=5000, duracion='2 horas', estudiantes=10)
+        self.users = [User.objects.create_user(username=f'alumno{i}', email=f'alumno{i}@test.com') for i in range(3)]
+
+    def students_via_api(self):
+        return APIClient().get(f'/api/public/cursos/{self.curso.id}/').data['estudiantes']
+
+    def test_enrollment_appends_delta_without_touching_course_row(self):
+        with CaptureQueriesContext(connection) as ctx:
+            EnrollmentService.create_enrollment(self.users[0], 'curso', self.curso.id)
+        assert not any(q['sql'].startswith('UPDATE "api_curso"') for q in ctx.captured_queries)
+
+        self.curso.refresh_from_db()
+        assert self.curso.estudiantes == 10
+        assert self.students_via_api() == 11
+
+    def test_cancellations_and_compaction(self):
+        enrollments = [EnrollmentService.create_enrollment(u, 'curso', self.curso.id)[0] for u in self.users]
+        EnrollmentService.update_enrollment_status(enrollments[0].id, 'ANULADO')
+        EnrollmentService.delete_enrollment(enrollments[1].id)
+        assert CursoContadorDelta.objects.count() == 5
+        assert self.students_via_api() == 11
+
+        call_command('compact_course_counters', batch_size=2)
+
+        assert not CursoContadorDelta.objects.exists()
+        self.curso.refresh_from_db()
+        assert self.curso.estudiantes == 11
+        assert self.students_via_api() == 11
+
+    def test_admin_edit_is_recorded_as_delta(self):
+        EnrollmentService.create_enrollment(self.users[0], 'curso', self.curso.id)
+        admin = APIClient()
+        admin.force_authenticate(user=User.objects.create_superuser(username='admin_cursos', email='ac@test.com', password='x'))
+
+        response = admin.patch(f'/api/admin/cursos/{self.curso.id}/', {'estudiantes': 25}, format='json')
+        assert response.status_code == 200
+        assert response.data['estudiantes'] == 25
+
+        call_command('compact_course_counters')
+        self.curso.refresh_from_db()
+        assert self.curso.estudiantes == 25
+
+    def test_nested_serialization_reads_compacted_column_without_queries(self, django_assert_num_queries):
+        from api.serializers import CursoSerializer
+        EnrollmentService.create_enrollment(self.users[0], 'curso', self.curso.id)
+        curso = Curso.objects.get(pk=self.curso.pk)
+        with django_assert_num_queries(0):
+            assert CursoSerializer(curso).data['estudiantes'] == 10
@@ -78,3 +78,26 @@ class TestConcurrency:
         assert self.taller.cupos_disponibles == 0
         # If concurrency failed, we might see -1 or multiple enrollments
         assert enrollment_count <= 1
+
+
+@pytest.mark.django_db
+def test_seat_is_taken_by_last_conditional_update():
+    from django.test.utils import CaptureQueriesContext
+    from api.services import EnrollmentService
+
+    taller = Taller.objects.create(nombre="Taller Caliente", precio=100, cupos_totales=1, fecha_taller="2030-12-25")
+    buyers = [User.objects.create_user(username=f'buyer_{i}', email=f'buyer_{i}@test.com') for i in range(2)]
+
+    with CaptureQueriesContext(connection) as ctx:
+        EnrollmentService.create_enrollment(buyers[0], 'taller', taller.id)
+    statements = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+    # No row lock up front; the seat UPDATE is the final statement of the transaction
+    assert not any('FOR UPDATE' in sql and 'api_taller' in sql for sql in statements)
+    assert statements[-1].startswith('UPDATE "api_taller"') and '"cupos_disponibles" > 0' in statements[-1]
+
+    # Sold out: the whole enrollment rolls back
+    with pytest.raises(ValueError, match='no quedan cupos'):
+        EnrollmentService.create_enrollment(buyers[1], 'taller', taller.id)
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 0
+    assert Enrollment.objects.filter(object_id=taller.id).count() == 1
@@ -0,0 +1,130 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Cliente, EmailLog, Enrollment, Interes, NotificacionPendiente, Taller
+
+
+@pytest.fixture
+def admin_api(db):
+    admin = User.objects.create_superuser(username='digest_admin', email='admin@digest.test', password='x')
+    api = APIClient()
+    api.force_authenticate(user=admin)
+    return api
+
+
+@pytest.fixture
+def interes(db):
+    interes = Interes.objects.create(nombre='Yoga')
+    for i in range(5):
+        cliente = Cliente.objects.create(nombre_completo=f'Digest {i}', email=f'digest{i}@test.com', estado_ciclo='CLIENTE')
+        cliente.intereses_cliente.add(interes)
+    return interes
+
+
+def create_taller(api, interes, nombre):
+    response = api.post('/api/admin/talleres/', {
+        'nombre': nombre,
+        'descripcion': 'Taller del resumen',
+        'fecha_taller': (timezone.now().date() + datetime.timedelta(days=10)).isoformat(),
+        'precio': 10000,
+        'categoria': interes.id,
+    }, format='json')
+    assert response.status_code == 201, response.data
+    return response.data['id']
+
+
+@pytest.mark.django_db
+def test_digest_mode_sends_one_email_per_client(smtp_sink, settings, admin_api, interes):
+    settings.NOTIFICATION_DIGEST_ENABLED = True
+    for nombre in ('Taller A', 'Taller B', 'Taller C'):
+        create_taller(admin_api, interes, nombre)
+
+    # Nothing is sent while the window is open, every event is queued
+    assert smtp_sink.received == 0
+    assert NotificacionPendiente.objects.filter(enviado_en__isnull=True).count() == 15
+
+    call_command('send_notification_digests')
+
+    assert smtp_sink.received == 5
+    assert smtp_sink.sessions == 1
+    assert not NotificacionPendiente.objects.filter(enviado_en__isnull=True).exists()
+    for log in EmailLog.objects.filter(status='SUCCESS'):
+        assert log.subject == 'Novedades de TMM Bienestar'
+        for nombre in ('Taller A', 'Taller B', 'Taller C'):
+            assert nombre in log.body_text
+
+    # A second run has nothing left to send
+    call_command('send_notification_digests')
+    assert smtp_sink.received == 5
+
+
+@pytest.mark.django_db
+def test_digest_collapses_repeated_reschedules(settings, admin_api, interes, mailoutbox):
+    settings.NOTIFICATION_DIGEST_ENABLED = True
+    taller = Taller.objects.create(nombre='Taller Movido', descripcion='x', precio=10000, fecha_taller=datetime.date(2030, 1, 10))
+    cliente = Cliente.objects.first()
+    Enrollment.objects.create(
+        cliente=cliente, content_type=ContentType.objects.get_for_model(Taller), object_id=taller.id,
+        estado_pago='PAGADO', monto_pagado=10000,
+    )
+
+    for fecha in ('2030-01-17', '2030-01-24'):
+        response = admin_api.patch(f'/api/admin/talleres/{taller.id}/', {'fecha_taller': fecha}, format='json')
+        assert response.status_code == 200
+
+    assert NotificacionPendiente.objects.filter(tipo='ACTUALIZACION').count() == 2
+    assert len(mailoutbox) == 0
+
+    call_command('send_notification_digests')
+
+    assert len(mailoutbox) == 1
+    body = mailoutbox[0].body
+    assert mailoutbox[0].subject == 'Novedades: Taller Movido'
+    # Original schedule next to the latest one, intermediate change omitted
+    assert '10 de January de 2030' in body
+    assert '24 de January de 2030' in body
+    assert '17 de January de 2030' not in body
+
+
+@pytest.mark.django_db
+def test_failed_digest_stays_queued(smtp_sink, settings, admin_api, interes):
+    settings.NOTIFICATION_DIGEST_ENABLED = True
+    create_taller(admin_api, interes, 'Taller Reintento')
+    smtp_sink.configure(fail_every=5)
+
+    call_command('send_notification_digests')
+
+    assert smtp_sink.received == 4
+    assert EmailLog.objects.filter(status='FAIL').count() == 1
+    assert NotificacionPendiente.objects.filter(enviado_en__isnull=True).count() == 1
+
+    call_command('send_notification_digests')
+    assert smtp_sink.received == 5
+    assert not NotificacionPendiente.objects.filter(enviado_en__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_interrupted_run_keeps_delivered_digests(settings, admin_api, interes, mailoutbox, monkeypatch):
+    from api import email_utils
+
+    settings.NOTIFICATION_DIGEST_ENABLED = True
+    create_taller(admin_api, interes, 'Taller Corte')
+    original = email_utils.build_notification_digest_email
+
+    def build(cliente, eventos):
+        if len(mailoutbox) == 3:
+            raise RuntimeError('worker killed')
+        return original(cliente, eventos)
+
+    monkeypatch.setattr(email_utils, 'build_notification_digest_email', build)
+    with pytest.raises(RuntimeError):
+        email_utils.send_notification_digests(batch_size=2)
+
+    assert NotificacionPendiente.objects.filter(enviado_en__isnull=False).count() == 3
+    assert EmailLog.objects.filter(status='SUCCESS').count() == 3
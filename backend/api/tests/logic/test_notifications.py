@@ -75,3 +75,18 @@ class NotificationTest(TestCase):
         self.assertEqual(len(mail.outbox), 3)
         # In a real unit test with mocked backend we'd check connection usage, 
         # but here we just check emails are queued.
+
+    def test_interest_audience_streams_in_chunks(self):
+        """Audience is resolved in one query and yielded in chunks of lightweight rows."""
+        with self.assertNumQueries(1):
+            chunks = list(NotificationService.iter_interest_audience(self.interest, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        emails = {row.email for chunk in chunks for row in chunk}
+        self.assertEqual(emails, {"lead@example.com", "prospect@example.com", "active@example.com"})
+
+        # Chunks feed the sender directly
+        mail.outbox = []
+        sent = sum(NotificationService.notify_new_workshop(self.taller, chunk) for chunk in chunks)
+        self.assertEqual(sent, 3)
+        self.assertIn("Active Client", mail.outbox[0].body + mail.outbox[1].body + mail.outbox[2].body)
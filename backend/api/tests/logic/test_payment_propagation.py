@@ -0,0 +1,156 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Curso, Enrollment, MovimientoPago, Orden, Taller, Transaccion, recalculo_diferido
+from api.services import OrderService
+
+
+@pytest.fixture
+def orden_con_inscripciones(db):
+    user = User.objects.create_user(username='comprador', email='comprador@test.com')
+    talleres = [
+        Taller.objects.create(nombre=f'Taller {i}', precio=10000, cupos_totales=5, fecha_taller='2030-01-01')
+        for i in range(4)
+    ]
+    cursos = [
+        Curso.objects.create(titulo=f'Curso {i}', descripcion='-', precio=20000, duracion='1 hora')
+        for i in range(4)
+    ]
+    cart = [{'type': 'taller', 'id': t.id} for t in talleres] + [{'type': 'curso', 'id': c.id} for c in cursos]
+    return OrderService.create_order_from_cart(user, cart)
+
+
+def recomputes(ctx):
+    """Each order recompute ends with exactly one bulk UPDATE of its enrollments."""
+    return sum(1 for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_enrollment"'))
+
+
+@pytest.mark.django_db
+def test_partial_payment_is_spread_with_one_bulk_update(orden_con_inscripciones, django_assert_max_num_queries):
+    orden = orden_con_inscripciones
+    assert orden.monto_total == 120000
+
+    # insert + ledger (lock, balance, entry) + order refresh/save + enrollments
+    # + one price query per type + bulk update + 4 savepoints, regardless of items
+    with django_assert_max_num_queries(14):
+        Transaccion.objects.create(orden=orden, monto=60000, estado='APROBADO')
+
+    orden.refresh_from_db()
+    assert orden.estado_pago == 'ABONADO'
+    pagos = {e.content_object.precio: (e.monto_pagado, e.estado_pago) for e in orden.enrollments.all()}
+    assert pagos == {10000: (5000, 'ABONADO'), 20000: (10000, 'ABONADO')}
+
+
+@pytest.mark.django_db
+def test_repeated_recompute_requests_are_coalesced(orden_con_inscripciones):
+    orden = orden_con_inscripciones
+    with CaptureQueriesContext(connection) as ctx:
+        with recalculo_diferido():
+            Transaccion.objects.create(orden=orden, monto=60000, estado='APROBADO')
+            Transaccion.objects.create(orden=orden, monto=60000, estado='APROBADO')
+            orden.actualizar_estado_pago()
+            # Nothing ran yet
+            assert Orden.objects.get(pk=orden.pk).estado_pago == 'PENDIENTE'
+
+    assert recomputes(ctx) == 1
+    assert Orden.objects.get(pk=orden.pk).estado_pago == 'PAGADO'
+    assert set(Enrollment.objects.values_list('estado_pago', flat=True)) == {'PAGADO'}
+
+
+@pytest.mark.django_db
+def test_recompute_after_save_in_same_transaction_runs_once(orden_con_inscripciones):
+    orden = orden_con_inscripciones
+    with CaptureQueriesContext(connection) as ctx:
+        with transaction.atomic():
+            Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='APROBADO')
+            orden.actualizar_estado_pago()
+            assert orden.estado_pago == 'PAGADO'
+
+    assert recomputes(ctx) == 1
+    assert set(Enrollment.objects.values_list('estado_pago', flat=True)) == {'PAGADO'}
+
+    # A new ledger change inside the same transaction recomputes again
+    with CaptureQueriesContext(connection) as ctx:
+        with transaction.atomic():
+            Transaccion.objects.filter(orden=orden).get().delete()
+            orden.actualizar_estado_pago()
+    assert recomputes(ctx) == 1
+    assert orden.estado_pago == 'PENDIENTE'
+
+
+@pytest.mark.django_db
+def test_recompute_rolled_back_with_savepoint_runs_again(orden_con_inscripciones):
+    orden = orden_con_inscripciones
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                orden.actualizar_estado_pago()
+                Orden.objects.filter(pk=orden.pk).update(estado_pago='RECHAZADO')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with CaptureQueriesContext(connection) as ctx:
+            orden.actualizar_estado_pago()
+    assert recomputes(ctx) == 1
+
+
+@pytest.mark.django_db
+def test_admin_approval_recomputes_order_once(orden_con_inscripciones, mailoutbox):
+    orden = orden_con_inscripciones
+    transaccion = Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='PENDIENTE')
+    admin = User.objects.create_superuser(username='admin_pagos', email='admin_pagos@test.com', password='x')
+    api = APIClient()
+    api.force_authenticate(user=admin)
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = api.post(f'/api/admin/transacciones/{transaccion.id}/aprobar/')
+    assert response.status_code == 200
+    assert recomputes(ctx) == 1
+    assert Orden.objects.get(pk=orden.pk).estado_pago == 'PAGADO'
+
+
+@pytest.mark.django_db
+def test_ledger_keeps_signed_entries_and_running_balance(orden_con_inscripciones):
+    orden = orden_con_inscripciones
+    pago = Transaccion.objects.create(orden=orden, monto=30000, estado='APROBADO')
+    Transaccion.objects.create(orden=orden, monto=20000, estado='APROBADO')
+    pago.monto = 40000  # admin corrects the approved amount
+    pago.save()
+    pago.estado = 'RECHAZADO'
+    pago.save()
+
+    assert list(orden.movimientos_pago.values_list('monto', 'saldo')) == [
+        (30000, 30000), (20000, 50000), (10000, 60000), (-40000, 20000)
+    ]
+    orden.refresh_from_db()
+    assert orden.total_aprobado == 20000
+    assert orden.estado_pago == 'ABONADO'
+
+    # A full save of a stale instance does not overwrite the materialized balance
+    stale = Orden.objects.get(pk=orden.pk)
+    Transaccion.objects.create(orden=orden, monto=5000, estado='APROBADO')
+    stale.estado_entrega = 'EN_PREPARACION'
+    stale.save()
+    assert Orden.objects.get(pk=orden.pk).total_aprobado == 25000
+
+
+@pytest.mark.django_db
+def test_approval_override_is_validated_against_ledger_balance(orden_con_inscripciones, mailoutbox):
+    orden = orden_con_inscripciones
+    Transaccion.objects.create(orden=orden, monto=100000, estado='APROBADO')
+    transaccion = Transaccion.objects.create(orden=orden, monto=50000, estado='PENDIENTE')
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='admin_libro', email='l@test.com', password='x'))
+    url = f'/api/admin/transacciones/{transaccion.id}/aprobar/'
+
+    response = api.post(url, {'monto': 30000}, format='json')
+    assert response.status_code == 400
+    assert 'saldo pendiente (20000)' in response.data['error']
+
+    assert api.post(url, {'monto': 20000}, format='json').status_code == 200
+    orden.refresh_from_db()
+    assert (orden.total_aprobado, orden.estado_pago) == (120000, 'PAGADO')
+    assert MovimientoPago.objects.filter(orden=orden).count() == 2
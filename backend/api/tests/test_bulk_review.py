@@ -0,0 +1,100 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import EmailLog, Enrollment, MovimientoPago, Orden, Producto, ReservaStock, Taller, Transaccion
+from api.services import EnrollmentService, OrderService
+
+URL = '/api/admin/transacciones/lote/'
+
+
+@pytest.fixture
+def admin_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='revisor', email='revisor@test.com', password='x'))
+    return api
+
+
+@pytest.fixture
+def pendientes(db):
+    """Three orders with a pending full-payment receipt and one workshop enrollment with a pending receipt."""
+    producto = Producto.objects.create(nombre='Kit Lote', precio_venta=1000, stock_actual=50)
+    transacciones = []
+    for i in range(3):
+        user = User.objects.create_user(username=f'cliente{i}', email=f'cliente{i}@test.com')
+        orden = OrderService.create_order_from_cart(user, [{'type': 'product', 'id': producto.id, 'quantity': 2}])
+        transacciones.append(Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='PENDIENTE'))
+    taller = Taller.objects.create(nombre='Taller Lote', precio=10000, cupos_totales=5, fecha_taller='2030-01-01')
+    user = User.objects.create_user(username='alumna', email='alumna@test.com')
+    inscripcion = EnrollmentService.create_enrollment(user, 'taller', taller.id)[0]
+    transacciones.append(Transaccion.objects.create(inscripcion=inscripcion, monto=10000, estado='PENDIENTE'))
+    return transacciones
+
+
+def count(ctx, prefix):
+    return sum(1 for q in ctx.captured_queries if q['sql'].startswith(prefix))
+
+
+@pytest.mark.django_db
+def test_bulk_approval_writes_in_batches(admin_api, pendientes, mailoutbox, django_capture_on_commit_callbacks):
+    *de_ordenes, de_inscripcion = pendientes
+    items = [{'id': t.id} for t in de_ordenes] + [{'id': de_inscripcion.id, 'monto': 4000}]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_api.post(URL, {'accion': 'aprobar', 'items': items}, format='json')
+    assert response.status_code == 200
+    assert sorted(response.data['procesadas']) == sorted(t.id for t in pendientes)
+
+    assert count(ctx, 'UPDATE "api_transaccion"') == 1
+    assert count(ctx, 'INSERT INTO "api_movimientopago"') == 1
+    assert set(Orden.objects.values_list('estado_pago', 'total_aprobado')) == {('PAGADO', 2000)}
+    assert MovimientoPago.objects.count() == 4
+
+    inscripcion = Enrollment.objects.get(pk=de_inscripcion.inscripcion_id)
+    assert (inscripcion.monto_pagado, inscripcion.estado_pago) == (4000, 'ABONADO')
+    saldo = Transaccion.objects.get(inscripcion=inscripcion, estado='PENDIENTE')
+    assert saldo.monto == 6000
+
+    # One email per receipt, logged in one batch after commit
+    assert len(mailoutbox) == 4
+    assert EmailLog.objects.filter(subject__startswith='Pago Aprobado').count() == 4
+
+
+@pytest.mark.django_db
+def test_bulk_approval_is_all_or_nothing(admin_api, pendientes, mailoutbox):
+    items = [{'id': t.id} for t in pendientes[:3]] + [{'id': pendientes[3].id, 'monto': 15000}, {'id': 999999}]
+
+    response = admin_api.post(URL, {'accion': 'aprobar', 'items': items}, format='json')
+    assert response.status_code == 400
+    assert response.data['errores'] == {
+        pendientes[3].id: 'El monto (15000) excede el saldo pendiente (10000)',
+        999999: 'Transacción no encontrada',
+    }
+    assert set(Transaccion.objects.values_list('estado', flat=True)) == {'PENDIENTE'}
+    assert not MovimientoPago.objects.exists()
+    assert len(mailoutbox) == 0
+
+
+@pytest.mark.django_db
+def test_bulk_rejection_releases_reservations(admin_api, pendientes, mailoutbox, django_capture_on_commit_callbacks):
+    de_ordenes = pendientes[:3]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_api.post(URL, {
+            'accion': 'rechazar', 'items': [{'id': t.id} for t in de_ordenes], 'observacion': 'Monto no coincide'
+        }, format='json')
+    assert response.status_code == 200
+
+    assert set(Transaccion.objects.filter(id__in=[t.id for t in de_ordenes]).values_list('estado', 'observacion')) == {
+        ('RECHAZADO', 'Monto no coincide')
+    }
+    assert set(Orden.objects.values_list('estado_pago', flat=True)) == {'RECHAZADO'}
+    assert not ReservaStock.objects.filter(estado='ACTIVA').exists()
+    assert len(mailoutbox) == 3
+    assert 'Monto no coincide' in mailoutbox[0].alternatives[0][0]
+
+    # Already processed: the retry is rejected as a whole
+    response = admin_api.post(URL, {'accion': 'rechazar', 'items': [de_ordenes[0].id]}, format='json')
+    assert response.status_code == 400
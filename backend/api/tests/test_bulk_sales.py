@@ -0,0 +1,67 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Cliente, DetalleVenta, MovimientoInventario, Producto, VentaProducto
+
+URL = '/api/admin/ventas/lote/'
+
+
+@pytest.fixture
+def admin_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='caja', email='caja@test.com', password='x'))
+    return api
+
+
+@pytest.fixture
+def catalogo(db):
+    productos = [Producto.objects.create(nombre=f'Kit Feria {i}', precio_venta=1000 * (i + 1), stock_actual=100) for i in range(3)]
+    clientes = [Cliente.objects.create(nombre_completo=f'Visita {i}', email=f'visita{i}@test.com') for i in range(12)]
+    return productos, clientes
+
+
+def ventas_para(productos, clientes):
+    return [
+        {'cliente_id': c.id, 'detalles': [{'producto_id': p.id, 'cantidad': 2} for p in productos]}
+        for c in clientes
+    ]
+
+
+@pytest.mark.django_db
+def test_bulk_sales_are_ingested_with_constant_queries(admin_api, catalogo):
+    productos, clientes = catalogo
+
+    with CaptureQueriesContext(connection) as pocas:
+        assert admin_api.post(URL, {'ventas': ventas_para(productos, clientes[:2])}, format='json').status_code == 201
+    with CaptureQueriesContext(connection) as muchas:
+        response = admin_api.post(URL, {'ventas': ventas_para(productos, clientes[2:])}, format='json')
+    assert response.status_code == 201
+    assert len(muchas) == len(pocas)
+
+    assert VentaProducto.objects.count() == 12
+    assert DetalleVenta.objects.count() == 36
+    assert VentaProducto.objects.get(id=response.data['ventas'][0]).monto_total == 12000
+    assert set(Producto.objects.values_list('stock_actual', flat=True)) == {76}
+    assert set(Cliente.objects.values_list('estado_ciclo', flat=True)) == {'CLIENTE'}
+    # One journal entry per product per batch
+    assert MovimientoInventario.objects.filter(tipo='VENTA_DIRECTA', cantidad=-20).count() == 3
+
+
+@pytest.mark.django_db
+def test_bulk_sales_are_all_or_nothing(admin_api, catalogo):
+    productos, clientes = catalogo
+    ventas = ventas_para(productos[:1], clientes[:2])
+    ventas.append({'cliente_email': 'VISITA3@test.com', 'detalles': [{'producto_id': productos[0].id, 'cantidad': 97}]})
+
+    response = admin_api.post(URL, {'ventas': ventas}, format='json')
+    assert response.status_code == 400
+    assert 'Kit Feria 0 (pedido: 101, disponible: 100)' in response.data['errores']['stock']
+
+    response = admin_api.post(URL, {'ventas': [{'cliente_email': 'nadie@test.com', 'detalles': [{'producto_id': productos[0].id}]}]}, format='json')
+    assert response.data['errores'] == {0: 'Cliente no encontrado: nadie@test.com'}
+
+    assert not VentaProducto.objects.exists()
+    assert Producto.objects.get(pk=productos[0].pk).stock_actual == 100
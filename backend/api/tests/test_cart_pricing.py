@@ -0,0 +1,78 @@
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from api.models import Curso, Orden, Producto, Taller
+from api.services import CartPricingService, EnrollmentService, OrderService
+
+
+@pytest.fixture
+def catalogo(db):
+    productos = [Producto.objects.create(nombre=f'Kit Carro {i}', precio_venta=1000, stock_actual=3) for i in range(5)]
+    talleres = [
+        Taller.objects.create(nombre=f'Taller Carro {i}', precio=8000, cupos_totales=1, fecha_taller='2030-01-01')
+        for i in range(3)
+    ]
+    cursos = [Curso.objects.create(titulo=f'Curso Carro {i}', descripcion='-', precio=5000, duracion='1 hora') for i in range(3)]
+    return productos, talleres, cursos
+
+
+@pytest.mark.django_db
+def test_resolver_uses_one_query_per_type(catalogo, django_assert_num_queries):
+    productos, talleres, cursos = catalogo
+    items = (
+        [{'type': 'product', 'id': p.id, 'quantity': 2} for p in productos]
+        + [{'type': 'workshop', 'id': t.id} for t in talleres]
+        + [{'type': 'course', 'id': c.id} for c in cursos]
+    )
+    with django_assert_num_queries(3):
+        resueltos = CartPricingService.resolve(items)
+    assert sum(r.subtotal for r in resueltos) == 5 * 2000 + 3 * 8000 + 3 * 5000
+    assert all(r.disponible for r in resueltos)
+
+
+@pytest.mark.django_db
+def test_cart_validate_endpoint_reports_each_problem(catalogo):
+    productos, talleres, cursos = catalogo
+    user = User.objects.create_user(username='reservante', email='reservante@test.com')
+    # Another order reserves 2 of the 3 units; the workshop's only seat is taken
+    OrderService.create_order_from_cart(user, [{'type': 'product', 'id': productos[0].id, 'quantity': 2},
+                                               {'type': 'taller', 'id': talleres[0].id}])
+
+    response = APIClient().post('/api/cart/validate/', {'items': [
+        {'type': 'product', 'id': productos[0].id, 'quantity': 1},
+        {'type': 'product', 'id': productos[0].id, 'quantity': 1},
+        {'type': 'taller', 'id': talleres[0].id},
+        {'type': 'curso', 'id': cursos[0].id},
+        {'type': 'curso', 'id': 999999},
+    ]}, format='json')
+    assert response.status_code == 200
+    assert response.data['valido'] is False
+    assert [i['error'] for i in response.data['items']] == [
+        'Stock insuficiente para Kit Carro 0. Disponible: 1',
+        'Stock insuficiente para Kit Carro 0. Disponible: 1',
+        EnrollmentService.SIN_CUPOS,
+        None,
+        'Curso 999999 no encontrado',
+    ]
+    assert response.data['items'][0]['stock_disponible'] == 1
+    assert response.data['items'][2]['cupos_disponibles'] == 0
+
+
+@pytest.mark.django_db
+def test_checkout_prices_enrollments_from_resolver(catalogo):
+    productos, talleres, cursos = catalogo
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_user(username='carro', email='carro@test.com'))
+
+    response = api.post('/api/checkout/', {'items': [
+        {'type': 'product', 'id': productos[1].id, 'quantity': 3},
+        {'type': 'taller', 'id': talleres[1].id},
+        {'type': 'curso', 'id': cursos[1].id},
+    ]}, format='json')
+    assert response.status_code == 201
+    assert Orden.objects.get(id=response.data['orden_id']).monto_total == 3000 + 8000 + 5000
+
+    response = api.post('/api/checkout/', {'items': [{'type': 'curso', 'id': 999999}]}, format='json')
+    assert response.status_code == 400
+    assert response.data['error'] == 'Curso 999999 no encontrado'
@@ -0,0 +1,71 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Cliente, ExportJob
+
+URL = '/api/admin/export/jobs/'
+
+
+@pytest.fixture
+def admin_api(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='exportjob', email='ej@test.com', password='x'))
+    return api
+
+
+@pytest.mark.django_db
+def test_identical_requests_share_the_active_job(admin_api):
+    pedido = {'model': 'clientes', 'format': 'csv', 'filters': {'type': 'B2C', 'status': 'ignorado'}}
+    primera = admin_api.post(URL, pedido, format='json')
+    assert primera.status_code == 202
+    assert (primera.data['estado'], primera.data['reutilizado']) == ('PENDIENTE', False)
+
+    segunda = admin_api.post(URL, {'model': 'clientes', 'filters': {'type': 'B2C'}}, format='json')
+    assert (segunda.data['id'], segunda.data['reutilizado']) == (primera.data['id'], True)
+
+    otro = admin_api.post(URL, {'model': 'clientes', 'format': 'excel', 'filters': {'type': 'B2C'}}, format='json')
+    assert otro.data['id'] != primera.data['id']
+
+    # Once the job is finished, the same request starts a fresh one
+    ExportJob.objects.filter(pk=primera.data['id']).update(estado='COMPLETADO')
+    assert admin_api.post(URL, pedido, format='json').data['reutilizado'] is False
+
+
+@pytest.mark.django_db
+def test_worker_generates_file_and_status_links_download(admin_api):
+    for i in range(3):
+        Cliente.objects.create(nombre_completo=f'Cliente Export {i}', email=f'ce{i}@test.com')
+    job_id = admin_api.post(URL, {'model': 'clientes'}, format='json').data['id']
+    assert admin_api.get(f'{URL}{job_id}/').data['url'] is None
+
+    call_command('run_export_jobs', batch_size=1)
+
+    response = admin_api.get(f'{URL}{job_id}/')
+    assert (response.data['estado'], response.data['filas_procesadas']) == ('COMPLETADO', 3)
+    assert response.data['url'].endswith(f'{URL}{job_id}/download/')
+
+    descarga = admin_api.get(response.data['url'])
+    lines = b''.join(descarga.streaming_content).decode().splitlines()
+    assert len(lines) == 4 and 'Cliente Export 0' in lines[1]
+
+
+@pytest.mark.django_db
+def test_failures_stale_jobs_and_invalid_requests(admin_api):
+    assert admin_api.post(URL, {'model': 'usuarios'}, format='json').status_code == 400
+    assert admin_api.post(URL, {'model': 'transacciones', 'filters': {'start_date': 'ayer'}},
+                          format='json').status_code == 400
+
+    fallido = ExportJob.objects.create(modelo='inexistente', huella='a')
+    abandonado = ExportJob.objects.create(modelo='productos', huella='b', estado='EN_PROCESO',
+                                          actualizado_en=timezone.now() - timedelta(hours=1))
+    call_command('run_export_jobs')
+
+    fallido.refresh_from_db()
+    abandonado.refresh_from_db()
+    assert fallido.estado == 'FALLIDO' and fallido.error
+    assert abandonado.estado == 'COMPLETADO' and abandonado.archivo
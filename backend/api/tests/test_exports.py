@@ -0,0 +1,86 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Curso, Interes, Producto, Taller, Transaccion
+from api.services import EnrollmentService, OrderService
+
+
+@pytest.fixture
+def admin_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='exporta', email='exporta@test.com', password='x'))
+    return api
+
+
+def comprar(n, categoria, lote=0):
+    taller = Taller.objects.create(nombre=f'Taller Export {lote}' if lote else 'Taller Export', precio=9000, cupos_totales=100, fecha_taller='2030-01-01',
+                                   categoria=categoria)
+    curso = Curso.objects.create(titulo=f'Curso Export {lote}' if lote else 'Curso Export', descripcion='-', precio=4000, duracion='1 hora')
+    producto = Producto.objects.create(nombre=f'Kit Export {lote}' if lote else 'Kit Export', precio_venta=1000, stock_actual=100)
+    for i in range(n):
+        user = User.objects.create_user(username=f'exp{lote}_{i}', email=f'exp{lote}_{i}@test.com')
+        inscripcion = EnrollmentService.create_enrollment(user, 'taller' if i % 2 else 'curso', taller.id if i % 2 else curso.id)[0]
+        Transaccion.objects.create(inscripcion=inscripcion, monto=1000, estado='PENDIENTE')
+        orden = OrderService.create_order_from_cart(user, [{'type': 'product', 'id': producto.id, 'quantity': i + 1}])
+        Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='PENDIENTE')
+
+
+def download(api, url, params):
+    with CaptureQueriesContext(connection) as ctx:
+        response = api.get(url, params)
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+    return lines, len(ctx)
+
+
+@pytest.mark.django_db
+def test_ingresos_export_streams_with_constant_queries(admin_api):
+    comprar(2, None)
+    lines, pocas = download(admin_api, '/api/admin/export/', {'model': 'ingresos'})
+    assert lines[0] == 'ID Transaccion,Fecha,Cliente,Item,Monto,Estado,Observacion'
+    assert len(lines) == 5
+    items = {line.split(',')[3] for line in lines[1:]}
+    assert {'Taller: Taller Export', 'Curso: Curso Export'} <= items
+
+    Transaccion.objects.all().delete()
+    comprar(8, None, lote=1)
+    lines, muchas = download(admin_api, '/api/admin/export/', {'model': 'ingresos'})
+    assert len(lines) == 17
+    assert muchas == pocas
+
+
+@pytest.mark.django_db
+def test_admin_transaction_list_and_export(admin_api):
+    categoria = Interes.objects.create(nombre='Bordado')
+    comprar(4, categoria)
+
+    response = admin_api.get('/api/admin/transactions/', {'type': 'pending', 'category': categoria.id})
+    assert [row['item'] for row in response.data] == ['Taller Export', 'Taller Export']
+    assert {row['category'] for row in response.data} == {'Bordado'}
+    fechas = [row['date'] for row in admin_api.get('/api/admin/transactions/', {'type': 'pending'}).data]
+    assert fechas == sorted(fechas, reverse=True) and len(fechas) == 4
+
+    lines, _ = download(admin_api, '/api/admin/transactions/', {'type': 'products', 'export': 'true'})
+    assert lines[0] == 'ID,Fecha,Cliente,Email,Item/Concepto,Monto,Estado,Tipo'
+    assert [line.split(',')[4] for line in lines[1:]] == ['4x Kit Export', '3x Kit Export', '2x Kit Export', '1x Kit Export']
+
+
+@pytest.mark.django_db
+def test_excel_export_is_written_row_by_row_to_a_temp_file(admin_api):
+    from io import BytesIO
+    from openpyxl import load_workbook
+
+    comprar(3, None)
+    response = admin_api.get('/api/admin/export/', {'model': 'ingresos', 'format': 'excel'})
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Disposition'] == 'attachment; filename="ingresos.xlsx"'
+
+    sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)['Ingresos']
+    rows = list(sheet.values)
+    assert rows[0] == ('ID Transaccion', 'Fecha', 'Cliente', 'Item', 'Monto', 'Estado', 'Observacion')
+    assert len(rows) == 7
+    assert {row[3] for row in rows[1:]} >= {'Taller: Taller Export', 'Curso: Curso Export'}
@@ -0,0 +1,87 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import IdempotencyKey, Orden, Producto, Transaccion
+
+
+@pytest.fixture
+def api(db):
+    user = User.objects.create_user(username='mobile', email='mobile@test.com', password='password')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def producto(db):
+    return Producto.objects.create(nombre='Kit Idempotente', precio_venta=1000, stock_actual=5)
+
+
+@pytest.mark.django_db
+def test_checkout_retry_replays_original_order(api, producto, django_assert_num_queries):
+    data = {'items': [{'type': 'product', 'id': producto.id, 'quantity': 2}]}
+    first = api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+    assert first.status_code == 201
+
+    # The retry is a rejected claim (INSERT in a savepoint) plus one lookup: no lock, no new order
+    with django_assert_num_queries(5):
+        retry = api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+    assert retry.status_code == 201
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert retry.data['orden_id'] == first.data['orden_id']
+    assert Orden.objects.count() == 1
+
+    # A new key is a new checkout
+    assert api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='retry-2').status_code == 201
+    assert Orden.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_reused_key_with_other_body_or_in_flight_is_rejected(api, producto):
+    data = {'items': [{'type': 'product', 'id': producto.id, 'quantity': 1}]}
+    api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='k')
+
+    otro = {'items': [{'type': 'product', 'id': producto.id, 'quantity': 3}]}
+    assert api.post('/api/checkout/', otro, format='json', HTTP_IDEMPOTENCY_KEY='k').status_code == 422
+
+    IdempotencyKey.objects.update(estado='EN_CURSO')
+    assert api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='k').status_code == 409
+    assert Orden.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_receipt_upload_retry_creates_one_transaction(api, producto, mailoutbox, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    orden_id = api.post('/api/checkout/', {'items': [{'type': 'product', 'id': producto.id}]}, format='json').data['orden_id']
+
+    def upload():
+        comprobante = SimpleUploadedFile('pago.png', b'fake-image-bytes', content_type='image/png')
+        return api.post('/api/admin/transacciones/', {'orden_id': orden_id, 'monto': 1000, 'comprobante': comprobante},
+                        format='multipart', HTTP_IDEMPOTENCY_KEY='upload-1')
+
+    first = upload()
+    retry = upload()
+    assert first.status_code == retry.status_code == 201
+    assert retry.data['id'] == first.data['id']
+    assert Transaccion.objects.count() == 1
+    assert len(mailoutbox) == 1
+
+
+@pytest.mark.django_db
+def test_expired_keys_are_purged_and_reusable(api, producto):
+    data = {'items': [{'type': 'product', 'id': producto.id, 'quantity': 1}]}
+    api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='old')
+    IdempotencyKey.objects.update(expira_en=timezone.now() - timedelta(minutes=1))
+
+    # Expired but not yet purged: the key runs again
+    assert 'Idempotent-Replayed' not in api.post('/api/checkout/', data, format='json', HTTP_IDEMPOTENCY_KEY='old')
+    assert Orden.objects.count() == 2
+
+    IdempotencyKey.objects.update(expira_en=timezone.now() - timedelta(minutes=1))
+    call_command('purge_idempotency_keys')
+    assert not IdempotencyKey.objects.exists()
@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.imports import import_rows, read_rows
+from api.models import AlertaStock, Cliente, Curso, MovimientoInventario, Producto
+
+URL = '/api/admin/import/'
+
+
+@pytest.fixture
+def admin_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='importa', email='importa@test.com', password='x'))
+    return api
+
+
+def subir(api, model, contenido, nombre='planilla.csv'):
+    archivo = SimpleUploadedFile(nombre, contenido.encode(), content_type='text/csv')
+    return api.post(f'{URL}?model={model}', {'file': archivo}, format='multipart')
+
+
+@pytest.mark.django_db
+def test_client_import_upserts_and_reports_row_errors(admin_api):
+    Cliente.objects.create(nombre_completo='Antigua', email='ana@test.com', estado_ciclo='CLIENTE')
+    response = subir(admin_api, 'clientes', '\n'.join([
+        'Email,Nombre,Telefono,Tipo',
+        'ana@test.com,Ana Nueva,56911111111,B2C',
+        'beto@test.com,,,B2B',
+        'no-es-un-email,Carla,,B2C',
+        ',Sin Email,,B2C',
+        'beto@test.com,Beto Final,,B2B',
+    ]))
+    assert response.status_code == 200
+    assert (response.data['created'], response.data['updated']) == (1, 2)
+    assert len(response.data['errors']) == 1 and response.data['errors'][0].startswith('Fila 3: email')
+
+    ana = Cliente.objects.get(email='ana@test.com')
+    assert (ana.nombre_completo, ana.telefono, ana.estado_ciclo) == ('Ana Nueva', '56911111111', 'CLIENTE')
+    assert Cliente.objects.get(email='beto@test.com').nombre_completo == 'Beto Final'
+
+
+@pytest.mark.django_db
+def test_import_queries_are_per_chunk_not_per_row(db):
+    filas = [(i, {'Titulo': f'Curso {i}', 'Precio': 1000, 'Duracion': '2 horas'}) for i in range(1, 41)]
+    Curso.objects.create(titulo='Curso 1', descripcion='-', precio=500, duracion='1 hora')
+
+    with CaptureQueriesContext(connection) as ctx:
+        resultado = import_rows('cursos', filas, chunk_size=20)
+    assert (resultado['created'], resultado['updated'], resultado['errors']) == (39, 1, [])
+    # Per chunk: preload + writes inside a savepoint; no per-row query
+    assert len(ctx) <= 2 * 6
+    assert Curso.objects.get(titulo='Curso 1').precio == 1000
+
+
+@pytest.mark.django_db
+def test_product_import_keeps_kardex_and_alerts(admin_api):
+    Producto.objects.create(nombre='Kit Import', precio_venta=1000, stock_actual=20, stock_critico=5)
+    response = subir(admin_api, 'productos', '\n'.join([
+        'Nombre,Precio,Stock,Disponible',
+        'Kit Import,1200,3,Si',
+        'Kit Nuevo,900,10,No',
+    ]), nombre='inventario.csv')
+    assert (response.data['created'], response.data['updated']) == (1, 1)
+
+    assert list(MovimientoInventario.objects.filter(tipo='IMPORTACION').order_by('producto__nombre').values_list(
+        'producto__nombre', 'cantidad', 'stock_resultante', 'referencia')) == [
+        ('Kit Import', -17, 3, 'Importación inventario.csv'),
+        ('Kit Nuevo', 10, 10, 'Importación inventario.csv'),
+    ]
+    assert list(AlertaStock.objects.values_list('producto__nombre', flat=True)) == ['Kit Import']
+    assert Producto.objects.get(nombre='Kit Nuevo').esta_disponible is False
+
+
+@pytest.mark.django_db
+def test_streaming_readers_number_rows_across_chunks(admin_api):
+    from openpyxl import Workbook
+
+    contenido = 'Email,Nombre\n' + '\n'.join(f'c{i}@test.com,Cliente {i}' for i in range(1, 8)) + '\nroto,Malo\n'
+    filas = list(read_rows(SimpleUploadedFile('c.csv', contenido.encode()), chunk_size=3))
+    assert [n for n, _ in filas] == list(range(1, 9))
+    assert filas[7][1] == {'Email': 'roto', 'Nombre': 'Malo'}
+
+    workbook = Workbook()
+    hoja = workbook.active
+    hoja.append(['Nombre', 'Precio', 'Stock', None])
+    hoja.append(['Kit Excel', 1500, 4, 'ignorada'])
+    hoja.append([None, None, None, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    response = admin_api.post(f'{URL}?model=productos', {'file': SimpleUploadedFile('kits.xlsx', buffer.getvalue())},
+                              format='multipart')
+    assert (response.data['created'], response.data['errors']) == (1, [])
+    assert Producto.objects.get(nombre='Kit Excel').stock_actual == 4
+
+    assert subir(admin_api, 'clientes', 'x', nombre='datos.txt').status_code == 400
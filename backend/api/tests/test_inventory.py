@@ -1,7 +1,11 @@
 import pytest
+from datetime import timedelta
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
-from api.models import Producto, Orden, DetalleOrden, Cliente
+from api.models import Producto, Orden, DetalleOrden, Cliente, Transaccion
+from api.services import OrderService, StockReservationService
 from django.contrib.auth.models import User
 
 @pytest.mark.django_db
@@ -29,8 +33,10 @@ def test_atomic_inventory_deduction():
     response = client.post('/api/checkout/', data, format='json')
     assert response.status_code == 201
     
+    # Reserved until the payment is approved, but no longer available
     producto.refresh_from_db()
-    assert producto.stock_actual == 0
+    assert producto.stock_actual == 1
+    assert client.get(f'/api/public/productos/{producto.id}/').data['stock_disponible'] == 0
     
     # Attempt to buy 1 more (should fail)
     response = client.post('/api/checkout/', data, format='json')
@@ -64,3 +70,131 @@ def test_inventory_check_without_purchase():
     
     producto.refresh_from_db()
     assert producto.stock_actual == 5
+
+@pytest.mark.django_db
+def test_multi_product_checkout_is_all_or_nothing():
+    user = User.objects.create_user(username='testuser3', password='password')
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    a = Producto.objects.create(nombre='Kit A', precio_venta=1000, stock_actual=5)
+    b = Producto.objects.create(nombre='Kit B', precio_venta=2000, stock_actual=1)
+    digital = Producto.objects.create(nombre='Kit Digital', precio_venta=500, stock_actual=0, controlar_stock=False)
+
+    # Same product twice in the cart is aggregated into one line
+    data = {'items': [
+        {'type': 'product', 'id': b.id, 'quantity': 1},
+        {'type': 'product', 'id': a.id, 'quantity': 2},
+        {'type': 'product', 'id': digital.id, 'quantity': 3},
+        {'type': 'product', 'id': a.id, 'quantity': 1},
+    ]}
+    response = client.post('/api/checkout/', data, format='json')
+    assert response.status_code == 201
+
+    orden = Orden.objects.get()
+    assert orden.monto_total == 3 * 1000 + 2000 + 3 * 500
+    assert sorted(orden.detalles.values_list('producto__nombre', 'cantidad')) == [
+        ('Kit A', 3), ('Kit B', 1), ('Kit Digital', 3)
+    ]
+    assert sorted(orden.reservas_stock.values_list('producto__nombre', 'cantidad')) == [('Kit A', 3), ('Kit B', 1)]
+    assert StockReservationService.available(Producto.objects.all()) == {a.id: 2, b.id: 0, digital.id: 0}
+
+    # B is sold out: nothing from this cart is taken
+    response = client.post('/api/checkout/', data, format='json')
+    assert response.status_code == 400
+    assert "Stock insuficiente para Kit B" in str(response.data)
+    assert StockReservationService.available([a])[a.id] == 2
+    assert Orden.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_checkout_queries_do_not_grow_with_cart_lines(django_assert_max_num_queries):
+    user = User.objects.create_user(username='testuser4', email='t4@test.com', password='password')
+    productos = Producto.objects.bulk_create([
+        Producto(nombre=f'Kit {i}', precio_venta=100, stock_actual=10) for i in range(20)
+    ])
+    OrderService.create_order_from_cart(user, [{'type': 'product', 'id': productos[0].id}])  # resolve client
+
+    # lock + reserved sum + order + lines + reservations + total, regardless of 20 lines
+    with django_assert_max_num_queries(8):
+        OrderService.create_order_from_cart(user, [{'type': 'product', 'id': p.id, 'quantity': 2} for p in productos])
+    disponible = StockReservationService.available(Producto.objects.exclude(id=productos[0].id))
+    assert set(disponible.values()) == {8}
+
+
+@pytest.fixture
+def orden_reservada(db):
+    user = User.objects.create_user(username='reserva', email='reserva@test.com', password='password')
+    producto = Producto.objects.create(nombre='Kit Reserva', precio_venta=1000, stock_actual=3)
+    orden = OrderService.create_order_from_cart(user, [{'type': 'product', 'id': producto.id, 'quantity': 2}])
+    return orden, producto
+
+
+@pytest.mark.django_db
+def test_payment_approval_converts_reservation(orden_reservada):
+    orden, producto = orden_reservada
+    Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='APROBADO')
+
+    producto.refresh_from_db()
+    assert producto.stock_actual == 1
+    assert orden.reservas_stock.get().estado == 'CONVERTIDA'
+    assert StockReservationService.available([producto])[producto.id] == 1
+
+
+@pytest.mark.django_db
+def test_rejected_order_releases_reservation(orden_reservada):
+    orden, producto = orden_reservada
+    orden.estado_pago = 'RECHAZADO'
+    orden.save()
+
+    producto.refresh_from_db()
+    assert producto.stock_actual == 3
+    assert orden.reservas_stock.get().estado == 'LIBERADA'
+    assert StockReservationService.available([producto])[producto.id] == 3
+
+
+@pytest.mark.django_db
+def test_expired_reservations_stop_counting_and_are_swept(orden_reservada):
+    orden, producto = orden_reservada
+    orden.reservas_stock.update(expira_en=timezone.now() - timedelta(minutes=1))
+
+    # Expired holds are available again before the sweeper runs
+    assert StockReservationService.available([producto])[producto.id] == 3
+    call_command('release_expired_reservations')
+    assert orden.reservas_stock.get().estado == 'LIBERADA'
+
+    # A late approval still counts as a sale
+    orden.estado_pago = 'PAGADO'
+    orden.save()
+    producto.refresh_from_db()
+    assert producto.stock_actual == 1
+
+
+@pytest.mark.django_db
+def test_late_approval_after_stock_sold_elsewhere_flags_oversell(orden_reservada, caplog):
+    orden, producto = orden_reservada
+    orden.reservas_stock.update(estado='LIBERADA')
+    Producto.objects.filter(pk=producto.pk).update(stock_actual=1)
+
+    orden.estado_pago = 'PAGADO'
+    orden.save()
+    producto.refresh_from_db()
+    assert producto.stock_actual == 0
+    venta = producto.movimientos_inventario.get(tipo='VENTA')
+    assert venta.referencia == 'Sobreventa: faltan 1 unidades'
+    assert f'Orden #{orden.id}' in caplog.text
+
+
+@pytest.mark.django_db
+def test_admin_product_update_returns_available_stock(orden_reservada):
+    orden, producto = orden_reservada
+    admin = APIClient()
+    admin.force_authenticate(user=User.objects.create_superuser(username='admin_stock', email='as@test.com', password='x'))
+
+    response = admin.patch(f'/api/admin/productos/{producto.id}/', {'stock_actual': 10}, format='json')
+    assert response.status_code == 200
+    assert (response.data['stock_actual'], response.data['stock_disponible']) == (10, 8)
+
+    response = admin.post('/api/admin/productos/', {'nombre': 'Kit Nuevo', 'precio_venta': 500, 'stock_actual': 4},
+                          format='json')
+    assert response.data['stock_disponible'] == 4
@@ -0,0 +1,82 @@
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from api.models import (
+    Cliente, DetalleVenta, MovimientoInventario, Producto, SnapshotInventario, Transaccion, VentaProducto,
+)
+from api.services import KardexService, OrderService
+
+DIA = datetime(2030, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def staff_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='kardex', email='kardex@test.com', password='x'))
+    return api
+
+
+@pytest.fixture
+def producto(db):
+    return Producto.objects.create(nombre='Kit Kardex', precio_venta=1000, stock_actual=20, stock_critico=0)
+
+
+@pytest.mark.django_db
+def test_every_stock_change_is_journaled(producto, staff_api):
+    user = User.objects.create_user(username='kardex_buyer', email='kb@test.com')
+    orden = OrderService.create_order_from_cart(user, [{'type': 'product', 'id': producto.id, 'quantity': 3}])
+    Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='APROBADO')
+
+    venta = VentaProducto.objects.create(cliente=Cliente.objects.create(nombre_completo='Mesón', email='m@test.com'))
+    DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=2, precio_unitario=1000)
+
+    staff_api.patch(f'/api/admin/productos/{producto.id}/', {'stock_actual': 40}, format='json')
+    producto.refresh_from_db()
+    producto.descripcion = 'Sin cambio de stock'
+    producto.save()
+
+    movimientos = list(producto.movimientos_inventario.order_by('id').values_list('tipo', 'cantidad', 'stock_resultante'))
+    assert movimientos == [
+        ('INICIAL', 20, 20), ('VENTA', -3, 17), ('VENTA_DIRECTA', -2, 15), ('AJUSTE', 25, 40)
+    ]
+    assert MovimientoInventario.objects.get(tipo='VENTA').orden_id == orden.id
+
+
+@pytest.mark.django_db
+def test_stock_at_uses_nearest_snapshot_and_later_movements(producto, monkeypatch):
+    MovimientoInventario.objects.update(creado_en=DIA - timedelta(days=10))
+    for dias, cantidad in [(-5, -4), (-1, -6), (1, 10)]:
+        MovimientoInventario.objects.create(producto=producto, tipo='AJUSTE', cantidad=cantidad,
+                                            stock_resultante=0, creado_en=DIA + timedelta(days=dias))
+
+    assert KardexService.stock_at(producto.id, DIA - timedelta(days=20)) == 0
+    assert KardexService.stock_at(producto.id, DIA - timedelta(days=3)) == 16
+    assert KardexService.stock_at(producto.id, DIA) == 10
+
+    monkeypatch.setattr('django.utils.timezone.now', lambda: DIA)
+    call_command('snapshot_inventory', batch_size=1)
+    assert SnapshotInventario.objects.get(producto=producto).stock == 10
+
+    # Movements before the snapshot are no longer read: history after it stays exact
+    MovimientoInventario.objects.filter(creado_en__lte=DIA).delete()
+    assert KardexService.stock_at(producto.id, DIA) == 10
+    assert KardexService.stock_at(producto.id, DIA + timedelta(days=2)) == 20
+
+
+@pytest.mark.django_db
+def test_kardex_and_historical_stock_endpoints(producto, staff_api):
+    MovimientoInventario.objects.update(creado_en=DIA - timedelta(days=10))
+    MovimientoInventario.objects.create(producto=producto, tipo='AJUSTE', cantidad=-5, stock_resultante=15,
+                                        creado_en=DIA - timedelta(days=2))
+
+    response = staff_api.get(f'/api/admin/productos/{producto.id}/kardex/', {'desde': '2030-02-25', 'hasta': '2030-03-01'})
+    assert response.status_code == 200
+    assert (response.data['stock_inicial'], response.data['stock_final']) == (20, 15)
+    assert [m['cantidad'] for m in response.data['movimientos']] == [-5]
+
+    response = staff_api.get('/api/admin/productos/stock-historico/', {'fecha': '2030-02-20'})
+    assert response.data['productos'] == [{'id': producto.id, 'nombre': 'Kit Kardex', 'stock_historico': 20}]
+    assert staff_api.get('/api/admin/productos/stock-historico/', {'fecha': 'ayer'}).status_code == 400
@@ -1,30 +1,104 @@
 import pytest
-from unittest.mock import patch
-from api.models import Orden, Cliente, Producto, DetalleOrden
+from django.core.management import call_command
+from django.utils import timezone
+from api.models import Orden, Cliente, Producto, DetalleOrden, WebhookOutbox
 from django.contrib.auth.models import User
 
-@pytest.mark.django_db
-@patch('requests.post')
-def test_n8n_webhook_trigger(mock_post):
-    # Setup
+
+@pytest.fixture
+def orden(db):
     user = User.objects.create_user(username='loyaltyuser', email='loyalty@test.com')
     cliente = Cliente.objects.create(user=user, nombre_completo='Loyalty User', email='loyalty@test.com')
-    
+
     producto = Producto.objects.create(nombre='Kit Loyalty', precio_venta=5000)
-    
+
     orden = Orden.objects.create(cliente=cliente, monto_total=5000, estado_pago='PENDIENTE')
     DetalleOrden.objects.create(orden=orden, producto=producto, cantidad=1, precio_unitario=5000)
-    
-    # Trigger signal by changing status to PAGADO
+    return orden
+
+
+@pytest.mark.django_db
+def test_n8n_webhook_trigger(webhook_receiver, orden):
+    # Trigger signal by changing status to PAGADO (re-saves must not duplicate)
     orden.estado_pago = 'PAGADO'
     orden.save()
-    
+    orden.save()
+
+    # Queued, not sent inside the request
+    assert WebhookOutbox.objects.filter(orden=orden, evento='ORDEN_PAGADA').count() == 1
+    assert webhook_receiver.requests == []
+
+    call_command('dispatch_webhooks')
+
     # Verify webhook call
-    assert mock_post.called
-    args, kwargs = mock_post.call_args
-    
+    assert len(webhook_receiver.requests) == 1
+    request = webhook_receiver.requests[0]
+    assert request['headers']['Idempotency-Key'] == f'orden-{orden.id}-ORDEN_PAGADA'
+
     # Check payload
-    payload = kwargs['json']
+    payload = request['json']
     assert payload['cliente']['email'] == 'loyalty@test.com'
     assert payload['compra']['monto'] == 5000
+    assert payload['compra']['items'] == ['Kit Loyalty']
     assert payload['accion_sugerida'] == 'send_welcome_kit_email'
+    assert WebhookOutbox.objects.get(orden=orden).estado == 'ENVIADO'
+
+    # Delivered once
+    call_command('dispatch_webhooks')
+    assert len(webhook_receiver.requests) == 1
+
+
+@pytest.mark.django_db
+def test_n8n_webhook_retries_with_backoff(webhook_receiver, orden):
+    webhook_receiver.statuses = [500, 503, 500]
+    orden.estado_pago = 'PAGADO'
+    orden.save()
+    entrega = WebhookOutbox.objects.get(orden=orden)
+
+    before = timezone.now()
+    call_command('dispatch_webhooks')
+    entrega.refresh_from_db()
+    assert (entrega.estado, entrega.intentos) == ('PENDIENTE', 1)
+    assert entrega.proximo_intento >= before + timezone.timedelta(seconds=30)
+
+    # Not due yet: nothing is sent
+    call_command('dispatch_webhooks')
+    assert len(webhook_receiver.requests) == 1
+
+    # Second failure doubles the delay, third exhausts WEBHOOK_MAX_ATTEMPTS
+    WebhookOutbox.objects.filter(id=entrega.id).update(proximo_intento=timezone.now())
+    before = timezone.now()
+    call_command('dispatch_webhooks')
+    entrega.refresh_from_db()
+    assert entrega.intentos == 2
+    assert entrega.proximo_intento >= before + timezone.timedelta(seconds=60)
+
+    WebhookOutbox.objects.filter(id=entrega.id).update(proximo_intento=timezone.now())
+    call_command('dispatch_webhooks')
+    entrega.refresh_from_db()
+    assert (entrega.estado, entrega.intentos) == ('FALLIDO', 3)
+    assert '500' in entrega.ultimo_error
+
+
+@pytest.mark.django_db
+def test_n8n_webhook_batch_reuses_connection(webhook_receiver, orden):
+    ordenes = [orden] + [
+        Orden.objects.create(cliente=orden.cliente, monto_total=1000, estado_pago='PENDIENTE') for _ in range(9)
+    ]
+    for o in ordenes:
+        o.estado_pago = 'PAGADO'
+        o.save()
+
+    call_command('dispatch_webhooks', batch_size=4)
+
+    assert len(webhook_receiver.requests) == 10
+    assert webhook_receiver.connections == 1
+    assert not WebhookOutbox.objects.exclude(estado='ENVIADO').exists()
+
+
+@pytest.mark.django_db
+def test_n8n_webhook_skipped_with_placeholder_url(settings, orden):
+    settings.N8N_WEBHOOK_URL = 'https://n8n.webhook.url/post-venta'
+    orden.estado_pago = 'PAGADO'
+    orden.save()
+    assert not WebhookOutbox.objects.exists()
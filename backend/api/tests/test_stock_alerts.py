@@ -0,0 +1,72 @@
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from api.models import AlertaStock, Cliente, EmailLog, DetalleVenta, Producto, Transaccion, VentaProducto
+from api.services import OrderService
+
+
+@pytest.fixture
+def staff_api(db):
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_superuser(username='bodega', email='bodega@test.com', password='x'))
+    return api
+
+
+@pytest.fixture
+def producto(db):
+    return Producto.objects.create(nombre='Kit Alerta', precio_venta=1000, stock_actual=8, stock_critico=5)
+
+
+def pagar(user, producto, cantidad):
+    orden = OrderService.create_order_from_cart(user, [{'type': 'product', 'id': producto.id, 'quantity': cantidad}])
+    Transaccion.objects.create(orden=orden, monto=orden.monto_total, estado='APROBADO')
+
+
+@pytest.mark.django_db
+def test_paid_sale_crossing_threshold_opens_one_alert(producto, staff_api, mailoutbox, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='compradora', email='compradora@test.com')
+    User.objects.create_user(username='bodega2', email='bodega2@test.com', is_staff=True)
+    with django_capture_on_commit_callbacks(execute=True):
+        pagar(user, producto, 2)  # 8 -> 6: still above the threshold
+        assert not AlertaStock.objects.exists()
+        pagar(user, producto, 2)  # 6 -> 4: crosses it
+        pagar(user, producto, 1)  # 4 -> 3: already alerted
+
+    alerta = AlertaStock.objects.get()
+    assert (alerta.estado, alerta.stock_al_alertar, alerta.stock_critico) == ('ABIERTA', 4, 5)
+    alertas = [m for m in mailoutbox if m.subject.startswith('Stock bajo')]
+    assert len(alertas) == 1 and sorted(alertas[0].to) == ['bodega2@test.com', 'bodega@test.com']
+    # One log row per recipient
+    assert sorted(EmailLog.objects.filter(subject__startswith='Stock bajo').values_list('recipient', flat=True)) == [
+        'bodega2@test.com', 'bodega@test.com'
+    ]
+
+
+@pytest.mark.django_db
+def test_admin_edits_and_manual_sales_open_and_resolve_alerts(producto, staff_api):
+    url = f'/api/admin/productos/{producto.id}/'
+    assert staff_api.patch(url, {'stock_critico': 10}, format='json').status_code == 200
+    assert AlertaStock.objects.filter(estado='ABIERTA').count() == 1
+
+    assert staff_api.patch(url, {'stock_actual': 30}, format='json').status_code == 200
+    assert AlertaStock.objects.get().estado == 'RESUELTA'
+
+    cliente = Cliente.objects.create(nombre_completo='Venta Mesón', email='meson@test.com')
+    venta = VentaProducto.objects.create(cliente=cliente)
+    DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=25, precio_unitario=1000)
+    assert list(AlertaStock.objects.order_by('id').values_list('estado', 'stock_al_alertar')) == [
+        ('RESUELTA', 8), ('ABIERTA', 5)
+    ]
+
+
+@pytest.mark.django_db
+def test_low_stock_endpoint(producto, staff_api):
+    Producto.objects.create(nombre='Kit Agotado', precio_venta=1000, stock_actual=0, stock_critico=2)
+    Producto.objects.create(nombre='Kit Digital', precio_venta=1000, stock_actual=0, controlar_stock=False)
+
+    response = staff_api.get('/api/admin/productos/stock-bajo/')
+    assert response.status_code == 200
+    assert [p['nombre'] for p in response.data] == ['Kit Agotado']
+    # A new product born under its threshold is alerted too
+    assert list(AlertaStock.objects.values_list('producto__nombre', flat=True)) == ['Kit Agotado']
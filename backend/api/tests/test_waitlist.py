@@ -1,26 +1,29 @@
 import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils import timezone
 from rest_framework.test import APIClient
 from api.models import Taller, ListaEspera, Enrollment, Cliente
+from api.services import EnrollmentService
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 
-@pytest.mark.django_db
-def test_waitlist_notification(mailoutbox):
-    # Setup
+
+@pytest.fixture
+def taller_lleno(db):
     user1 = User.objects.create_user(username='user1', email='user1@test.com')
     client1 = Cliente.objects.create(user=user1, nombre_completo='User 1', email='user1@test.com')
-    
-    user2 = User.objects.create_user(username='user2', email='user2@test.com')
-    # User 2 doesn't need client profile for waitlist model strictly, but good to have
-    
+
     taller = Taller.objects.create(
         nombre='Taller Lleno',
-        fecha_taller='2025-12-31',
+        fecha_taller='2030-12-31',
         precio=10000,
         cupos_totales=1,
-        cupos_disponibles=0
     )
-    
+    # Taller.save() starts new workshops with every seat free; the fixture's seat is taken
+    Taller.objects.filter(id=taller.id).update(cupos_disponibles=0)
+    taller.refresh_from_db()
+
     # Enroll User 1 (taking the last spot - logically done before cupos=0 but we force it here)
     ct = ContentType.objects.get_for_model(Taller)
     enrollment = Enrollment.objects.create(
@@ -29,18 +32,185 @@ def test_waitlist_notification(mailoutbox):
         object_id=taller.id,
         estado_pago='PAGADO'
     )
-    
-    # Add User 2 to Waitlist
-    ListaEspera.objects.create(taller=taller, usuario=user2)
-    
+    return taller, enrollment
+
+
+def join_waitlist(taller, username):
+    user = User.objects.create_user(username=username, email=f'{username}@test.com')
+    Cliente.objects.create(user=user, nombre_completo=username, email=user.email)
+    ListaEspera.objects.create(taller=taller, usuario=user)
+    return user
+
+
+@pytest.mark.django_db
+def test_waitlist_notification(mailoutbox, django_capture_on_commit_callbacks, taller_lleno):
+    taller, enrollment = taller_lleno
+    user2 = join_waitlist(taller, 'user2')
+
     # Cancel User 1's enrollment
-    enrollment.estado_pago = 'ANULADO'
-    enrollment.save()
-    
+    with django_capture_on_commit_callbacks(execute=True):
+        enrollment.estado_pago = 'ANULADO'
+        enrollment.save()
+
     # Check if notification was sent
     assert len(mailoutbox) == 1
     assert mailoutbox[0].subject == f"¡Cupo disponible en {taller.nombre}!"
     assert mailoutbox[0].to == [user2.email]
-    
-    # Check if marked as notified
-    assert ListaEspera.objects.get(usuario=user2).notificado == True
+    assert 'Te lo reservamos hasta el' in mailoutbox[0].body
+
+    # Check if marked as notified and the seat is held for them, not released
+    entrada = ListaEspera.objects.get(usuario=user2)
+    assert entrada.notificado == True
+    assert entrada.reserva_activa
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 0
+
+
+@pytest.mark.django_db
+def test_waitlist_email_waits_for_commit(mailoutbox, django_capture_on_commit_callbacks, taller_lleno):
+    taller, enrollment = taller_lleno
+    join_waitlist(taller, 'user2')
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        enrollment.estado_pago = 'ANULADO'
+        enrollment.save()
+
+    assert len(callbacks) == 1
+    assert len(mailoutbox) == 0
+
+
+@pytest.mark.django_db
+def test_hold_is_reserved_for_waiter(taller_lleno):
+    taller, enrollment = taller_lleno
+    waiter = join_waitlist(taller, 'user2')
+    other = join_waitlist(taller, 'user3')
+    ListaEspera.objects.filter(usuario=other).delete()
+
+    EnrollmentService.update_enrollment_status(enrollment.id, 'ANULADO')
+
+    # Someone else cannot take the held seat
+    with pytest.raises(ValueError, match='no quedan cupos'):
+        EnrollmentService.create_enrollment(other, 'taller', taller.id)
+
+    # The waiter can, and leaves the waitlist
+    nuevo, _ = EnrollmentService.create_enrollment(waiter, 'taller', taller.id)
+    assert nuevo.estado_pago == 'PENDIENTE'
+    assert not ListaEspera.objects.filter(usuario=waiter).exists()
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 0
+
+
+@pytest.mark.django_db
+def test_release_without_waiters_returns_seat(taller_lleno):
+    taller, enrollment = taller_lleno
+
+    EnrollmentService.update_enrollment_status(enrollment.id, 'ANULADO')
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 1
+
+    # Deleting an already-cancelled enrollment does not free a second seat
+    EnrollmentService.delete_enrollment(enrollment.id)
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 1
+
+
+@pytest.mark.django_db
+def test_expired_hold_cascades_to_next(mailoutbox, django_capture_on_commit_callbacks, taller_lleno):
+    taller, enrollment = taller_lleno
+    first = join_waitlist(taller, 'user2')
+    second = join_waitlist(taller, 'user3')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        EnrollmentService.delete_enrollment(enrollment.id)
+    assert [m.to for m in mailoutbox] == [[first.email]]
+
+    ListaEspera.objects.filter(usuario=first).update(reserva_expira=timezone.now() - timedelta(minutes=1))
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('expire_waitlist_holds')
+
+    expired = ListaEspera.objects.get(usuario=first)
+    assert expired.notificado and expired.reserva_expira is None
+    assert ListaEspera.objects.get(usuario=second).reserva_activa
+    assert [m.to for m in mailoutbox] == [[first.email], [second.email]]
+
+    # The expired holder can no longer use the seat
+    with pytest.raises(ValueError, match='no quedan cupos'):
+        EnrollmentService.create_enrollment(first, 'taller', taller.id)
+
+    # Last hold expires with nobody left: seat goes back on sale
+    ListaEspera.objects.filter(usuario=second).update(reserva_expira=timezone.now() - timedelta(minutes=1))
+    call_command('expire_waitlist_holds')
+    taller.refresh_from_db()
+    assert taller.cupos_disponibles == 1
+
+
+@pytest.mark.django_db
+def test_waitlist_api_join_status_leave(taller_lleno, django_assert_num_queries):
+    taller, enrollment = taller_lleno
+    users = [join_waitlist(taller, f'queued{i}') for i in range(3)]
+    me = User.objects.create_user(username='me', email='me@test.com')
+    api = APIClient()
+    api.force_authenticate(user=me)
+    url = f'/api/waitlist/{taller.id}/'
+
+    response = api.post(url)
+    assert response.status_code == 201
+    assert response.data['posicion'] == 4
+
+    # Joining twice is idempotent
+    assert api.post(url).status_code == 200
+
+    # Position is one lookup of my entry plus one indexed count
+    ListaEspera.objects.filter(usuario=users[0]).delete()
+    with django_assert_num_queries(2):
+        response = api.get(url)
+    assert response.data == {'en_lista': True, 'posicion': 3, 'reserva_expira': None, 'notificado': False}
+
+    assert api.delete(url).status_code == 204
+    assert api.get(url).data == {'en_lista': False, 'posicion': None, 'reserva_expira': None, 'notificado': False}
+    assert api.delete(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_waitlist_api_rejects_when_seats_are_free(taller_lleno):
+    taller, enrollment = taller_lleno
+    Taller.objects.filter(id=taller.id).update(cupos_disponibles=1)
+    api = APIClient()
+    api.force_authenticate(user=User.objects.create_user(username='me', email='me@test.com'))
+
+    response = api.post(f'/api/waitlist/{taller.id}/')
+    assert response.status_code == 400
+    assert api.post('/api/waitlist/999999/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_leaving_with_hold_passes_seat_on(taller_lleno):
+    taller, enrollment = taller_lleno
+    first = join_waitlist(taller, 'user2')
+    second = join_waitlist(taller, 'user3')
+    EnrollmentService.delete_enrollment(enrollment.id)
+
+    api = APIClient()
+    api.force_authenticate(user=first)
+    assert api.get(f'/api/waitlist/{taller.id}/').data['reserva_expira'] is not None
+    assert api.delete(f'/api/waitlist/{taller.id}/').status_code == 204
+
+    assert ListaEspera.objects.get(usuario=second).reserva_activa
+
+
+@pytest.mark.django_db
+def test_admin_taller_list_includes_waitlist_summary(taller_lleno):
+    taller, enrollment = taller_lleno
+    for i in range(3):
+        join_waitlist(taller, f'queued{i}')
+    otro = Taller.objects.create(nombre='Sin Fila', fecha_taller='2030-12-31', precio=1000)
+    EnrollmentService.delete_enrollment(enrollment.id)  # first in line gets a hold
+
+    admin = User.objects.create_superuser(username='admin_wl', email='admin_wl@test.com', password='x')
+    api = APIClient()
+    api.force_authenticate(user=admin)
+    response = api.get('/api/admin/talleres/')
+
+    resumen = {row['id']: row['lista_espera'] for row in response.data}
+    assert resumen[taller.id] == {'esperando': 2, 'reservas_activas': 1}
+    assert resumen[otro.id] == {'esperando': 0, 'reservas_activas': 0}
@@ -14,7 +14,8 @@ from .views import (
     CheckoutView, UserOrdersView, UserOrderDetailView, CertificateView, GenerateCertificateView,
 
     GenerateQuoteView, BulkEnrollView, ExportDataView, ImportDataView, AdminProductoViewSet,
-    AdminTransactionListView, ActivateAccountView, RequestPasswordResetView, PasswordResetConfirmView
+    AdminTransactionListView, ActivateAccountView, RequestPasswordResetView, PasswordResetConfirmView,
+    WaitlistView, BulkSalesView, CartValidateView, ExportJobView, ExportJobDetailView, ExportJobDownloadView
 )
 
 
@@ -57,7 +58,9 @@ urlpatterns = [
     # User Actions
     path('enroll/', EnrollmentView.as_view(), name='enroll'),
     path('checkout/', CheckoutView.as_view(), name='checkout'),
+    path('cart/validate/', CartValidateView.as_view(), name='cart_validate'),
     path('enroll/cancel/', CancelEnrollmentView.as_view(), name='cancel_enrollment'),
+    path('waitlist/<int:taller_id>/', WaitlistView.as_view(), name='waitlist'),
     path('my-enrollments/', UserEnrollmentsView.as_view(), name='my_enrollments'),
     path('my-orders/', UserOrdersView.as_view(), name='my_orders'),
     path('my-orders/<int:pk>/', UserOrderDetailView.as_view(), name='my_order_detail'),
@@ -70,7 +73,11 @@ urlpatterns = [
     path('admin/send-bulk-email/', BulkEmailView.as_view(), name='send_bulk_email'),
     path('admin/clientes/<int:pk>/', AdminClienteDetailView.as_view(), name='admin_cliente_detail'),
     path('admin/export/', ExportDataView.as_view(), name='admin_export'),
+    path('admin/export/jobs/', ExportJobView.as_view(), name='admin_export_jobs'),
+    path('admin/export/jobs/<int:pk>/', ExportJobDetailView.as_view(), name='admin_export_job_detail'),
+    path('admin/export/jobs/<int:pk>/download/', ExportJobDownloadView.as_view(), name='admin_export_job_download'),
     path('admin/import/', ImportDataView.as_view(), name='admin_import'),
+    path('admin/ventas/lote/', BulkSalesView.as_view(), name='admin_bulk_sales'),
     path('admin/transactions/', AdminTransactionListView.as_view(), name='admin_transactions'),
     
     # B2B
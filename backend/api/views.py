@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Sum, Q
 from django.contrib.contenttypes.models import ContentType
 from .serializers import (
@@ -14,9 +15,11 @@ from .serializers import (
     OrdenSerializer
 )
 from .models import Taller, Cliente, Curso, Post, Contacto, Interes, Enrollment, Resena, Interaccion, Transaccion, Producto, Orden, DetalleOrden, Certificado, Cotizacion, Cotizacion, Empresa
-import csv
-import pandas as pd
-from django.http import HttpResponse
+from .models import recalculo_diferido
+from .idempotency import idempotent
+from .exports import FileFormatNegotiation
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
@@ -252,6 +255,16 @@ class AdminTallerViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        from .services import WaitlistService
+        response = super().list(request, *args, **kwargs)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        # Waitlist summary for every listed workshop in one grouped query
+        resumen = WaitlistService.summary([row['id'] for row in rows])
+        for row in rows:
+            row['lista_espera'] = resumen.get(row['id'], {'esperando': 0, 'reservas_activas': 0})
+        return response
+
     @action(detail=False, methods=['get'])
     def categories(self, request):
         try:
@@ -270,17 +283,13 @@ class AdminTallerViewSet(viewsets.ModelViewSet):
         # Send notification to interested clients
         try:
             if taller.categoria:
-                # Find clients with this interest (Changed to include leads/prospects)
-                interested_clients = Cliente.objects.filter(
-                    intereses_cliente=taller.categoria,
-                    estado_ciclo__in=['CLIENTE', 'LEAD', 'PROSPECTO']
-                ).distinct()
-                
-                logger.info(f"Found {interested_clients.count()} potential recipients for category '{taller.categoria.nombre}'")
-                
-                if interested_clients.exists():
-                    count = NotificationService.notify_new_workshop(taller, interested_clients)
-                    logger.info(f"Sent {count} notifications for new workshop")
+                # Stream clients with this interest (leads/prospects included) in chunks
+                count = 0
+                for chunk in NotificationService.iter_interest_audience(taller.categoria):
+                    count += NotificationService.dispatch_new_workshop(taller, chunk)
+
+                if count:
+                    logger.info(f"Sent or queued {count} notifications for new workshop in category '{taller.categoria.nombre}'")
                 else:
                     logger.warning("No interested clients found for this workshop category.")
         except Exception as e:
@@ -314,7 +323,7 @@ class AdminTallerViewSet(viewsets.ModelViewSet):
                 clients = [e.cliente for e in enrollments]
                 
                 if clients:
-                    NotificationService.notify_workshop_update(taller, clients, old_date, old_time)
+                    NotificationService.dispatch_workshop_update(taller, clients, old_date, old_time)
             except Exception as e:
                 logger.error(f"Error sending update notification: {e}")
 
@@ -455,7 +464,8 @@ class AdminCursoViewSet(viewsets.ModelViewSet):
              is_active = activo.lower() == 'true'
              queryset = queryset.filter(esta_activo=is_active)
 
-        return queryset.distinct()
+        from .services import CourseCounterService
+        return CourseCounterService.annotate_students(queryset.distinct())
 
     @action(detail=False, methods=['get'])
     def categories(self, request):
@@ -647,6 +657,7 @@ class InteraccionViewSet(viewsets.ModelViewSet):
 class CheckoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent('checkout')
     def post(self, request):
         from .services import OrderService
 
@@ -671,6 +682,41 @@ class CheckoutView(APIView):
             logger.error(f"Checkout Error: {e}")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class CartValidateView(APIView):
+    """
+    Valida precios y disponibilidad de un carrito antes del checkout, con el mismo
+    formato de ítems: {"items": [{"type": "product", "id": 1, "quantity": 2}, ...]}.
+    Solo informa: el checkout vuelve a validar con las filas bloqueadas.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        from .services import CartPricingService
+        items = request.data.get('items', [])
+        if not isinstance(items, list) or not items:
+            return Response({"error": "El carrito está vacío"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resueltos = CartPricingService.resolve(items)
+        return Response({
+            "valido": all(r.disponible for r in resueltos),
+            "total": sum(r.subtotal for r in resueltos),
+            "items": [
+                {
+                    "type": r.tipo,
+                    "id": r.id,
+                    "quantity": r.cantidad,
+                    "nombre": r.nombre,
+                    "precio": r.precio,
+                    "subtotal": r.subtotal,
+                    "stock_disponible": getattr(r.objeto, 'stock_disponible', None),
+                    "cupos_disponibles": getattr(r.objeto, 'cupos_disponibles', None),
+                    "disponible": r.disponible,
+                    "error": r.error,
+                }
+                for r in resueltos
+            ],
+        })
+
 class TransaccionViewSet(viewsets.ModelViewSet):
     queryset = Transaccion.objects.all()
     serializer_class = TransaccionSerializer
@@ -703,6 +749,7 @@ class TransaccionViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+    @idempotent('transacciones.create')
     def create(self, request, *args, **kwargs):
         print(f"TransaccionViewSet.create called by user: {request.user} ({request.user.email})")
         
@@ -803,41 +850,44 @@ class TransaccionViewSet(viewsets.ModelViewSet):
         if monto_aprobado is not None:
             try:
                 monto_aprobado = int(monto_aprobado)
-                if monto_aprobado < 0:
-                     return Response({"error": "El monto no puede ser negativo"}, status=status.HTTP_400_BAD_REQUEST)
-                
+            except ValueError:
+                 return Response({"error": "Monto inválido"}, status=status.HTTP_400_BAD_REQUEST)
+            if monto_aprobado < 0:
+                 return Response({"error": "El monto no puede ser negativo"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Transaccion.save() ya pide el recálculo de la orden/inscripción; dentro del
+        # bloque se coalesce con el pedido explícito de abajo y corre una sola vez
+        with transaction.atomic(), recalculo_diferido():
+            # La fila del saldo (orden o inscripción) se bloquea primero: dos aprobaciones
+            # simultáneas validan contra el saldo ya actualizado por la otra
+            remaining = None
+            if transaccion.orden_id:
+                orden = Orden.objects.select_for_update().get(pk=transaccion.orden_id)
+                remaining = orden.monto_total - orden.total_aprobado
+            elif transaccion.inscripcion_id:
+                inscripcion = Enrollment.objects.select_for_update().get(pk=transaccion.inscripcion_id)
+                if hasattr(inscripcion.content_object, 'precio'):
+                    remaining = inscripcion.content_object.precio - inscripcion.total_aprobado
+
+            transaccion = Transaccion.objects.select_for_update().get(pk=transaccion.pk)
+            if transaccion.estado != 'PENDIENTE':
+                 return Response({"error": "Solo se pueden aprobar transacciones pendientes"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if monto_aprobado is not None:
                 # Validation: Amount cannot exceed remaining balance
-                if transaccion.orden:
-                     total_approved_so_far = transaccion.orden.transacciones.filter(estado='APROBADO').aggregate(Sum('monto'))['monto__sum'] or 0
-                     remaining = transaccion.orden.monto_total - total_approved_so_far
-                     if monto_aprobado > remaining:
-                         return Response({"error": f"El monto ({monto_aprobado}) excede el saldo pendiente ({remaining})"}, status=status.HTTP_400_BAD_REQUEST)
-                     
-                elif transaccion.inscripcion:
-                     # Check logic for individual enrollment if needed, typically similar
-                     # But enrollment might have direct transactions + order transactions.
-                     # Using saldo_pendiente from property is safer?
-                     transaccion.inscripcion.refresh_from_db()
-                     # Note: saldo_pendiente logic subtracts 'monto_pagado'.
-                     # But 'monto_pagado' is updated by 'APROBADO' transactions.
-                     # So valid logic is price - sum(approved_transactions).
-                     # Actually, let's rely on the admin not to mess up too much, 
-                     # but checking against price is a good sanity check.
-                     if hasattr(transaccion.inscripcion.content_object, 'precio'):
-                         price = transaccion.inscripcion.content_object.precio
-                         total_paid = transaccion.inscripcion.transacciones.filter(estado='APROBADO').aggregate(Sum('monto'))['monto__sum'] or 0
-                         remaining = price - total_paid
-                         if monto_aprobado > remaining:
-                             return Response({"error": f"El monto ({monto_aprobado}) excede el saldo pendiente ({remaining})"}, status=status.HTTP_400_BAD_REQUEST)
-
+                if remaining is not None and monto_aprobado > remaining:
+                    return Response({"error": f"El monto ({monto_aprobado}) excede el saldo pendiente ({remaining})"}, status=status.HTTP_400_BAD_REQUEST)
                 # Update transaction amount to the approved amount
                 transaccion.monto = monto_aprobado
                 logger.info(f"Admin modified transaction amount to {monto_aprobado}")
-            except ValueError:
-                 return Response({"error": "Monto inválido"}, status=status.HTTP_400_BAD_REQUEST)
 
-        transaccion.estado = 'APROBADO'
-        transaccion.save()
+            transaccion.estado = 'APROBADO'
+            transaccion.save()
+
+            # Logic for Orden Balance (Simple full payment check for now)
+            if transaccion.orden:
+                logger.info(f"Transaction {transaccion.id} is for Order {transaccion.orden.id}. Updating Order Status.")
+                transaccion.orden.actualizar_estado_pago()
         
         # Logic for Enrollment Balance
         if transaccion.inscripcion:
@@ -858,11 +908,6 @@ class TransaccionViewSet(viewsets.ModelViewSet):
                         estado='PENDIENTE',
                         observacion='Saldo restante generado automáticamente tras abono parcial'
                     )
-        
-        # Logic for Orden Balance (Simple full payment check for now)
-        if transaccion.orden:
-             logger.info(f"Transaction {transaccion.id} is for Order {transaccion.orden.id}. Updating Order Status.")
-             transaccion.orden.actualizar_estado_pago()
 
         # Send acceptance email
         from .email_utils import send_receipt_accepted_email
@@ -895,6 +940,37 @@ class TransaccionViewSet(viewsets.ModelViewSet):
         
         return Response({"message": "Transacción rechazada"}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='lote')
+    def procesar_lote(self, request):
+        """
+        Aprueba o rechaza varios comprobantes de una vez.
+        {"accion": "aprobar", "items": [{"id": 1, "monto": 5000}, {"id": 2}]}
+        {"accion": "rechazar", "items": [{"id": 3}], "observacion": "..."}
+        Todo o nada: si algún ítem no es válido se responde 400 con los errores por id.
+        """
+        if not request.user.is_staff:
+             return Response({"error": "No autorizado"}, status=status.HTTP_403_FORBIDDEN)
+
+        from .services import PaymentReviewService
+        accion = request.data.get('accion')
+        items = request.data.get('items')
+        if accion not in ('aprobar', 'rechazar') or not isinstance(items, list) or not items:
+            return Response({"error": "Se requiere 'accion' (aprobar|rechazar) y una lista de 'items'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if accion == 'aprobar':
+                transacciones, errores = PaymentReviewService.approve_many(items)
+            else:
+                ids = [item.get('id') if isinstance(item, dict) else item for item in items]
+                transacciones, errores = PaymentReviewService.reject_many(ids, request.data.get('observacion', ''))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if errores:
+            return Response({"errores": errores}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info(f"Bulk {accion}: {len(transacciones)} transactions")
+        return Response({"procesadas": [t.id for t in transacciones]}, status=status.HTTP_200_OK)
+
 # ... (other viewsets)
 
 class BulkEmailView(APIView):
@@ -946,20 +1022,26 @@ class PublicTallerView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 class PublicCursoView(generics.ListAPIView):
-    queryset = Curso.objects.filter(esta_activo=True)
     serializer_class = CursoSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        from .services import CourseCounterService
+        return CourseCounterService.annotate_students(Curso.objects.filter(esta_activo=True))
+
 class PublicPostView(generics.ListAPIView):
     queryset = Post.objects.filter(esta_publicado=True).order_by('-fecha_publicacion')
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
 
 class PublicCursoDetailView(generics.RetrieveAPIView):
-    queryset = Curso.objects.filter(esta_activo=True)
     serializer_class = CursoSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        from .services import CourseCounterService
+        return CourseCounterService.annotate_students(Curso.objects.filter(esta_activo=True))
+
 class PublicTallerDetailView(generics.RetrieveAPIView):
     queryset = Taller.objects.filter(esta_activo=True)
     serializer_class = TallerSerializer
@@ -971,15 +1053,21 @@ class PublicPostDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
 
 class PublicProductoView(generics.ListAPIView):
-    queryset = Producto.objects.filter(esta_disponible=True).order_by('nombre')
     serializer_class = ProductoSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        from .services import StockReservationService
+        return StockReservationService.annotate_available(Producto.objects.filter(esta_disponible=True).order_by('nombre'))
+
 class PublicProductoDetailView(generics.RetrieveAPIView):
-    queryset = Producto.objects.filter(esta_disponible=True)
     serializer_class = ProductoSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        from .services import StockReservationService
+        return StockReservationService.annotate_available(Producto.objects.filter(esta_disponible=True))
+
 class EnrollmentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1049,6 +1137,37 @@ class CancelEnrollmentView(APIView):
         except Exception as e:
             return Response({"error": "Error interno al cancelar inscripción"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class WaitlistView(APIView):
+    """
+    Lista de espera de un taller para el usuario autenticado.
+    GET: estado y posición en la fila. POST: unirse. DELETE: salir.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, taller_id):
+        from .services import WaitlistService
+        return Response(WaitlistService.status(request.user, taller_id))
+
+    def post(self, request, taller_id):
+        from .services import WaitlistService
+        try:
+            entrada, created = WaitlistService.join(request.user, taller_id)
+        except Taller.DoesNotExist:
+            return Response({"error": "Taller no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            WaitlistService.status(request.user, taller_id),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request, taller_id):
+        from .services import WaitlistService
+        if not WaitlistService.leave(request.user, taller_id):
+            return Response({"error": "No estás en la lista de espera de este taller"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserEnrollmentsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1230,6 +1349,7 @@ class NewsletterViewSet(viewsets.ViewSet):
 
 class ExportDataView(APIView):
     permission_classes = [permissions.IsAdminUser]
+    content_negotiation_class = FileFormatNegotiation
 
     def get(self, request):
         import logging
@@ -1241,122 +1361,86 @@ class ExportDataView(APIView):
         
         logger.info(f"Export requested: model={model_name}, type={client_type}")
 
-        if model_name == 'clientes':
-            queryset = Cliente.objects.all()
-            if client_type:
-                queryset = queryset.filter(tipo_cliente=client_type)
-            
-            data = []
-            for obj in queryset:
-                data.append({
-                    'Nombre': obj.nombre_completo,
-                    'Email': obj.email,
-                    'Telefono': obj.telefono,
-                    'Tipo': obj.tipo_cliente,
-                    'Empresa': obj.empresa.razon_social if obj.empresa else '',
-                    'Ciclo': obj.get_estado_ciclo_display(),
-                    'Origen': obj.get_origen_display(),
-                    'Fecha Registro': obj.fecha_registro.strftime('%Y-%m-%d')
-                })
-        elif model_name == 'talleres':
-            queryset = Taller.objects.all()
-            if client_type:
-                queryset = queryset.filter(Q(tipo_cliente=client_type) | Q(tipo_cliente='AMBOS'))
-            
-            data = []
-            for obj in queryset:
-                data.append({
-                    'Nombre': obj.nombre,
-                    'Fecha': obj.fecha_taller,
-                    'Modalidad': obj.modalidad,
-                    'Precio': obj.precio,
-                    'Cupos Totales': obj.cupos_totales,
-                    'Cupos Disponibles': obj.cupos_disponibles,
-                    'Tipo Cliente': obj.tipo_cliente
-                })
-        elif model_name == 'cursos':
-            queryset = Curso.objects.all()
-            if client_type:
-                queryset = queryset.filter(Q(tipo_cliente=client_type) | Q(tipo_cliente='AMBOS'))
-            
-            data = []
-            for obj in queryset:
-                data.append({
-                    'Titulo': obj.titulo,
-                    'Precio': obj.precio,
-                    'Duracion': obj.duracion,
-                    'Categoria': obj.categoria.nombre if obj.categoria else '',
-                    'Activo': 'Si' if obj.esta_activo else 'No',
-                    'Rating': obj.rating,
-                    'Tipo Cliente': obj.tipo_cliente
-                })
-        elif model_name == 'productos':
-             queryset = Producto.objects.all()
-             data = []
-             for obj in queryset:
-                 data.append({
-                     'Nombre': obj.nombre,
-                     'Precio': obj.precio_venta,
-                     'Stock': obj.stock_actual,
-                     'Disponible': 'Si' if obj.esta_disponible else 'No',
-                     'Fisico': 'Si' if obj.es_fisico else 'No',
-                     'Descripcion': obj.descripcion
-                 })
-        elif model_name == 'productos':
-             queryset = Producto.objects.all()
-             data = []
-             for obj in queryset:
-                 data.append({
-                     'Nombre': obj.nombre,
-                     'Precio': obj.precio_venta,
-                     'Stock': obj.stock_actual,
-                     'Disponible': 'Si' if obj.esta_disponible else 'No',
-                     'Fisico': 'Si' if obj.es_fisico else 'No',
-                     'Descripcion': obj.descripcion
-                 })
-        elif model_name == 'ingresos':
-            # Export Transactions (Ingresos)
-            queryset = Transaccion.objects.all().order_by('-fecha')
-            
-            data = []
-            for obj in queryset:
-                item_name = "Desconocido"
-                if obj.inscripcion:
-                    if obj.inscripcion.content_type.model == 'taller':
-                        item_name = f"Taller: {obj.inscripcion.content_object.nombre}"
-                    else:
-                        item_name = f"Curso: {obj.inscripcion.content_object.titulo}"
-                elif obj.orden:
-                    item_name = f"Orden #{obj.orden.id}"
-
-                data.append({
-                    'ID Transaccion': obj.id,
-                    'Fecha': obj.fecha.strftime('%Y-%m-%d %H:%M') if obj.fecha else '',
-                    'Cliente': obj.inscripcion.cliente.nombre_completo if obj.inscripcion else (obj.orden.cliente.nombre_completo if obj.orden else 'Unknown'),
-                    'Item': item_name,
-                    'Monto': obj.monto,
-                    'Estado': obj.estado,
-                    'Observacion': obj.observacion
-                })
-        else:
+        from .exports import EXPORTS, csv_response, xlsx_response
+        if model_name not in EXPORTS:
             return Response({"error": "Modelo no válido"}, status=status.HTTP_400_BAD_REQUEST)
+        header, rows = EXPORTS[model_name](client_type)
 
+        # Streaming en ambos formatos: filas por bloques desde la BD, sin armar la tabla en memoria
         if file_format == 'excel':
-            df = pd.DataFrame(data)
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="{model_name}.xlsx"'
-            df.to_excel(response, index=False)
-            return response
+            return xlsx_response(f"{model_name}.xlsx", header, rows, sheet_title=model_name.capitalize())
         else:
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{model_name}.csv"'
-            
-            if data:
-                writer = csv.DictWriter(response, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
-            
-            return response
+            return csv_response(f"{model_name}.csv", header, rows)
+
+def export_job_status(job, request):
+    data = {
+        'id': job.id,
+        'modelo': job.modelo,
+        'formato': job.formato,
+        'filtros': job.filtros,
+        'estado': job.estado,
+        'filas_procesadas': job.filas_procesadas,
+        'error': job.error or None,
+        'creado_en': job.creado_en,
+        'terminado_en': job.terminado_en,
+        'url': None,
+    }
+    if job.estado == 'COMPLETADO' and job.archivo:
+        # Descarga autenticada: el export puede traer datos personales de clientes
+        data['url'] = request.build_absolute_uri(reverse('admin_export_job_download', args=[job.id]))
+    return data
+
+
+class ExportJobView(APIView):
+    """
+    Export en segundo plano: crea el job y responde 202 al instante; el archivo lo
+    genera `manage.py run_export_jobs`. Un pedido idéntico a uno en curso se une a él.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        from .export_jobs import request_export
+
+        try:
+            job, creado = request_export(
+                request.user,
+                request.data.get('model'),
+                request.data.get('format', 'csv'),
+                request.data.get('filters') or {},
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = export_job_status(job, request)
+        data['reutilizado'] = not creado
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportJobDetailView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        from .models import ExportJob
+
+        job = get_object_or_404(ExportJob, pk=pk)
+        return Response(export_job_status(job, request))
+
+
+class ExportJobDownloadView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        from django.http import FileResponse
+        from .models import ExportJob
+
+        job = get_object_or_404(ExportJob, pk=pk, estado='COMPLETADO')
+        try:
+            archivo = job.archivo.open('rb')
+        except (ValueError, FileNotFoundError):
+            return Response({"error": "El archivo ya no está disponible"}, status=status.HTTP_410_GONE)
+        extension = job.archivo.name.rsplit('.', 1)[-1]
+        return FileResponse(archivo, as_attachment=True, filename=f"{job.modelo}.{extension}")
+
 
 class ImportDataView(APIView):
     permission_classes = [permissions.IsAdminUser]
@@ -1368,105 +1452,22 @@ class ImportDataView(APIView):
         if not file:
             return Response({"error": "No se proporcionó ningún archivo"}, status=status.HTTP_400_BAD_REQUEST)
 
+        from .imports import IMPORTS, import_rows, read_rows
+        if model_name not in IMPORTS:
+            return Response({"error": "Modelo no válido"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file)
-            elif file.name.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(file)
-            else:
-                return Response({"error": "Formato no soportado. Use CSV o Excel."}, status=status.HTTP_400_BAD_REQUEST)
-            
-            created_count = 0
-            updated_count = 0
-            errors = []
-
-            for index, row in df.iterrows():
-                try:
-                    if model_name == 'clientes':
-                        email = row.get('Email')
-                        if not email: continue
-                        
-                        nombre = row.get('Nombre', 'Sin Nombre')
-                        telefono = row.get('Telefono', '')
-                        tipo = row.get('Tipo', 'B2C')
-                        
-                        cliente, created = Cliente.objects.update_or_create(
-                            email=email,
-                            defaults={
-                                'nombre_completo': nombre,
-                                'telefono': telefono,
-                                'tipo_cliente': tipo
-                            }
-                        )
-                        if created: created_count += 1
-                        else: updated_count += 1
-
-                    elif model_name == 'talleres':
-                        nombre = row.get('Nombre')
-                        if not nombre: continue
-                        
-                        fecha = row.get('Fecha') # YYYY-MM-DD
-                        hora = row.get('Hora', '10:00')
-                        precio = row.get('Precio', 0)
-                        cupos = row.get('Cupos', 10)
-                        
-                        taller, created = Taller.objects.update_or_create(
-                            nombre=nombre,
-                            defaults={
-                                'fecha_taller': fecha,
-                                'hora_taller': hora,
-                                'precio': precio,
-                                'cupos_totales': cupos,
-                                'cupos_disponibles': cupos,
-                                'modalidad': row.get('Modalidad', 'PRESENCIAL'),
-                                'tipo_cliente': row.get('Tipo Cliente', 'AMBOS')
-                            }
-                        )
-                        if created: created_count += 1
-                        else: updated_count += 1
-
-                    elif model_name == 'cursos':
-                        titulo = row.get('Titulo')
-                        if not titulo: continue
-                        
-                        curso, created = Curso.objects.update_or_create(
-                            titulo=titulo,
-                            defaults={
-                                'precio': row.get('Precio', 0),
-                                'duracion': row.get('Duracion', '0 horas'),
-                                'descripcion': row.get('Descripcion', ''),
-                                'tipo_cliente': row.get('Tipo Cliente', 'AMBOS'),
-                                'esta_activo': str(row.get('Activo', 'Si')).lower() in ['si', 'yes', 'true', '1']
-                            }
-                        )
-                        if created: created_count += 1
-                        else: updated_count += 1
-
-                    elif model_name == 'productos':
-                        nombre = row.get('Nombre')
-                        if not nombre: continue
-                        
-                        producto, created = Producto.objects.update_or_create(
-                            nombre=nombre,
-                            defaults={
-                                'precio_venta': row.get('Precio', 0),
-                                'stock_actual': row.get('Stock', 0),
-                                'descripcion': row.get('Descripcion', ''),
-                                'esta_disponible': str(row.get('Disponible', 'Si')).lower() in ['si', 'yes', 'true', '1'],
-                                'es_fisico': str(row.get('Fisico', 'Si')).lower() in ['si', 'yes', 'true', '1']
-                            }
-                        )
-                        if created: created_count += 1
-                        else: updated_count += 1
-                        
-                except Exception as e:
-                    errors.append(f"Fila {index + 1}: {str(e)}")
+            rows = read_rows(file)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Lectura en streaming y upsert masivo por bloques: memoria acotada sea cual sea el archivo
+            resultado = import_rows(model_name, rows, referencia=f"Importación {file.name}"[:100])
 
             return Response({
                 "message": "Importación completada",
-                "created": created_count,
-                "updated": updated_count,
-                "errors": errors
+                **resultado,
             })
 
         except Exception as e:
@@ -1510,39 +1511,25 @@ class GenerateQuoteView(APIView):
         if not items:
             return Response({"error": "No hay items para cotizar"}, status=status.HTTP_400_BAD_REQUEST)
             
-        # Create Cotizacion object
+        # Precios de todos los ítems: una consulta por tipo
+        from .services import CartPricingService
+        resueltos = CartPricingService.resolve(items, cupos_por_item=True)
+        no_encontrados = [r.error for r in resueltos if r.objeto is None]
+        if no_encontrados:
+            return Response({"error": "; ".join(no_encontrados)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Create Cotizacion object (una cotización no reserva: la disponibilidad no se exige)
         total = 0
         processed_items = []
         
-        for item in items:
-            item_type = item.get('type')
-            item_id = item.get('id')
-            quantity = item.get('quantity', 1)
-            
-            name = "Item Desconocido"
-            price = 0
-            
-            if item_type == 'product':
-                prod = Producto.objects.get(id=item_id)
-                name = prod.nombre
-                price = prod.precio_venta
-            elif item_type == 'taller':
-                taller = Taller.objects.get(id=item_id)
-                name = taller.nombre
-                price = taller.precio
-            elif item_type == 'course':
-                curso = Curso.objects.get(id=item_id)
-                name = curso.titulo
-                price = curso.precio
-                
-            subtotal = price * quantity
-            total += subtotal
+        for r in resueltos:
+            total += r.subtotal
             
             processed_items.append({
-                'name': name,
-                'quantity': quantity,
-                'price': float(price),
-                'subtotal': float(subtotal)
+                'name': r.nombre,
+                'quantity': r.cantidad,
+                'price': float(r.precio),
+                'subtotal': float(r.subtotal)
             })
             
         cotizacion = Cotizacion.objects.create(
@@ -1609,6 +1596,29 @@ class GenerateQuoteView(APIView):
             return response
         return Response({"error": "Error generando PDF"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BulkSalesView(APIView):
+    """
+    Carga masiva de ventas presenciales de kits:
+    {"ventas": [{"cliente_id": 1, "detalles": [{"producto_id": 2, "cantidad": 3}]},
+                {"cliente_email": "a@b.cl", "estado_pago": "PENDIENTE", "detalles": [...]}]}
+    Todo o nada: si alguna venta no es válida se responde 400 con los errores por índice.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        from .services import SalesIngestionService
+        ventas = request.data.get('ventas')
+        if not isinstance(ventas, list) or not ventas:
+            return Response({"error": "Se requiere una lista de 'ventas'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        creadas, errores = SalesIngestionService.ingest(ventas)
+        if errores:
+            return Response({"errores": errores}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": f"{len(creadas)} ventas registradas",
+            "ventas": [venta.id for venta in creadas],
+        }, status=status.HTTP_201_CREATED)
+
 class BulkEnrollView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
@@ -1833,128 +1843,95 @@ class AdminProductoViewSet(viewsets.ModelViewSet):
     serializer_class = ProductoSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def get_queryset(self):
+        from .services import StockReservationService
+        return StockReservationService.annotate_available(super().get_queryset())
+
+    def perform_create(self, serializer):
+        self._anotar_disponible(serializer.save())
+
+    def perform_update(self, serializer):
+        self._anotar_disponible(serializer.save())
+
+    @staticmethod
+    def _anotar_disponible(producto):
+        """La respuesta de create/update serializa la instancia guardada: disponible recalculado una vez."""
+        from .services import StockReservationService
+        producto.stock_disponible = StockReservationService.available([producto])[producto.id]
+
+    @action(detail=False, methods=['get'], url_path='stock-bajo')
+    def stock_bajo(self, request):
+        """Productos con stock_actual <= stock_critico, del índice parcial producto_stock_bajo_idx."""
+        from .services import StockAlertService
+        queryset = StockAlertService.low_stock(self.get_queryset())
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @staticmethod
+    def _momento(valor, por_defecto, fin_del_dia=False):
+        """Fecha/hora ISO de un query param; una fecha sola cubre el día completo si fin_del_dia."""
+        from datetime import datetime, time
+        from django.utils.dateparse import parse_date, parse_datetime
+        if not valor:
+            return por_defecto
+        momento = parse_datetime(valor)
+        if momento is None:
+            fecha = parse_date(valor)
+            if fecha is None:
+                raise serializers.ValidationError(f"Fecha inválida: {valor}")
+            momento = datetime.combine(fecha, time.max if fin_del_dia else time.min)
+        return momento if timezone.is_aware(momento) else timezone.make_aware(momento)
+
+    @action(detail=True, methods=['get'])
+    def kardex(self, request, pk=None):
+        """
+        Movimientos de inventario del producto entre ?desde y ?hasta (por defecto
+        los últimos 30 días), con el stock al inicio y al final del período.
+        """
+        from datetime import timedelta
+        from .serializers import MovimientoInventarioSerializer
+        from .services import KardexService
+        producto = self.get_object()
+        hasta = self._momento(request.query_params.get('hasta'), timezone.now(), fin_del_dia=True)
+        desde = self._momento(request.query_params.get('desde'), hasta - timedelta(days=30))
+        movimientos = KardexService.movements(producto.id, desde, hasta)
+        return Response({
+            'producto': producto.id,
+            'desde': desde,
+            'hasta': hasta,
+            'stock_inicial': KardexService.stock_at(producto.id, desde),
+            'stock_final': KardexService.stock_at(producto.id, hasta),
+            'movimientos': MovimientoInventarioSerializer(movimientos, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='stock-historico')
+    def stock_historico(self, request):
+        """Stock de cada producto al cierre de ?fecha (YYYY-MM-DD o fecha/hora ISO)."""
+        from .services import KardexService
+        momento = self._momento(request.query_params.get('fecha'), timezone.now(), fin_del_dia=True)
+        filas = KardexService.annotate_stock_at(Producto.objects.order_by('nombre'), momento).values(
+            'id', 'nombre', 'stock_historico'
+        )
+        return Response({'fecha': momento, 'productos': list(filas)})
+
 class AdminTransactionListView(APIView):
     permission_classes = (permissions.IsAdminUser,)
 
     def get(self, request):
-        import csv
-        from django.http import HttpResponse
+        from .exports import TRANSACTION_CSV_HEADER, admin_transaction_csv, admin_transaction_rows, csv_response
 
         transaction_type = request.query_params.get('type')
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        category_id = request.query_params.get('category')
-        status_filter = request.query_params.get('status')
         is_export = request.query_params.get('export') == 'true'
 
-        data = []
-
-        if transaction_type == 'services' or transaction_type == 'pending':
-            # Enrollments (Workshops/Courses)
-            # If type is 'pending', force status PENDIENTE (backward compatibility/shortcut)
-            # Otherwise respect status_filter or default to PAGADO if type is services (legacy behavior)
-            
-            queryset = Enrollment.objects.select_related('cliente', 'content_type')
-            
-            if transaction_type == 'pending':
-                queryset = queryset.filter(estado_pago='PENDIENTE')
-            elif status_filter:
-                queryset = queryset.filter(estado_pago=status_filter)
-            else:
-                # Default for 'services' view if no status specified is PAGADO
-                queryset = queryset.filter(estado_pago='PAGADO')
-
-            if start_date:
-                queryset = queryset.filter(fecha_inscripcion__date__gte=start_date)
-            if end_date:
-                queryset = queryset.filter(fecha_inscripcion__date__lte=end_date)
-            
-            for insc in queryset:
-                item = insc.content_object
-                cat_name = "Sin Categoría"
-                if item and hasattr(item, 'categoria') and item.categoria:
-                    cat_name = item.categoria.nombre
-                
-                # Filter by category if requested
-                if category_id and str(item.categoria.id if item and hasattr(item, 'categoria') and item.categoria else '') != category_id:
-                    continue
-
-                item_name = "Desconocido"
-                if item:
-                    item_name = getattr(item, 'nombre', getattr(item, 'titulo', 'Item'))
-
-                data.append({
-                    'id': insc.id,
-                    'date': insc.fecha_inscripcion,
-                    'client': insc.cliente.nombre_completo,
-                    'client_id': insc.cliente.id,
-                    'email': insc.cliente.email,
-                    'item': item_name,
-                    'category': cat_name,
-                    'amount': insc.monto_pagado,
-                    'status': insc.estado_pago,
-                    'type': 'Inscripción'
-                })
-
-        elif transaction_type == 'products':
-            # All Orders
-            queryset = Orden.objects.all().select_related('cliente').prefetch_related('detalles')
-            
-            if status_filter:
-                queryset = queryset.filter(estado_pago=status_filter)
-            # Note: products view usually shows all, but if no filter, maybe show all? 
-            # Previous implementation showed ALL. Let's keep showing ALL if no status filter.
-
-            if start_date:
-                queryset = queryset.filter(fecha__date__gte=start_date)
-            if end_date:
-                queryset = queryset.filter(fecha__date__lte=end_date)
-
-            for orden in queryset:
-                detalles = orden.detalles.all()
-                items_desc = ", ".join([f"{d.cantidad}x {d.producto.nombre}" for d in detalles])
-                
-                data.append({
-                    'id': orden.id,
-                    'date': orden.fecha,
-                    'client': orden.cliente.nombre_completo,
-                    'client_id': orden.cliente.id,
-                    'email': orden.cliente.email,
-                    'item': items_desc,
-                    'amount': orden.monto_total,
-                    'status': orden.estado_pago,
-                    'type': 'Orden'
-                })
-        
-        # Sort by date desc
-        # Handle timezone aware/naive for sorting
-        def get_sort_date(x):
-            d = x['date']
-            if timezone.is_naive(d):
-                return timezone.make_aware(d)
-            return d
-            
-        data.sort(key=get_sort_date, reverse=True)
+        # Ya ordenadas por fecha descendente en la BD
+        rows = admin_transaction_rows(
+            transaction_type,
+            status_filter=request.query_params.get('status'),
+            start_date=request.query_params.get('start_date'),
+            end_date=request.query_params.get('end_date'),
+            category_id=request.query_params.get('category'),
+        )
 
         if is_export:
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="transacciones_{transaction_type}.csv"'
-
-            writer = csv.writer(response)
-            writer.writerow(['ID', 'Fecha', 'Cliente', 'Email', 'Item/Concepto', 'Monto', 'Estado', 'Tipo'])
-
-            for row in data:
-                writer.writerow([
-                    row['id'],
-                    row['date'].strftime('%Y-%m-%d %H:%M'),
-                    row['client'],
-                    row['email'],
-                    row['item'],
-                    row['amount'],
-                    row['status'],
-                    row['type']
-                ])
-
-            return response
+            return csv_response(f"transacciones_{transaction_type}.csv", TRANSACTION_CSV_HEADER, admin_transaction_csv(rows))
         
-        return Response(data)
+        return Response(list(rows))
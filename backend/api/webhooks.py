@@ -0,0 +1,141 @@
+"""
+Webhooks salientes (n8n post-venta) con patrón outbox.
+
+`enqueue_order_paid` escribe un WebhookOutbox en la misma transacción que el
+guardado de la orden (si la transacción se revierte, el webhook también).
+`dispatch_pending_webhooks` lo entrega fuera del request, en lotes, sobre una
+sesión HTTP con conexiones reutilizadas y reintentos con backoff exponencial.
+"""
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import Orden, WebhookOutbox
+
+logger = logging.getLogger('api')
+
+PLACEHOLDER_HOST = 'n8n.webhook.url'
+# A claimed row is hidden from other workers for this long while it is delivered
+CLAIM_SECONDS = 300
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+
+
+def webhooks_enabled():
+    return PLACEHOLDER_HOST not in settings.N8N_WEBHOOK_URL
+
+
+def enqueue_order_paid(orden):
+    """Queues the ORDEN_PAGADA webhook once per order; re-saves are no-ops."""
+    if not webhooks_enabled():
+        return
+    WebhookOutbox.objects.bulk_create(
+        [WebhookOutbox(orden_id=orden.id, evento='ORDEN_PAGADA')],
+        ignore_conflicts=True,
+    )
+
+
+def build_order_paid_payload(orden):
+    return {
+        "cliente": {
+            "nombre": orden.cliente.nombre_completo,
+            "email": orden.cliente.email,
+            "tipo": orden.cliente.tipo_cliente
+        },
+        "compra": {
+            "id": orden.id,
+            "items": [d.producto.nombre for d in orden.detalles.all()],
+            "fecha": orden.fecha.strftime('%Y-%m-%d'),
+            "monto": int(orden.monto_total)
+        },
+        "accion_sugerida": "send_welcome_kit_email"
+    }
+
+
+def build_session(pool_size=10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def backoff_delay(intentos):
+    """Exponential backoff: base, 2*base, 4*base... capped at MAX_BACKOFF_SECONDS."""
+    return timedelta(seconds=min(settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (intentos - 1), MAX_BACKOFF_SECONDS))
+
+
+def _claim_batch(batch_size):
+    """Locks due rows (skipping rows held by other workers) and pushes their next attempt forward."""
+    now = timezone.now()
+    with transaction.atomic():
+        entregas = list(
+            WebhookOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE', proximo_intento__lte=now)
+            .order_by('proximo_intento', 'id')[:batch_size]
+        )
+        if entregas:
+            WebhookOutbox.objects.filter(id__in=[e.id for e in entregas]).update(
+                proximo_intento=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+    return entregas
+
+
+def dispatch_pending_webhooks(batch_size=100, session=None):
+    """
+    Delivers every due webhook, `batch_size` rows at a time.
+    Failed deliveries are rescheduled with exponential backoff and marked
+    FALLIDO after WEBHOOK_MAX_ATTEMPTS. Returns (sent, failed) for this run.
+    """
+    own_session = session is None
+    session = session or build_session()
+    sent = failed = 0
+    try:
+        while True:
+            entregas = _claim_batch(batch_size)
+            if not entregas:
+                break
+
+            ordenes = (
+                Orden.objects
+                .select_related('cliente')
+                .prefetch_related('detalles__producto')
+                .in_bulk([e.orden_id for e in entregas])
+            )
+            for entrega in entregas:
+                entrega.intentos += 1
+                try:
+                    response = session.post(
+                        settings.N8N_WEBHOOK_URL,
+                        json=build_order_paid_payload(ordenes[entrega.orden_id]),
+                        headers={'Idempotency-Key': f'orden-{entrega.orden_id}-{entrega.evento}'},
+                        timeout=settings.WEBHOOK_TIMEOUT,
+                    )
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    entrega.ultimo_error = str(e)
+                    if entrega.intentos >= settings.WEBHOOK_MAX_ATTEMPTS:
+                        entrega.estado = 'FALLIDO'
+                        logger.error(f"Webhook {entrega} gave up after {entrega.intentos} attempts: {e}")
+                    else:
+                        entrega.proximo_intento = timezone.now() + backoff_delay(entrega.intentos)
+                        logger.warning(f"Webhook {entrega} failed (attempt {entrega.intentos}): {e}")
+                    failed += 1
+                else:
+                    entrega.estado = 'ENVIADO'
+                    entrega.enviado_en = timezone.now()
+                    entrega.ultimo_error = None
+                    sent += 1
+
+            WebhookOutbox.objects.bulk_update(
+                entregas, ['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'enviado_en']
+            )
+    finally:
+        if own_session:
+            session.close()
+    return sent, failed
@@ -152,6 +152,34 @@ EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.Ema
 EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = env.int('EMAIL_PORT', default=587)
 EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
+# Async transport (api.email_async): max SMTP sessions / in-flight messages per send
+EMAIL_ASYNC_POOL_SIZE = env.int('EMAIL_ASYNC_POOL_SIZE', default=10)
+# Digest mode: queue new-workshop/update notices and send one email per client
+# each time `manage.py send_notification_digests` runs (e.g. hourly cron)
+NOTIFICATION_DIGEST_ENABLED = env.bool('NOTIFICATION_DIGEST_ENABLED', default=False)
+
+# Webhooks salientes (n8n post-venta): encolados en WebhookOutbox y entregados
+# por `manage.py dispatch_webhooks`. El URL placeholder desactiva el encolado.
+N8N_WEBHOOK_URL = env('N8N_WEBHOOK_URL', default='https://n8n.webhook.url/post-venta')
+WEBHOOK_TIMEOUT = env.float('WEBHOOK_TIMEOUT', default=5)
+WEBHOOK_MAX_ATTEMPTS = env.int('WEBHOOK_MAX_ATTEMPTS', default=8)
+WEBHOOK_BACKOFF_SECONDS = env.int('WEBHOOK_BACKOFF_SECONDS', default=30)
+
+# Lista de espera: minutos que se reserva un cupo liberado para el siguiente en la fila
+WAITLIST_HOLD_MINUTES = env.int('WAITLIST_HOLD_MINUTES', default=120)
+
+# Inventario: minutos que una orden impaga reserva su stock. Las reservas vencidas
+# dejan de contar al instante y `manage.py release_expired_reservations` las libera.
+STOCK_RESERVATION_MINUTES = env.int('STOCK_RESERVATION_MINUTES', default=2880)
+
+# Cabecera Idempotency-Key (checkout, subida de comprobantes): horas que se guarda
+# la respuesta original para reintentos; luego `manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+
+# Exports en segundo plano (`manage.py run_export_jobs`): minutos sin avances tras
+# los que un job EN_PROCESO se da por abandonado, y horas que se guarda el archivo
+EXPORT_JOB_STALE_MINUTES = env.int('EXPORT_JOB_STALE_MINUTES', default=15)
+EXPORT_JOB_TTL_HOURS = env.int('EXPORT_JOB_TTL_HOURS', default=24)
 
 # Logging Configuration
 LOGGING = {